@@ -0,0 +1,208 @@
+from .models.history import PriceHistory
+from typing import Dict, List, Tuple
+import heapq
+
+
+class ArbitrageOpportunity:
+    """
+    One instrument quoted cheaper on one venue than on another by more than
+    the scanner's cost. Buying on buy_venue and selling on sell_venue earns
+    spread - cost as a fraction of the buy price.
+    """
+    instrument: str
+    buy_venue: str
+    buy_price: float
+    sell_venue: str
+    sell_price: float
+    spread: float
+    """
+    (sell_price - buy_price) / buy_price
+    """
+    net_spread: float
+    """
+    The spread left after the scanner's cost
+    """
+    date: int
+
+    def __init__(self, instrument: str, buy_venue: str, buy_price: float, sell_venue: str, sell_price: float, spread: float, net_spread: float, date: int) -> None:
+        self.instrument = instrument
+        self.buy_venue = buy_venue
+        self.buy_price = buy_price
+        self.sell_venue = sell_venue
+        self.sell_price = sell_price
+        self.spread = spread
+        self.net_spread = net_spread
+        self.date = date
+
+    def __repr__(self) -> str:
+        return f'ArbitrageOpportunity({self.instrument}, buy {self.buy_venue}@{self.buy_price}, sell {self.sell_venue}@{self.sell_price}, {self.net_spread:.4%})'
+
+
+class InstrumentBook:
+    """
+    The latest quote of one instrument on every venue. Quotes are indexed by
+    venue, and two heaps keep the cheapest and the richest venue on top.
+    Replaced quotes are left in the heaps and skipped when they surface, so
+    an update costs O(log venues); the heaps are rebuilt once they hold
+    several times more entries than there are venues.
+    """
+    instrument: str
+    quotes: Dict[str,Tuple[float,int,int]]
+    """
+    Venue to (price, date, sequence number) of its latest quote
+    """
+    histories: Dict[str,PriceHistory]
+    newest: int
+    """
+    Date of the newest quote on any venue
+    """
+    _lows: List[Tuple[float,int,str]]
+    _highs: List[Tuple[float,int,str]]
+    _sequence: int
+
+    def __init__(self, instrument: str) -> None:
+        self.instrument = instrument
+        self.quotes = dict()
+        self.histories = dict()
+        self.newest = None
+        self._lows = list()
+        self._highs = list()
+        self._sequence = 0
+
+    def update(self, venue: str, price: float, date: int) -> None:
+        self._sequence += 1
+        previous = self.quotes.get(venue)
+        self.quotes[venue] = (price,date,self._sequence)
+        if self.newest is None or date > self.newest:
+            self.newest = date
+        elif previous is not None and previous[1] == self.newest and date < self.newest:
+            # The venue moved the newest quote back in time. Like remove, an
+            # older newest date can bring popped quotes back into range
+            newest = max(quote_date for _, quote_date, _ in self.quotes.values())
+            if newest < self.newest:
+                self.newest = newest
+                self.__rebuild()
+                return
+        heapq.heappush(self._lows,(price,self._sequence,venue))
+        heapq.heappush(self._highs,(-price,self._sequence,venue))
+        if len(self._lows) > 4 * len(self.quotes) + 16:
+            self.__rebuild()
+
+    def remove(self, venue: str) -> None:
+        self.quotes.pop(venue,None)
+        self.histories.pop(venue,None)
+        # An older newest date can bring popped quotes back into range
+        self.newest = max((date for _, date, _ in self.quotes.values()),default=None)
+        self.__rebuild()
+
+    # The cheapest and the richest venue whose quotes are no older than
+    # max_age before the newest quote. Quotes that are replaced or have gone
+    # stale are popped, a stale quote only comes back with a new update.
+    def get_best(self, max_age: int) -> Tuple[Tuple[float,int,str],Tuple[float,int,str]]:
+        if self.newest is None:
+            return None, None
+        oldest = self.newest - max_age
+        return self.__top(self._lows,oldest,1.0), self.__top(self._highs,oldest,-1.0)
+
+    def __top(self, heap: List[Tuple[float,int,str]], oldest: int, sign: float) -> Tuple[float,int,str]:
+        while heap:
+            price, sequence, venue = heap[0]
+            quote = self.quotes.get(venue)
+            if quote is not None and quote[2] == sequence and quote[1] >= oldest:
+                return (sign * price,quote[1],venue)
+            heapq.heappop(heap)
+        return None
+
+    def __rebuild(self) -> None:
+        self._lows = [(price,sequence,venue) for venue, (price, _, sequence) in self.quotes.items()]
+        self._highs = [(-price,sequence,venue) for venue, (price, _, sequence) in self.quotes.items()]
+        heapq.heapify(self._lows)
+        heapq.heapify(self._highs)
+
+
+class ArbitrageScanner:
+    """
+    Watches the same instruments across several venues for prices far
+    enough apart to buy on one venue and sell on another after costs. Books
+    are kept per instrument in a hash index, so a price update only
+    re-checks the venues of the instrument it belongs to instead of
+    rescanning every instrument.
+
+    Quotes are only compared when they are aligned in time: a venue's quote
+    counts if it is no more than max_age epoch milliseconds older than the
+    instrument's newest quote. The default of 0 compares bars of the same
+    date only.
+    """
+    cost: float
+    """
+    Round trip cost (fees, slippage) as a fraction of the buy price. Spreads
+    must exceed it to count
+    """
+    max_age: int
+    books: Dict[str,InstrumentBook]
+    opportunities: Dict[str,ArbitrageOpportunity]
+    """
+    The current opportunity of every instrument that has one
+    """
+
+    def __init__(self, cost: float = 0.001, max_age: int = 0) -> None:
+        self.cost = cost
+        self.max_age = max_age
+        self.books = dict()
+        self.opportunities = dict()
+
+    # Adds every venue's histories, keyed by venue, and returns the
+    # opportunities in their latest candles. Histories on different venues
+    # with the same ticker are the same instrument.
+    def add_histories(self, venues: Dict[str,List[PriceHistory]]) -> List[ArbitrageOpportunity]:
+        changed = set()
+        for venue, histories in venues.items():
+            for history in histories:
+                if len(history) == 0:
+                    continue
+                book = self.__get_book(history.get_ticker())
+                book.histories[venue] = history
+                book.update(venue,float(history.get_close()[-1]),int(history.get_dates()[-1]))
+                changed.add(history.get_ticker())
+        return [opportunity for opportunity in (self.check(instrument) for instrument in changed) if opportunity is not None]
+
+    # Records a new price of the instrument on the venue and re-checks that
+    # instrument only. Returns its opportunity, or None if it has none.
+    def update(self, instrument: str, venue: str, price: float, date: int) -> ArbitrageOpportunity:
+        self.__get_book(instrument).update(venue,price,date)
+        return self.check(instrument)
+
+    def remove(self, instrument: str, venue: str) -> ArbitrageOpportunity:
+        book = self.books.get(instrument)
+        if book is None:
+            return None
+        book.remove(venue)
+        return self.check(instrument)
+
+    def check(self, instrument: str) -> ArbitrageOpportunity:
+        book = self.books[instrument]
+        opportunity = None
+        if len(book.quotes) > 1:
+            low, high = book.get_best(self.max_age)
+            if low is not None and high is not None and low[2] != high[2] and low[0] > 0:
+                spread = (high[0] - low[0]) / low[0]
+                if spread > self.cost:
+                    opportunity = ArbitrageOpportunity(instrument,low[2],low[0],high[2],high[0],spread,spread - self.cost,max(low[1],high[1]))
+        if opportunity is None:
+            self.opportunities.pop(instrument,None)
+        else:
+            self.opportunities[instrument] = opportunity
+        return opportunity
+
+    def get_opportunities(self) -> List[ArbitrageOpportunity]:
+        return sorted(self.opportunities.values(),key=lambda opportunity: -opportunity.net_spread)
+
+    def get_history(self, instrument: str, venue: str) -> PriceHistory:
+        book = self.books.get(instrument)
+        return book.histories.get(venue) if book is not None else None
+
+    def __get_book(self, instrument: str) -> InstrumentBook:
+        book = self.books.get(instrument)
+        if book is None:
+            book = self.books[instrument] = InstrumentBook(instrument)
+        return book
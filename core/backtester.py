@@ -0,0 +1,275 @@
+from .models.history import PriceHistory, ColumnarPriceHistory
+from .models.record import TradeRecord, RecordHolder
+from .models.portfolio import Portfolio
+from .enums.enums import TradeSignal, MovingAverageType, RewardType, Side, ExitType, StrategyType
+from .executors import StrategyExecutor, SerialExecutor
+from .indicators import batch
+from typing import Dict, List, Tuple
+import numpy
+
+
+class BacktestConfig:
+    """
+    The strategy settings a backtest replays. Windows are in bars of the
+    histories being tested. triggers takes the same keys the strategies use
+    ('count_limit', 'reward_type', 'reward_amount'); a position can take
+    profit once it has been held for count_limit bars and the close reaches
+    reward_amount percent above the entry price. With RewardType.DYNAMIC the
+    target is reward_amount percent above the close of the latest entry
+    signal instead, so repeated entry signals ratchet it the way the
+    strategies move profit_trigger_amount.
+    """
+    strategy_type: StrategyType
+    average_type: MovingAverageType
+    window: int
+    std: float
+    fast_window: int
+    slow_window: int
+    rsi_window: int
+    rsi_upper_bound: float
+    rsi_lower_bound: float
+    triggers: dict
+
+    def __init__(self, strategy_type: StrategyType, average_type: MovingAverageType = MovingAverageType.SIMPLE, window: int = 20, std: float = 2, fast_window: int = 50, slow_window: int = 200, rsi_window: int = 14, rsi_upper_bound: float = 70.0, rsi_lower_bound: float = 30.0, triggers: dict = None) -> None:
+        self.strategy_type = strategy_type
+        self.average_type = average_type
+        self.window = window
+        self.std = std
+        self.fast_window = fast_window
+        self.slow_window = slow_window
+        self.rsi_window = rsi_window
+        self.rsi_upper_bound = rsi_upper_bound
+        self.rsi_lower_bound = rsi_lower_bound
+        self.triggers = triggers if triggers is not None else {'count_limit': 0,'reward_type': RewardType.NORMAL,'reward_amount': 0.0}
+
+
+class Trade:
+    """
+    A single simulated round trip on one ticker
+    """
+    ticker: str
+    entry_date: int
+    entry_price: float
+    exit_date: int
+    exit_price: float
+    number_of_shares: float
+    exit_type: ExitType
+
+    def __init__(self, ticker: str, entry_date: int, entry_price: float, exit_date: int, exit_price: float, number_of_shares: float, exit_type: ExitType) -> None:
+        self.ticker = ticker
+        self.entry_date = entry_date
+        self.entry_price = entry_price
+        self.exit_date = exit_date
+        self.exit_price = exit_price
+        self.number_of_shares = number_of_shares
+        self.exit_type = exit_type
+
+    def get_profit(self) -> float:
+        return (self.exit_price - self.entry_price) * self.number_of_shares
+
+    def get_return(self) -> float:
+        return self.exit_price / self.entry_price - 1.0
+
+
+class BacktestResult:
+    """
+    The trades a backtest made, grouped by ticker, and the records written
+    for them
+    """
+    trades: Dict[str,List[Trade]]
+    record_holder: RecordHolder
+
+    def __init__(self) -> None:
+        self.trades = dict()
+        self.record_holder = RecordHolder()
+
+    def get_trades(self, ticker: str) -> List[Trade]:
+        return self.trades.get(ticker,[])
+
+    def get_profit(self, ticker: str) -> float:
+        return sum(trade.get_profit() for trade in self.get_trades(ticker))
+
+    def get_total_profit(self) -> float:
+        return sum(trade.get_profit() for trades in self.trades.values() for trade in trades)
+
+    def get_number_of_trades(self) -> int:
+        return sum(len(trades) for trades in self.trades.values())
+
+
+class Backtester:
+    """
+    Replays a strategy over the full history of many tickers. Indicators and
+    entry/exit conditions are computed over each whole series in one
+    vectorized pass. Positions are then simulated by jumping from one entry
+    to the first bar that closes it (signal, stop loss, limit order or take
+    profit), so the Python work grows with the number of trades, not bars.
+
+    Positions are long only and fill at the close of the signal bar. Stop
+    losses and limit orders fill at their price, or at the open when the bar
+    gaps through it; if both are hit in one bar the stop loss wins. Each
+    position is sized to max_exposure_allowed of the portfolio's total funds.
+    """
+    portfolio: Portfolio
+    config: BacktestConfig
+    executor: StrategyExecutor
+
+    def __init__(self, portfolio: Portfolio, config: BacktestConfig, executor: StrategyExecutor = None) -> None:
+        self.portfolio = portfolio
+        self.config = config
+        self.executor = executor if executor is not None else SerialExecutor()
+
+    def run(self, histories: List[PriceHistory]) -> BacktestResult:
+        allocation = self.portfolio.get_total_funds() * self.portfolio.get_max_exposure_allowed()
+        if self.executor.uses_processes:
+            histories = [ColumnarPriceHistory.from_history(history) for history in histories]
+        all_trades: List[List[Trade]] = self.executor.map(backtest_history,histories,self.config,self.portfolio.get_stop_loss(),self.portfolio.get_limit_order(),allocation)
+
+        result = BacktestResult()
+        for history, trades in zip(histories,all_trades):
+            record = TradeRecord(history.get_ticker())
+            for trade in trades:
+                record.write_to_open(TradeSignal.BUY,Side.BUY_SIDE,trade.entry_price,trade.number_of_shares,trade.entry_date)
+                record.write_to_closed(trade.exit_price - trade.entry_price,trade.exit_date,Side.SELL_SIDE)
+            record.open_position = False
+            result.trades[history.get_ticker()] = trades
+            result.record_holder.insert_record(record)
+        return result
+
+
+class SignalGenerator:
+    """
+    Computes the entry and exit signal of every bar of one close series.
+    Indicators are memoized by their parameters, and simple moving averages
+    for every window come from one set of cumulative sums, so evaluating
+    many configs on the same series only computes each indicator once.
+    """
+    closes: numpy.ndarray
+    _panel: numpy.ndarray
+    _sums: Tuple
+    _memo: Dict[tuple,numpy.ndarray]
+
+    def __init__(self, closes: numpy.ndarray) -> None:
+        self.closes = closes
+        self._panel = closes.reshape(-1,1)
+        self._sums = None
+        self._memo = dict()
+
+    def moving_average(self, average_type: MovingAverageType, window: int) -> numpy.ndarray:
+        key = ('average',average_type,window)
+        if key not in self._memo:
+            if average_type == MovingAverageType.EXPONENTIAL:
+                self._memo[key] = batch.ewm_mean(self._panel,2.0 / (window + 1.0))[:,0]
+            else:
+                if self._sums is None:
+                    self._sums = batch.cumulative_sums(self._panel)
+                self._memo[key] = batch.rolling_mean(self._panel,window,self._sums)[:,0]
+        return self._memo[key]
+
+    # Rolling std of the close around its moving average, the bollinger band
+    # width before it is multiplied by the number of deviations
+    def band_std(self, average_type: MovingAverageType, window: int) -> numpy.ndarray:
+        key = ('std',average_type,window)
+        if key not in self._memo:
+            self._memo[key] = batch.rolling_std(self.closes - self.moving_average(average_type,window),window)[:,0]
+        return self._memo[key]
+
+    def rsi(self, window: int) -> numpy.ndarray:
+        key = ('rsi',window)
+        if key not in self._memo:
+            self._memo[key] = batch.rsi(self._panel,window)[:,0]
+        return self._memo[key]
+
+    # Matches the conditions Strategy uses for BUY and SELL
+    def generate(self, config: BacktestConfig) -> Tuple[numpy.ndarray,numpy.ndarray]:
+        closes = self.closes
+        rsi = self.rsi(config.rsi_window)
+        with numpy.errstate(invalid='ignore'):
+            if config.strategy_type == StrategyType.BOLLINGER_BAND:
+                average = self.moving_average(config.average_type,config.window)
+                width = config.std * self.band_std(config.average_type,config.window)
+                upper_band, lower_band = average + width, average - width
+                ready = (upper_band > 0) & (lower_band > 0)
+                entries = ready & (closes < lower_band) & (rsi < config.rsi_lower_bound)
+                exits = ready & (closes > upper_band) & (rsi > config.rsi_upper_bound)
+            else:
+                fast = self.moving_average(config.average_type,config.fast_window)
+                slow = self.moving_average(config.average_type,config.slow_window)
+                ready = (fast > 0) & (slow > 0)
+                entries = ready & (closes < slow) & (closes < fast) & (rsi < config.rsi_lower_bound)
+                exits = ready & (closes > slow) & (closes > fast) & (rsi > config.rsi_upper_bound)
+        return entries, exits
+
+
+# Computes the entry and exit signal of every bar in one pass
+def generate_signals(closes: numpy.ndarray, config: BacktestConfig) -> Tuple[numpy.ndarray,numpy.ndarray]:
+    return SignalGenerator(closes).generate(config)
+
+
+# Simulates one ticker. Kept at module level so process pool workers can
+# unpickle it.
+def backtest_history(history: PriceHistory, config: BacktestConfig, stop_loss: float, limit_order: float, allocation: float) -> List[Trade]:
+    columns = history.get_columns()
+    entries, exits = generate_signals(columns['close'],config)
+    return simulate_trades(history.get_ticker(),columns,entries,exits,config.triggers,stop_loss,limit_order,allocation)
+
+
+# Walks from each entry to the bar that closes the position
+def simulate_trades(ticker: str, columns: Dict[str,numpy.ndarray], entries: numpy.ndarray, exits: numpy.ndarray, triggers: dict, stop_loss: float, limit_order: float, allocation: float) -> List[Trade]:
+    opens, closes, lows, highs, dates = columns['open'], columns['close'], columns['low'], columns['high'], columns['date']
+    entry_bars = numpy.flatnonzero(entries)
+    count_limit = triggers.get('count_limit',0)
+    reward = triggers.get('reward_amount',0.0) / 100.0
+    size = len(closes)
+    # The dynamic take profit target of every bar, from the close of the
+    # latest entry signal at or before it
+    profit_prices = None
+    if reward > 0 and triggers.get('reward_type') == RewardType.DYNAMIC:
+        latest_entry = numpy.maximum.accumulate(numpy.where(entries,numpy.arange(size),0))
+        profit_prices = closes[latest_entry] * (1.0 + reward)
+
+    trades: List[Trade] = []
+    bar = 0
+    while True:
+        next_entry = numpy.searchsorted(entry_bars,bar)
+        if next_entry == len(entry_bars):
+            break
+        entry = int(entry_bars[next_entry])
+        entry_price = float(closes[entry])
+        stop_price = entry_price * stop_loss
+        limit_price = entry_price * limit_order
+        profit_price = entry_price * (1.0 + reward) if reward > 0 else numpy.inf
+        exit_bar, exit_price, exit_type = _find_exit(opens,closes,lows,highs,exits,entry,stop_price,limit_price,profit_price,profit_prices,count_limit)
+        if exit_bar is None:
+            exit_bar, exit_price, exit_type = size - 1, float(closes[-1]), ExitType.END_OF_DATA
+        trades.append(Trade(ticker,int(dates[entry]),entry_price,int(dates[exit_bar]),exit_price,allocation / entry_price,exit_type))
+        bar = exit_bar + 1
+    return trades
+
+
+# Finds the first bar after entry that closes the position. Scans forward in
+# growing chunks so a short holding period only looks at a few bars.
+# profit_prices replaces the fixed profit_price when the target moves.
+def _find_exit(opens, closes, lows, highs, exits, entry: int, stop_price: float, limit_price: float, profit_price: float, profit_prices: numpy.ndarray, count_limit: int) -> Tuple[int,float,ExitType]:
+    start = entry + 1
+    chunk = 64
+    while start < len(closes):
+        end = min(len(closes),start + chunk)
+        held = numpy.arange(start - entry,end - entry)
+        stop_hit = lows[start:end] <= stop_price
+        limit_hit = highs[start:end] >= limit_price
+        target = profit_prices[start:end] if profit_prices is not None else profit_price
+        profit_hit = (held >= count_limit) & (closes[start:end] >= target)
+        hit = stop_hit | limit_hit | profit_hit | exits[start:end]
+        if hit.any():
+            offset = int(hit.argmax())
+            bar = start + offset
+            if stop_hit[offset]:
+                return bar, min(float(opens[bar]),stop_price), ExitType.STOP_LOSS
+            if limit_hit[offset]:
+                return bar, max(float(opens[bar]),limit_price), ExitType.LIMIT
+            if profit_hit[offset]:
+                return bar, float(closes[bar]), ExitType.TAKE_PROFIT
+            return bar, float(closes[bar]), ExitType.SIGNAL
+        start = end
+        chunk *= 2
+    return None, None, None
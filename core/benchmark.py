@@ -0,0 +1,368 @@
+from .models.history import ColumnarPriceHistory, Candle, CANDLE_COLUMNS
+from .models.portfolio import Portfolio
+from .enums.enums import FrequencyType, MovingAverageType
+from .executors import StrategyExecutor, SerialExecutor, ThreadExecutor, ProcessExecutor
+from .strategy import Strategy
+from .synthetic import generate_history, generate_universe, generate_portfolio, generate_triggers
+from typing import Any, Callable, Dict, List
+import argparse
+import gc
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+import numpy
+
+
+BENCHMARK_FORMAT = 1
+"""
+Version of the result file layout. Bumped whenever the fields change so old
+baselines are not compared against new results
+"""
+
+EXECUTOR_MODES: Dict[str,Callable[[],StrategyExecutor]] = {
+    'serial': SerialExecutor,
+    'thread': ThreadExecutor,
+    'process': ProcessExecutor,
+}
+
+PERCENTILES = (50,90,99)
+
+IMPORT_MODULES = ('indicators.streaming','strategy','live','optimizer')
+"""
+Modules of this package whose cold import time is measured, the streaming
+indicators being the light path short lived workers rely on
+"""
+
+IMPORT_SCRIPT = '''
+import sys, time, tracemalloc
+if sys.argv[2] == 'memory':
+    tracemalloc.start()
+start = time.perf_counter()
+__import__(sys.argv[1])
+print(time.perf_counter() - start, tracemalloc.get_traced_memory()[1])
+'''
+"""
+Run in a fresh interpreter per sample, so nothing is imported beforehand
+"""
+
+
+class BenchmarkResult:
+    """
+    Timings of one benchmark case. Each sample is the duration of one call,
+    and a call covers `items` tickers of `bars` bars each
+    """
+    name: str
+    mode: str
+    tickers: int
+    bars: int
+    items: int
+    samples: List[float]
+    peak_memory: int
+    """
+    Peak bytes allocated through python during one call, from tracemalloc
+    """
+
+    def __init__(self, name: str, mode: str, tickers: int, bars: int, items: int, samples: List[float], peak_memory: int) -> None:
+        self.name = name
+        self.mode = mode
+        self.tickers = tickers
+        self.bars = bars
+        self.items = items
+        self.samples = samples
+        self.peak_memory = peak_memory
+
+    def get_key(self) -> str:
+        return f'{self.name}[{self.mode}]'
+
+    def get_tickers_per_second(self) -> float:
+        return self.items / numpy.median(self.samples)
+
+    def get_bars_per_second(self) -> float:
+        return self.items * self.bars / numpy.median(self.samples)
+
+    def get_percentiles(self) -> Dict[str,float]:
+        values = numpy.percentile(self.samples,PERCENTILES)
+        return {f'p{p}': float(value) for p, value in zip(PERCENTILES,values)}
+
+    def to_dict(self) -> Dict[str,Any]:
+        return {
+            'name': self.name,
+            'mode': self.mode,
+            'tickers': self.tickers,
+            'bars': self.bars,
+            'items': self.items,
+            'calls': len(self.samples),
+            'tickers_per_second': self.get_tickers_per_second(),
+            'bars_per_second': self.get_bars_per_second(),
+            'latency_seconds': {'mean': float(numpy.mean(self.samples)),'min': float(numpy.min(self.samples)),**self.get_percentiles()},
+            'peak_memory_bytes': self.peak_memory,
+        }
+
+
+# Times fn over `repeat` calls after `warmup` untimed ones, then makes one
+# more call under tracemalloc for the memory peak. Memory is traced apart
+# from the timed calls because tracing slows allocation down.
+def measure(name: str, mode: str, fn: Callable[[],Any], tickers: int, bars: int, items: int, repeat: int, warmup: int = 1) -> BenchmarkResult:
+    for _ in range(warmup):
+        fn()
+    gc.collect()
+    samples: List[float] = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return BenchmarkResult(name,mode,tickers,bars,items,samples,peak)
+
+
+# Times the cold import of one module in `repeat` fresh interpreters, the
+# way a cron scan or a spawned worker starts, then imports it once more
+# under tracemalloc for the memory peak
+def measure_import(module: str, repeat: int, warmup: int = 1) -> BenchmarkResult:
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+    def run(mode: str) -> List[str]:
+        completed = subprocess.run([sys.executable,'-c',IMPORT_SCRIPT,module,mode],cwd=root,capture_output=True,text=True)
+        if completed.returncode != 0:
+            raise RuntimeError(f'[ERROR]: Importing {module} failed: {completed.stderr.strip()}')
+        return completed.stdout.split()
+
+    for _ in range(warmup):
+        run('time')
+    samples = [float(run('time')[0]) for _ in range(repeat)]
+    return BenchmarkResult('import',module,0,0,1,samples,int(run('memory')[1]))
+
+
+class StrategyBenchmark:
+    """
+    Benchmarks the strategy hot paths over a synthetic universe: the per
+    ticker bollinger band and dual moving average tasks, rsi generation, and
+    the execute_*_strategy fan-out under every executor mode, single ticks
+    through the streaming scalping strategy, and the cold import of the
+    package's entry modules. Task, rsi and tick cases time single tickers so
+    their percentiles are per call latencies, the fan-out cases time the
+    whole universe.
+    """
+    histories: List[ColumnarPriceHistory]
+    portfolio: Portfolio
+    tickers: int
+    bars: int
+    repeat: int
+    ticks: int
+    modes: List[str]
+    window: int
+    std: int
+    fast_window: int
+    slow_window: int
+    rsi_window: int
+
+    def __init__(self, tickers: int = 100, bars: int = 1000, frequency_type: FrequencyType = FrequencyType.DAY, frequency: int = 1, seed: int = 0, repeat: int = 5, modes: List[str] = None,
+                 window: int = 20, std: int = 2, fast_window: int = 10, slow_window: int = 50, rsi_window: int = 14, ticks: int = 10000) -> None:
+        self.histories = generate_universe(tickers,bars,frequency_type,frequency,seed)
+        self.portfolio = generate_portfolio(self.histories)
+        self.tickers = tickers
+        self.bars = bars
+        self.repeat = repeat
+        self.ticks = ticks
+        self.modes = list(modes) if modes is not None else list(EXECUTOR_MODES)
+        self.window = window
+        self.std = std
+        self.fast_window = fast_window
+        self.slow_window = slow_window
+        self.rsi_window = rsi_window
+
+    def run(self) -> List[BenchmarkResult]:
+        results: List[BenchmarkResult] = self.run_imports()
+        results.extend(self.run_tasks())
+        results.extend(self.run_ticks())
+        for mode in self.modes:
+            results.extend(self.run_fan_out(mode))
+        return results
+
+    def run_imports(self) -> List[BenchmarkResult]:
+        return [measure_import(f'{__package__}.{module}',self.repeat) for module in IMPORT_MODULES]
+
+    def run_tasks(self) -> List[BenchmarkResult]:
+        strategy = Strategy(SerialExecutor())
+        bollinger_band_task = strategy._Strategy__bollinger_band_task
+        dual_moving_average_task = strategy._Strategy__dual_moving_average_task
+        generate_rsi = strategy._Strategy__generate_rsi
+        samples = max(self.repeat,min(self.tickers,200))
+        history = self.__cycle()
+        frames = [h.to_frame() for h in self.histories[:samples]]
+        frame = iter(frames * (samples // len(frames) + 2))
+
+        def bollinger_band():
+            bollinger_band_task(self.portfolio,next(history),MovingAverageType.SIMPLE,generate_triggers(),self.window,self.std,self.rsi_window)
+
+        def dual_moving_average():
+            dual_moving_average_task(self.portfolio,next(history),MovingAverageType.EXPONENTIAL,self.fast_window,self.slow_window,generate_triggers(),self.rsi_window)
+
+        def rsi():
+            generate_rsi(next(frame),self.rsi_window)
+
+        return [
+            measure('bollinger_band_task','serial',bollinger_band,1,self.bars,1,samples),
+            measure('dual_moving_average_task','serial',dual_moving_average,1,self.bars,1,samples),
+            measure('generate_rsi','serial',rsi,1,self.bars,1,samples),
+        ]
+
+    # Seeds a scalping state per ticker, then times one tick at a time, the
+    # tickers taking turns like an interleaved live feed
+    def run_ticks(self) -> List[BenchmarkResult]:
+        strategy = Strategy(SerialExecutor())
+        per_ticker = -(-(self.ticks + 2) // self.tickers)
+        states = list()
+        candles: List[List[Candle]] = list()
+        for history in self.histories:
+            columns = history.get_columns()
+            extended = generate_history(history.get_ticker(),per_ticker,history.get_frequency_type(),history.get_frequency(),seed=1).get_columns()
+            step = int(columns['date'][-1] - columns['date'][-2]) if len(history) > 1 else 1
+            dates = columns['date'][-1] + step * numpy.arange(1,per_ticker + 1)
+            candles.append([Candle(*values,date) for *values, date in zip(*(extended[name].tolist() for name in CANDLE_COLUMNS[:-1]),dates.tolist())])
+            states.append(strategy.create_scalping_stream(history))
+        ticks = iter([(states[i],candles[i][n]) for n in range(per_ticker) for i in range(self.tickers)])
+
+        def scalping_tick():
+            state, candle = next(ticks)
+            strategy.execute_scalping_stream(self.portfolio,state,candle)
+
+        return [measure('scalping_tick','stream',scalping_tick,1,1,1,self.ticks)]
+
+    def run_fan_out(self, mode: str) -> List[BenchmarkResult]:
+        with EXECUTOR_MODES[mode]() as executor:
+            strategy = Strategy(executor)
+
+            def bollinger_band():
+                strategy.execute_bollinger_band_strategy(self.portfolio,self.histories,generate_triggers(),MovingAverageType.SIMPLE,self.window,self.std,self.rsi_window,70.0,30.0)
+
+            def dual_moving_average():
+                strategy.execute_moving_average_strategy(self.portfolio,self.histories,generate_triggers(),MovingAverageType.EXPONENTIAL,self.fast_window,self.slow_window,self.rsi_window)
+
+            results = [
+                measure('execute_bollinger_band_strategy',mode,bollinger_band,self.tickers,self.bars,self.tickers,self.repeat),
+                measure('execute_moving_average_strategy',mode,dual_moving_average,self.tickers,self.bars,self.tickers,self.repeat),
+            ]
+        # The batch paths do not use the executor, time them once
+        if mode == self.modes[0]:
+            strategy = Strategy(SerialExecutor())
+
+            def bollinger_band_batch():
+                strategy.execute_bollinger_band_strategy_batch(self.portfolio,self.histories,generate_triggers(),MovingAverageType.SIMPLE,self.window,self.std,self.rsi_window,70.0,30.0)
+
+            def dual_moving_average_batch():
+                strategy.execute_moving_average_strategy_batch(self.portfolio,self.histories,generate_triggers(),MovingAverageType.EXPONENTIAL,self.fast_window,self.slow_window,self.rsi_window)
+
+            results.append(measure('execute_bollinger_band_strategy_batch','batch',bollinger_band_batch,self.tickers,self.bars,self.tickers,self.repeat))
+            results.append(measure('execute_moving_average_strategy_batch','batch',dual_moving_average_batch,self.tickers,self.bars,self.tickers,self.repeat))
+        return results
+
+    # Cycles through the universe so consecutive single ticker calls do not
+    # keep hitting the same warm arrays
+    def __cycle(self):
+        while True:
+            for history in self.histories:
+                yield history
+
+
+def get_environment() -> Dict[str,Any]:
+    import pandas
+    return {
+        'python': platform.python_version(),
+        'numpy': numpy.__version__,
+        'pandas': pandas.__version__,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+    }
+
+
+def write_results(path: str, results: List[BenchmarkResult], parameters: Dict[str,Any]) -> Dict[str,Any]:
+    report = {
+        'format': BENCHMARK_FORMAT,
+        'created': time.time(),
+        'environment': get_environment(),
+        'parameters': parameters,
+        'results': [result.to_dict() for result in results],
+    }
+    if path == '-':
+        json.dump(report,sys.stdout,indent=2)
+        sys.stdout.write('\n')
+    else:
+        with open(path,'w') as file:
+            json.dump(report,file,indent=2)
+    return report
+
+
+# Compares the median latency of every case found in both reports. Ratios
+# above 1 mean the current run is slower than the baseline.
+def compare_results(baseline: Dict[str,Any], current: Dict[str,Any], threshold: float = 0.1) -> List[Dict[str,Any]]:
+    if baseline.get('format') != current.get('format'):
+        raise ValueError(f'[ERROR]: Cannot compare benchmark format {baseline.get("format")} with {current.get("format")}')
+    previous = {f'{result["name"]}[{result["mode"]}]': result for result in baseline['results']}
+    comparisons: List[Dict[str,Any]] = list()
+    for result in current['results']:
+        key = f'{result["name"]}[{result["mode"]}]'
+        if key not in previous:
+            continue
+        ratio = result['latency_seconds']['p50'] / previous[key]['latency_seconds']['p50']
+        comparisons.append({
+            'case': key,
+            'baseline_p50': previous[key]['latency_seconds']['p50'],
+            'current_p50': result['latency_seconds']['p50'],
+            'ratio': ratio,
+            'regression': ratio > 1 + threshold,
+        })
+    return comparisons
+
+
+def print_results(results: List[BenchmarkResult]) -> None:
+    print(f'{"case":<50}{"tickers/s":>12}{"bars/s":>14}{"p50 us":>12}{"p99 us":>12}{"peak MiB":>10}',file=sys.stderr)
+    for result in results:
+        percentiles = result.get_percentiles()
+        print(f'{result.get_key():<50}{result.get_tickers_per_second():>12.1f}{result.get_bars_per_second():>14.0f}{percentiles["p50"] * 1e6:>12.1f}{percentiles["p99"] * 1e6:>12.1f}{result.peak_memory / 2 ** 20:>10.2f}',file=sys.stderr)
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description='Benchmarks the strategy and indicator hot paths on synthetic price histories')
+    parser.add_argument('--tickers',type=int,default=100)
+    parser.add_argument('--bars',type=int,default=1000)
+    parser.add_argument('--frequency-type',choices=[f.name for f in FrequencyType],default=FrequencyType.DAY.name)
+    parser.add_argument('--frequency',type=int,default=1)
+    parser.add_argument('--seed',type=int,default=0)
+    parser.add_argument('--repeat',type=int,default=5)
+    parser.add_argument('--ticks',type=int,default=10000,help='Candles timed through the streaming scalping strategy')
+    parser.add_argument('--modes',nargs='+',choices=list(EXECUTOR_MODES),default=list(EXECUTOR_MODES))
+    parser.add_argument('--output',default='-',help='Where to write the json results, - for stdout')
+    parser.add_argument('--compare',help='A previous json result to compare the medians against')
+    parser.add_argument('--threshold',type=float,default=0.1,help='Slowdown ratio above which a case counts as a regression')
+    args = parser.parse_args(argv)
+
+    benchmark = StrategyBenchmark(args.tickers,args.bars,FrequencyType[args.frequency_type],args.frequency,args.seed,args.repeat,args.modes,ticks=args.ticks)
+    results = benchmark.run()
+    print_results(results)
+    parameters = {name: value for name, value in vars(args).items() if name not in ('output','compare','threshold')}
+    report = write_results(args.output,results,parameters)
+
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)
+        regressions = 0
+        for comparison in compare_results(baseline,report,args.threshold):
+            regressions += comparison['regression']
+            flag = ' REGRESSION' if comparison['regression'] else ''
+            print(f'{comparison["case"]:<50}{comparison["ratio"]:>8.2f}x{flag}',file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -18,10 +18,31 @@ class TradeSignal(Enum):
     SHORT = "SHORT"
     TAKE_PROFIT = "TAKE_PROFIT"
 
+class ExitType(Enum):
+    SIGNAL = "SIGNAL"
+    STOP_LOSS = "STOP_LOSS"
+    LIMIT = "LIMIT"
+    TAKE_PROFIT = "TAKE_PROFIT"
+    END_OF_DATA = "END_OF_DATA"
+
+class MarketTrend(Enum):
+    UPTREND = "UPTREND"
+    DOWNTREND = "DOWNTREND"
+    SIDEWAYS = "SIDEWAYS"
+
+class StrategyType(Enum):
+    BOLLINGER_BAND = "BOLLINGER_BAND"
+    DUAL_MOVING_AVERAGE = "DUAL_MOVING_AVERAGE"
+
 class Side(Enum):
     SELL_SIDE = 0
     BUY_SIDE = 1
 
+class RecordAction(Enum):
+    OPEN = 0
+    CLOSE = 1
+    SIGNAL = 2
+
 class MovingAverageType(Enum):
     SIMPLE = "SIMPLE"
     EXPONENTIAL = "EXPONENTIAL"
@@ -0,0 +1,122 @@
+from abc import ABC, abstractmethod
+from typing import TYPE_CHECKING, Any, Callable, List, Sequence
+import math
+import os
+
+if TYPE_CHECKING:
+    from concurrent.futures import Executor, Future
+
+
+def _run_chunk(fn: Callable, chunk: Sequence, args: tuple) -> List[Any]:
+    return [fn(item,*args) for item in chunk]
+
+
+class StrategyExecutor(ABC):
+    """
+    Runs a function over a list of items, e.g. one strategy task per ticker.
+    Items are submitted in chunks so a universe of thousands of tickers
+    becomes a handful of futures instead of one per ticker. Pools are created
+    on first use and kept until shutdown() so one executor can be reused
+    across every strategy call.
+    """
+    max_workers: int
+    chunk_size: int
+    """
+    Items per submitted task. Defaults to splitting the items into about four
+    chunks per worker
+    """
+    uses_processes: bool = False
+    """
+    Whether work leaves this process. Functions and items given to map then
+    have to be picklable and any state they mutate is not seen by the caller
+    """
+    _pool: 'Executor'
+
+    def __init__(self, max_workers: int = None, chunk_size: int = None) -> None:
+        self.max_workers = max_workers if max_workers is not None else self.default_workers()
+        self.chunk_size = chunk_size
+        self._pool = None
+
+    @staticmethod
+    def default_workers() -> int:
+        return os.cpu_count() or 1
+
+    @abstractmethod
+    def _create_pool(self) -> 'Executor':
+        ...
+
+    def _get_pool(self) -> 'Executor':
+        if self._pool is None:
+            self._pool = self._create_pool()
+        return self._pool
+
+    # Applies fn(item, *args) to every item and returns the results in the
+    # same order as the items.
+    def map(self, fn: Callable, items: Sequence, *args) -> List[Any]:
+        if len(items) == 0:
+            return []
+        chunk_size = self.chunk_size or max(1,math.ceil(len(items) / (self.max_workers * 4)))
+        pool = self._get_pool()
+        futures: List['Future[List[Any]]'] = [pool.submit(_run_chunk,fn,items[i:i + chunk_size],args) for i in range(0,len(items),chunk_size)]
+        results: List[Any] = []
+        for future in futures:
+            results.extend(future.result())
+        return results
+
+    def shutdown(self, wait: bool = True) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=wait)
+            self._pool = None
+
+    def __enter__(self) -> 'StrategyExecutor':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.shutdown()
+
+
+class SerialExecutor(StrategyExecutor):
+    """
+    Runs everything in the calling thread. Useful for debugging and for
+    small universes where pool overhead dominates.
+    """
+
+    def __init__(self) -> None:
+        super().__init__(max_workers=1)
+
+    # Never called, map runs the items without a pool
+    def _create_pool(self) -> 'Executor':
+        return None
+
+    def map(self, fn: Callable, items: Sequence, *args) -> List[Any]:
+        return _run_chunk(fn,items,args)
+
+
+class ThreadExecutor(StrategyExecutor):
+    """
+    A bounded thread pool. Cheap to hand work to, but CPU bound pandas work
+    is still limited by the GIL.
+    """
+
+    @staticmethod
+    def default_workers() -> int:
+        return min(32,(os.cpu_count() or 1) + 4)
+
+    # concurrent.futures is only imported once a pool is needed, so
+    # serial runs and short lived workers never pay for it
+    def _create_pool(self) -> 'Executor':
+        from concurrent.futures import ThreadPoolExecutor
+        return ThreadPoolExecutor(max_workers=self.max_workers)
+
+
+class ProcessExecutor(StrategyExecutor):
+    """
+    A persistent process pool for CPU bound indicator math. Workers are
+    started once and reused, and histories should be shipped as
+    ColumnarPriceHistory so each ticker pickles as a few arrays.
+    """
+    uses_processes = True
+
+    def _create_pool(self) -> 'Executor':
+        from concurrent.futures import ProcessPoolExecutor
+        return ProcessPoolExecutor(max_workers=self.max_workers)
@@ -1,36 +1,127 @@
-from models.history import PriceHistory
-from typing import Set
+from .models.history import PriceHistory
+from .enums.enums import FrequencyType
+from .indicators import batch
+from .resample import BARS_PER_DAY
+from .executors import StrategyExecutor, SerialExecutor
+from .trend import MarketTrendEngine, IndexAnchor, index_panel, trend_bars, trend_lookback, get_shares, _market_trend_task
+from typing import Any, Dict, List, Set, Tuple
+import math
+import numpy
 
 
 class Forecaster:
-    def __init__(self) -> None:
-        pass
+    """
+    Forecasts closes with an autoregressive model of the log returns,
+    fitted by least squares for every ticker at once.
+    """
+    order: int
+    """
+    The number of lagged returns each forecast is regressed on
+    """
+    lookback: int
+    """
+    The number of most recent returns the model is fitted to
+    """
+    ridge: float
+    """
+    Regularization added to the normal equations so tickers with flat or
+    short histories still have a solution
+    """
+    executor: StrategyExecutor
+    """
+    Spreads markets over workers in forecast_market_trends and
+    update_market_trends
+    """
+    index_anchors: Dict[str,IndexAnchor]
+    """
+    The latest IndexAnchor of each market, so a market's index is only walked
+    over the bars added since its last trend instead of its whole history
+    """
+
+    def __init__(self, order: int = 5, lookback: int = 250, ridge: float = 1e-8, executor: StrategyExecutor = None) -> None:
+        self.order = order
+        self.lookback = lookback
+        self.ridge = ridge
+        self.executor = executor if executor is not None else SerialExecutor()
+        self.index_anchors = dict()
 
 
-    #  Takes in a set of tickets, a set of markets, a period of days, and interval
+    #  Takes in the price history of a stock, a period of days, and interval
     # and forecasts the price of the stock based on the input.   
-    def forecast_stock(self,ticker:str,market:str,days_out:int,interval:str = "1m") -> dict:
-        forcasted_stock:dict = dict()
+    def forecast_stock(self,ticker:PriceHistory,market:str = '',days_out:int = 5,interval:str = "1m") -> dict:
+        forcasted_stock:dict = self.forecast_stocks([ticker],{market} if market else set(),days_out,interval)
 
         # Returned dictionary 
-        # {'ticker':{'old_close':int,'forecasted_close':int}}
+        # {'ticker':{'old_close':float,'forecasted_close':float}}
         return forcasted_stock
     
-    #  Takes in a set of tickets, a set of markets, a period of days, and interval
-    # and forecasts the price of the stock based on the input.
+    #  Takes in a set of stocks, a set of markets, a period of days, and interval
+    # and forecasts the price of the stock based on the input. Stocks sharing
+    # a frequency are fitted together.
     def forecast_stocks(self,stocks:Set[PriceHistory],markets:set = set(),days_out:int = 5, intervals:str = '1m') -> dict:
         forcasted_stocks:dict = dict()
 
+        groups: Dict[Tuple[FrequencyType,int],List[PriceHistory]] = dict()
+        for stock in stocks:
+            if len(stock) > 0:
+                groups.setdefault((stock.get_frequency_type(),stock.get_frequency() or 1),[]).append(stock)
 
+        for (frequency_type, frequency), group in groups.items():
+            steps = max(1,int(math.ceil(days_out * BARS_PER_DAY[frequency_type] / frequency)))
+            closes, _ = batch.align_closes(group,self.lookback + self.order + 1)
+            forecasts = forecast_closes(closes,self.order,steps,self.ridge)
+            for column, stock in enumerate(group):
+                forcasted_stocks[stock.get_ticker()] = {'old_close': float(stock.get_close()[-1]),'forecasted_close': float(forecasts[column])}
 
         # Returned dictionary 
-        # {'ticker':{'old_close':int,'forecasted_close':int}}
+        # {'ticker':{'old_close':float,'forecasted_close':float}}
         return forcasted_stocks
 
     # Takes in a index and a set markets to find the underlying trend
-    # represented in each market using moving averages
-    def forecast_market_trend(index:Set[PriceHistory],market:str = '') -> dict:
-        pass 
+    # represented in each market using moving averages. windows are in days
+    # and are converted into bars of the constituents' frequency. The index
+    # is equal weighted unless shares outstanding are given per ticker.
+    def forecast_market_trend(self,index:Set[PriceHistory],market:str = '',windows:Tuple = (20,50,200),slope_period:int = 5,shares:Dict[str,float] = None) -> dict:
+        return self.forecast_market_trends({market: index},windows,slope_period,{market: shares} if shares is not None else None)[market]
+
+    # Computes the trend of many markets at once, one market per task.
+    # Constituents are aligned on their common dates here and only the
+    # aligned panels are handed to the executor.
+    #
+    # Returned dictionary
+    # {'market':{'date':int,'index':float,'trend':MarketTrend,'moving_averages':{window:float},'slopes':{window:float},'breadth':{window:float}}}
+    def forecast_market_trends(self,markets:Dict[str,Set[PriceHistory]],windows:Tuple = (20,50,200),slope_period:int = 5,shares:Dict[str,Dict[str,float]] = None) -> Dict[str,dict]:
+        windows = sorted(windows)
+        names = list(markets)
+        constituents = [list(markets[name]) for name in names]
+        all_bars = [trend_bars(histories,windows) for histories in constituents]
+        if len({tuple(bars) for bars in all_bars}) > 1:
+            # Markets on different frequencies need their own windows in bars
+            return {name: self.forecast_market_trends({name: markets[name]},windows,slope_period,{name: shares[name]} if shares is not None and name in shares else None)[name] for name in names}
+
+        bars = all_bars[0] if all_bars else []
+        items = list()
+        for name, histories in zip(names,constituents):
+            panel, grid, levels, self.index_anchors[name] = index_panel(histories,trend_lookback(bars,slope_period),get_shares(histories,shares.get(name) if shares is not None else None),self.index_anchors.get(name))
+            items.append((panel,grid,levels))
+        trends = self.executor.map(_market_trend_task,items,windows,bars,slope_period)
+        return dict(zip(names,trends))
+
+    # Builds an engine per market that keeps its trend current as bars
+    # arrive. See MarketTrendEngine
+    def create_market_trends(self,markets:Dict[str,Set[PriceHistory]],windows:Tuple = (20,50,200),slope_period:int = 5,shares:Dict[str,Dict[str,float]] = None) -> Dict[str,MarketTrendEngine]:
+        return {name: MarketTrendEngine(name,list(histories),windows,slope_period,shares.get(name) if shares is not None else None,self.index_anchors.get(name)) for name, histories in markets.items()}
+
+    # Adds the bar of the given date to every market. prices maps tickers to
+    # their close across all markets. Engines hold their state in this
+    # process, so with a process executor they are updated here one by one.
+    def update_market_trends(self,engines:Dict[str,MarketTrendEngine],date:int,prices:Dict[str,float]) -> Dict[str,dict]:
+        items = list(engines.values())
+        if self.executor.uses_processes:
+            trends = [engine.update(date,prices) for engine in items]
+        else:
+            trends = self.executor.map(_update_market_trend,items,date,prices)
+        return dict(zip(engines,trends))
 
     # Takes in a stock ticker and will output the sentiment surrounding
     # the stock.
@@ -46,4 +137,41 @@ class Forecaster:
     # the markets.
     def generate_market_sentiment(markets:set = set()) -> str:
         pass
-        
\ No newline at end of file
+        
+
+# Fits an AR(order) model with an intercept to the log returns of every
+# column of a (time x ticker) close panel and returns each ticker's close
+# forecasted steps bars ahead. Rows with missing data are left out of each
+# ticker's fit, so histories of different lengths share one panel.
+def forecast_closes(closes: numpy.ndarray, order: int, steps: int, ridge: float = 1e-8) -> numpy.ndarray:
+    with numpy.errstate(divide='ignore',invalid='ignore'):
+        returns = numpy.diff(numpy.log(closes),axis=0)
+    rows, tickers = returns.shape
+    last_close = closes[-1]
+    if rows <= order:
+        return last_close.copy()
+
+    # design[t] holds [1, r(t-1), ..., r(t-order)] for the target r(t)
+    targets = returns[order:]
+    design = numpy.ones((rows - order,tickers,order + 1))
+    for lag in range(1,order + 1):
+        design[:,:,lag] = returns[order - lag:rows - lag]
+    valid = ~numpy.isnan(targets) & ~numpy.isnan(design).any(axis=2)
+    design = numpy.where(valid[:,:,None],design,0.0)
+    targets = numpy.where(valid,targets,0.0)
+
+    normal = numpy.einsum('tni,tnj->nij',design,design) + ridge * numpy.eye(order + 1)
+    coefficients = numpy.linalg.solve(normal,numpy.einsum('tni,tn->ni',design,targets)[:,:,None])[:,:,0]
+
+    # Roll the recursion forward for every ticker at once
+    lags = numpy.nan_to_num(returns[::-1][:order].T.copy())
+    total = numpy.zeros(tickers)
+    for _ in range(steps):
+        predicted = coefficients[:,0] + numpy.einsum('ni,ni->n',coefficients[:,1:],lags)
+        total += predicted
+        lags = numpy.concatenate((predicted[:,None],lags[:,:-1]),axis=1)
+    return last_close * numpy.exp(total)
+
+
+def _update_market_trend(engine: MarketTrendEngine, date: int, prices: Dict[str,float]) -> Dict[str,Any]:
+    return engine.update(date,prices)
@@ -0,0 +1,209 @@
+from ..models.history import PriceHistory
+from ..enums.enums import MovingAverageType
+from typing import List, Tuple
+import math
+import numpy
+
+
+# Indicators computed for a whole universe at once. Closes are lined up in a
+# 2-D (time x ticker) panel, right aligned on each ticker's latest candle and
+# padded with NaN where a ticker has less history, so every indicator is a
+# handful of numpy passes over the panel instead of one pandas call per ticker.
+
+EWM_TOLERANCE = 1e-12
+"""
+Weight below which older values are dropped from an exponential average.
+Keeps the panel short without changing results beyond float noise.
+"""
+
+
+# Number of rows an exponential average with the given alpha needs before
+# the weight of anything older falls under EWM_TOLERANCE.
+def ewm_lookback(alpha: float, tolerance: float = EWM_TOLERANCE) -> int:
+    if alpha >= 1.0:
+        return 1
+    return int(math.ceil(math.log(tolerance) / math.log(1.0 - alpha))) + 1
+
+
+# Number of rows the bollinger band and rsi calculations need to produce an
+# exact value for the latest candle.
+def bollinger_band_lookback(average_type: MovingAverageType, window: int, rsi_window: int) -> int:
+    if average_type == MovingAverageType.EXPONENTIAL:
+        average_rows = ewm_lookback(2.0 / (window + 1.0)) + window
+    else:
+        average_rows = 2 * window - 1
+    return max(average_rows,ewm_lookback(1.0 / rsi_window) + 1)
+
+
+def moving_average_lookback(average_type: MovingAverageType, window: int) -> int:
+    if average_type == MovingAverageType.EXPONENTIAL:
+        return ewm_lookback(2.0 / (window + 1.0))
+    return window
+
+
+# Builds the (rows x tickers) close panel from the last rows candles of each
+# history along with the date of each ticker's latest candle.
+def align_closes(histories: List[PriceHistory], rows: int) -> Tuple[numpy.ndarray,numpy.ndarray]:
+    panel = numpy.full((rows,len(histories)),numpy.nan)
+    last_dates = numpy.zeros(len(histories),dtype=numpy.int64)
+    for column, history in enumerate(histories):
+        closes = history.get_close()[-rows:]
+        if len(closes):
+            panel[rows - len(closes):,column] = closes
+            last_dates[column] = history.get_dates()[-1]
+    return panel, last_dates
+
+
+# Builds a (rows x tickers) close panel on a common timestamp grid made of
+# the latest rows dates seen across the histories. A ticker without a candle
+# at a grid date gets its previous close when forward_fill is set and NaN
+# otherwise. Returns the panel and the grid dates.
+def align_on_dates(histories: List[PriceHistory], rows: int, forward_fill: bool = True) -> Tuple[numpy.ndarray,numpy.ndarray]:
+    tails = [history.get_dates()[-rows:] for history in histories]
+    grid = numpy.unique(numpy.concatenate(tails)) if tails else numpy.empty(0,dtype=numpy.int64)
+    grid = grid[-rows:]
+    return align_on_grid(histories,grid,forward_fill), grid
+
+
+# Builds the (dates x tickers) close panel of the given sorted grid dates
+def align_on_grid(histories: List[PriceHistory], grid: numpy.ndarray, forward_fill: bool = True) -> numpy.ndarray:
+    panel = numpy.full((len(grid),len(histories)),numpy.nan)
+    for column, history in enumerate(histories):
+        dates = history.get_dates()
+        if len(dates) == 0 or len(grid) == 0:
+            continue
+        # Position of the latest candle at or before each grid date
+        positions = numpy.searchsorted(dates,grid,side='right') - 1
+        closes = history.get_close()[numpy.clip(positions,0,None)]
+        exact = (positions >= 0) & (dates[numpy.clip(positions,0,None)] == grid)
+        panel[:,column] = numpy.where((positions >= 0) & (exact | forward_fill),closes,numpy.nan)
+    return panel
+
+
+# The first non-NaN value of each column, or 0 for an empty column
+def _first_valid(values: numpy.ndarray) -> numpy.ndarray:
+    valid = ~numpy.isnan(values)
+    return numpy.where(valid.any(axis=0),values[valid.argmax(axis=0),numpy.arange(values.shape[1])],0.0)
+
+
+# Cumulative sums of the values, their squares and the count of non-NaN
+# values down each column, with a leading row of zeros so the sum over rows
+# [i, j) is sums[j] - sums[i]. Values are shifted by each column's first
+# valid value first to keep the sums small. Any rolling window length can be
+# read from the same sums.
+def cumulative_sums(values: numpy.ndarray) -> Tuple[numpy.ndarray,numpy.ndarray,numpy.ndarray]:
+    values = values if values.ndim == 2 else values.reshape(-1,1)
+    valid = ~numpy.isnan(values)
+    shifted = numpy.where(valid,values - _first_valid(values),0.0)
+    zeros = numpy.zeros((1,) + values.shape[1:])
+    sums = numpy.concatenate((zeros,numpy.cumsum(shifted,axis=0)))
+    sums_sq = numpy.concatenate((zeros,numpy.cumsum(shifted * shifted,axis=0)))
+    counts = numpy.concatenate((zeros,numpy.cumsum(valid,axis=0)))
+    return sums, sums_sq, counts
+
+
+def rolling_mean(values: numpy.ndarray, window: int, sums: Tuple = None) -> numpy.ndarray:
+    values = values if values.ndim == 2 else values.reshape(-1,1)
+    total, _, counts = sums if sums is not None else cumulative_sums(values)
+    out = numpy.full(values.shape,numpy.nan)
+    if len(values) >= window:
+        full = (counts[window:] - counts[:-window]) == window
+        out[window - 1:] = numpy.where(full,(total[window:] - total[:-window]) / window + _first_valid(values),numpy.nan)
+    return out
+
+
+# Sample (ddof=1) rolling standard deviation. A window of one bar has no
+# sample deviation and is NaN throughout, like pandas.
+def rolling_std(values: numpy.ndarray, window: int, sums: Tuple = None) -> numpy.ndarray:
+    values = values if values.ndim == 2 else values.reshape(-1,1)
+    total, total_sq, counts = sums if sums is not None else cumulative_sums(values)
+    out = numpy.full(values.shape,numpy.nan)
+    if window >= 2 and len(values) >= window:
+        window_sum = total[window:] - total[:-window]
+        variance = ((total_sq[window:] - total_sq[:-window]) - window_sum * window_sum / window) / (window - 1)
+        full = (counts[window:] - counts[:-window]) == window
+        out[window - 1:] = numpy.where(full,numpy.sqrt(numpy.clip(variance,0.0,None)),numpy.nan)
+    return out
+
+
+# Exponential average down each column, seeded by the first non-NaN value
+# or, when given, by the average the previous rows ended on (initial).
+# Matches pandas ewm(alpha=alpha, adjust=False).mean() for leading NaNs.
+# Rows are processed in blocks using the closed form of the recursion, with
+# blocks short enough that the scaling factors stay below 1e12.
+def ewm_mean(values: numpy.ndarray, alpha: float, initial: numpy.ndarray = None) -> numpy.ndarray:
+    values = values if values.ndim == 2 else values.reshape(-1,1)
+    valid = ~numpy.isnan(values)
+    seen = numpy.cumsum(valid,axis=0)
+    started = seen > 0
+    # Seeding the recursion at zero with the first value divided by alpha
+    # makes the first output equal the first value.
+    first = valid & (seen == 1)
+    carry = numpy.zeros(values.shape[1:])
+    if initial is not None:
+        initial = numpy.broadcast_to(numpy.asarray(initial,dtype=numpy.float64),values.shape[1:])
+        resumed = ~numpy.isnan(initial)
+        carry = numpy.where(resumed,initial,0.0)
+        started |= resumed
+        first &= ~resumed
+    if alpha >= 1.0:
+        return numpy.where(started,values,numpy.nan)
+    inputs = numpy.where(valid,values,0.0)
+    inputs = numpy.where(first,inputs / alpha,inputs)
+    decay = 1.0 - alpha
+    block = max(1,int(12.0 / -math.log10(decay)))
+    steps = numpy.arange(block)
+    inverse_powers = decay ** -steps.astype(numpy.float64)
+    powers = decay ** steps.astype(numpy.float64)
+    out = numpy.empty(values.shape)
+    for start in range(0,len(values),block):
+        chunk = inputs[start:start + block]
+        rows = len(chunk)
+        scaled = numpy.cumsum(chunk * inverse_powers[:rows,None],axis=0)
+        out[start:start + rows] = powers[:rows,None] * (decay * carry + alpha * scaled)
+        carry = out[start + rows - 1]
+    # Rows before a column starts stay NaN. Gaps after the start are not
+    # expected in candle data.
+    out[~started] = numpy.nan
+    return out
+
+
+def moving_average(values: numpy.ndarray, average_type: MovingAverageType, window: int) -> numpy.ndarray:
+    if average_type == MovingAverageType.EXPONENTIAL:
+        return ewm_mean(values,2.0 / (window + 1.0))
+    return rolling_mean(values,window)
+
+
+# Wilder rsi for every column. Matches Strategy.__generate_rsi
+def rsi(closes: numpy.ndarray, window: int) -> numpy.ndarray:
+    delta = numpy.full(closes.shape,numpy.nan)
+    delta[1:] = numpy.diff(closes,axis=0)
+    avg_gain = ewm_mean(numpy.clip(delta,0,None),1.0 / window)
+    avg_loss = ewm_mean(-numpy.clip(delta,None,0),1.0 / window)
+    with numpy.errstate(divide='ignore',invalid='ignore'):
+        return 100.0 - 100.0 / (1.0 + avg_gain / avg_loss)
+
+
+# Returns the moving average, upper band and lower band panels. The band
+# width is the rolling std of the close around the moving average, as in
+# Strategy.__bollinger_band_task
+def bollinger_bands(closes: numpy.ndarray, average_type: MovingAverageType, window: int, num_std: float) -> Tuple[numpy.ndarray,numpy.ndarray,numpy.ndarray]:
+    average = moving_average(closes,average_type,window)
+    std = rolling_std(closes - average,window)
+    return average, average + num_std * std, average - num_std * std
+
+
+# Latest close, lower band, upper band and rsi of a single close series.
+# Process pool workers call this on the tail of each ticker's closes.
+def latest_bollinger_band(closes: numpy.ndarray, average_type: MovingAverageType, window: int, num_std: float, rsi_window: int) -> Tuple[float,float,float,float]:
+    closes = closes.reshape(-1,1)
+    _, upper_band, lower_band = bollinger_bands(closes,average_type,window,num_std)
+    return float(closes[-1,0]), float(lower_band[-1,0]), float(upper_band[-1,0]), float(rsi(closes,rsi_window)[-1,0])
+
+
+# Latest close, fast average, slow average and rsi of a single close series
+def latest_dual_moving_average(closes: numpy.ndarray, average_type: MovingAverageType, fast_window: int, slow_window: int, rsi_window: int) -> Tuple[float,float,float,float]:
+    closes = closes.reshape(-1,1)
+    fast = moving_average(closes,average_type,fast_window)[-1,0]
+    slow = moving_average(closes,average_type,slow_window)[-1,0]
+    return float(closes[-1,0]), float(fast), float(slow), float(rsi(closes,rsi_window)[-1,0])
@@ -0,0 +1,180 @@
+from ..models.history import PriceHistory
+from ..enums.enums import MovingAverageType
+from . import batch
+from collections import OrderedDict
+from typing import Callable, Dict
+import threading
+import numpy
+
+
+# Closes match when they are equal or both missing
+def _same_close(first: float, second: float) -> bool:
+    return first == second or (first != first and second != second)
+
+
+class CachedSeries:
+    """
+    An indicator series computed for one version of a ticker's history,
+    stored in a buffer that can grow when new candles are appended
+    """
+    last_date: int
+    """
+    The date of the last candle the series was computed from
+    """
+    last_close: float
+    """
+    The close of that candle. A bar that is still forming keeps its date
+    while its close changes
+    """
+    version: int
+    """
+    The version of the history the series was computed from, for histories
+    that keep one (see ColumnarPriceHistory.version)
+    """
+    state: Dict[str,float]
+    """
+    Whatever the indicator needs to carry on from the last value, e.g. the
+    average gain and loss of the rsi
+    """
+    _buffer: numpy.ndarray
+    _size: int
+
+    def __init__(self, values: numpy.ndarray, last_date: int, state: Dict[str,float] = None) -> None:
+        self._buffer = numpy.array(values,dtype=numpy.float64)
+        self._size = len(values)
+        self.last_date = last_date
+        self.last_close = None
+        self.version = None
+        self.state = state if state is not None else dict()
+
+    def __len__(self) -> int: return self._size
+
+    def get_values(self) -> numpy.ndarray: return self._buffer[:self._size]
+
+    def extend(self, values: numpy.ndarray, last_date: int, last_close: float, version: int) -> None:
+        size = self._size
+        if size + len(values) > len(self._buffer):
+            grown = numpy.empty(max(16,2 * (size + len(values))))
+            grown[:size] = self._buffer[:size]
+            self._buffer = grown
+        self._buffer[size:size + len(values)] = values
+        self._size = size + len(values)
+        self.last_date = last_date
+        self.last_close = last_close
+        self.version = version
+
+
+class IndicatorCache:
+    """
+    Caches indicator series by ticker, frequency, indicator and parameters
+    with least recently used eviction. Each entry remembers the date and
+    close of the last candle it was computed from, and the history's version
+    when it has one. A lookup with the same last candle and version is a
+    hit. A lookup on a history that only appended candles since then
+    extends the cached series with the new candles instead of recomputing
+    it. Anything else, e.g. a forming bar rewritten in place, is a miss and
+    recomputes the whole series.
+
+    Series returned by the cache are shared and must not be modified.
+    """
+    max_entries: int
+    hits: int
+    misses: int
+    extensions: int
+    evictions: int
+    _entries: 'OrderedDict[tuple,CachedSeries]'
+    _lock: threading.Lock
+
+    def __init__(self, max_entries: int = 4096) -> None:
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.extensions = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int: return len(self._entries)
+
+    def get_stats(self) -> Dict[str,int]:
+        return {'entries': len(self._entries),'hits': self.hits,'misses': self.misses,'extensions': self.extensions,'evictions': self.evictions}
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def moving_average(self, history: PriceHistory, average_type: MovingAverageType, window: int) -> numpy.ndarray:
+        if average_type == MovingAverageType.EXPONENTIAL:
+            alpha = 2.0 / (window + 1.0)
+            return self.get(history,'ema',(window,),lambda closes: CachedSeries(batch.ewm_mean(closes,alpha)[:,0],None),
+                            lambda series, closes, first: batch.ewm_mean(closes[first:],alpha,series.get_values()[-1])[:,0])
+        return self.get(history,'sma',(window,),lambda closes: CachedSeries(batch.rolling_mean(closes,window)[:,0],None),
+                        lambda series, closes, first: batch.rolling_mean(closes[max(0,first - window + 1):],window)[-(len(closes) - first):,0])
+
+    # Rolling std of the close around its moving average, the width of the
+    # bollinger bands before it is multiplied by the number of deviations
+    def band_std(self, history: PriceHistory, average_type: MovingAverageType, window: int) -> numpy.ndarray:
+        average = self.moving_average(history,average_type,window)
+        return self.get(history,'band_std',(average_type.name,window),lambda closes: CachedSeries(batch.rolling_std(closes[:,0] - average,window)[:,0],None),
+                        lambda series, closes, first: batch.rolling_std(closes[max(0,first - window + 1):,0] - average[max(0,first - window + 1):],window)[-(len(closes) - first):,0])
+
+    def rsi(self, history: PriceHistory, window: int) -> numpy.ndarray:
+        return self.get(history,'rsi',(window,),lambda closes: self.__compute_rsi(closes,window),self.__extend_rsi(window))
+
+    # Returns the cached series for the history, extending or computing it
+    # when needed. compute(closes) builds a CachedSeries for the whole history;
+    # extend(series, closes, first) returns the values for closes[first:].
+    def get(self, history: PriceHistory, indicator: str, parameters: tuple, compute: Callable, extend: Callable) -> numpy.ndarray:
+        key = (history.get_ticker(),history.get_frequency_type(),history.get_frequency(),indicator,parameters)
+        size = len(history)
+        closes = history.get_close()
+        last_date = int(history.get_dates()[-1]) if size else None
+        last_close = float(closes[-1]) if size else None
+        version = getattr(history,'version',None)
+        with self._lock:
+            series = self._entries.get(key)
+            if series is not None:
+                self._entries.move_to_end(key)
+                if len(series) == size and series.last_date == last_date and _same_close(series.last_close,last_close) and series.version == version:
+                    self.hits += 1
+                    return series.get_values()
+                # Extending is cheap, so it is done under the lock to keep two
+                # threads from appending the same candles
+                if 0 < len(series) < size and int(history.get_dates()[len(series) - 1]) == series.last_date and _same_close(float(closes[len(series) - 1]),series.last_close):
+                    series.extend(extend(series,closes.reshape(-1,1),len(series)),last_date,last_close,version)
+                    self.extensions += 1
+                    return series.get_values()
+
+        series = compute(closes.reshape(-1,1))
+        series.last_date = last_date
+        series.last_close = last_close
+        series.version = version
+        with self._lock:
+            self.misses += 1
+            self._entries[key] = series
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return series.get_values()
+
+    def __compute_rsi(self, closes: numpy.ndarray, window: int) -> CachedSeries:
+        delta = numpy.full(closes.shape,numpy.nan)
+        delta[1:] = numpy.diff(closes,axis=0)
+        avg_gain = batch.ewm_mean(numpy.clip(delta,0,None),1.0 / window)[:,0]
+        avg_loss = batch.ewm_mean(-numpy.clip(delta,None,0),1.0 / window)[:,0]
+        state = {'avg_gain': avg_gain[-1] if len(avg_gain) else numpy.nan,'avg_loss': avg_loss[-1] if len(avg_loss) else numpy.nan}
+        return CachedSeries(self.__rsi_from_averages(avg_gain,avg_loss),None,state)
+
+    def __extend_rsi(self, window: int) -> Callable:
+        def extend(series: CachedSeries, closes: numpy.ndarray, first: int) -> numpy.ndarray:
+            delta = numpy.diff(closes[first - 1:],axis=0)
+            avg_gain = batch.ewm_mean(numpy.clip(delta,0,None),1.0 / window,series.state['avg_gain'])[:,0]
+            avg_loss = batch.ewm_mean(-numpy.clip(delta,None,0),1.0 / window,series.state['avg_loss'])[:,0]
+            series.state = {'avg_gain': avg_gain[-1],'avg_loss': avg_loss[-1]}
+            return self.__rsi_from_averages(avg_gain,avg_loss)
+        return extend
+
+    def __rsi_from_averages(self, avg_gain: numpy.ndarray, avg_loss: numpy.ndarray) -> numpy.ndarray:
+        with numpy.errstate(divide='ignore',invalid='ignore'):
+            return 100.0 - 100.0 / (1.0 + avg_gain / avg_loss)
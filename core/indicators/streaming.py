@@ -0,0 +1,389 @@
+from ..models.history import PriceHistory, Candle
+from ..enums.enums import MovingAverageType
+from abc import ABC, abstractmethod
+import math
+import numpy
+
+
+class StreamingIndicator(ABC):
+    """
+    Base class for indicators that are updated one value at a time. Each
+    update costs O(1) no matter how much history has been seen, so a live
+    feed only pays for the newest candle instead of the whole series.
+    """
+    value: float
+    """
+    The latest output of the indicator. NaN until enough values were seen
+    """
+    count: int
+    """
+    The number of values the indicator has consumed
+    """
+
+    def __init__(self) -> None:
+        self.value = math.nan
+        self.count = 0
+
+    @abstractmethod
+    def update(self, value: float) -> float:
+        ...
+
+    def update_candle(self, candle: Candle) -> float:
+        return self.update(candle.close)
+
+    # Replays the closes of a price history through the indicator so it
+    # can continue from the latest candle.
+    def seed(self, history: PriceHistory) -> 'StreamingIndicator':
+        for close in history.get_close().tolist():
+            self.update(close)
+        return self
+
+    def is_ready(self) -> bool:
+        return not math.isnan(self.value)
+
+
+class StreamingSMA(StreamingIndicator):
+    """
+    Simple moving average over the last window values. Matches
+    pandas.Series.rolling(window).mean()
+    """
+    window: int
+    _ring: numpy.ndarray
+    _sum: float
+
+    def __init__(self, window: int) -> None:
+        super().__init__()
+        self.window = int(window)
+        if self.window < 1:
+            raise ValueError(f'[ERROR]: Moving average window must be positive, got {window}')
+        self._ring = numpy.zeros(self.window,dtype=numpy.float64)
+        self._sum = 0.0
+
+    def update(self, value: float) -> float:
+        slot = self.count % self.window
+        self._sum += value - self._ring[slot]
+        self._ring[slot] = value
+        self.count += 1
+        if self.count >= self.window:
+            # Re-sum once per lap of the ring so rounding error cannot build up
+            if slot == self.window - 1:
+                self._sum = float(self._ring.sum())
+            self.value = self._sum / self.window
+        return self.value
+
+
+class StreamingEMA(StreamingIndicator):
+    """
+    Exponential moving average. Matches
+    pandas.Series.ewm(span=window, adjust=False).mean() unless an alpha is
+    passed directly.
+    """
+    alpha: float
+
+    def __init__(self, window: int, alpha: float = None) -> None:
+        super().__init__()
+        self.alpha = alpha if alpha is not None else 2.0 / (window + 1.0)
+
+    def update(self, value: float) -> float:
+        if self.count == 0:
+            self.value = value
+        else:
+            self.value += self.alpha * (value - self.value)
+        self.count += 1
+        return self.value
+
+
+class RollingVariance(StreamingIndicator):
+    """
+    Sample variance (ddof=1) over the last window values, kept from running
+    sums of the values and their squares. Matches
+    pandas.Series.rolling(window).var()
+    """
+    window: int
+    _ring: numpy.ndarray
+    _sum: float
+    _sum_sq: float
+
+    def __init__(self, window: int) -> None:
+        super().__init__()
+        self.window = int(window)
+        if self.window < 2:
+            raise ValueError(f'[ERROR]: Variance window must be at least 2, got {window}')
+        self._ring = numpy.zeros(self.window,dtype=numpy.float64)
+        self._sum = 0.0
+        self._sum_sq = 0.0
+
+    def update(self, value: float) -> float:
+        slot = self.count % self.window
+        old = self._ring[slot]
+        self._ring[slot] = value
+        self.count += 1
+        if slot == self.window - 1:
+            self._sum = float(self._ring.sum())
+            self._sum_sq = float(numpy.dot(self._ring,self._ring))
+        else:
+            self._sum += value - old
+            self._sum_sq += value * value - old * old
+        if self.count >= self.window:
+            n = self.window
+            self.value = max((self._sum_sq - self._sum * self._sum / n) / (n - 1),0.0)
+        return self.value
+
+    def get_std(self) -> float:
+        return math.sqrt(self.value) if self.is_ready() else math.nan
+
+
+class StreamingBollingerBands(StreamingIndicator):
+    """
+    Bollinger bands on top of a streaming moving average. Like the band
+    calculation in Strategy, the width is the rolling standard deviation of
+    the close around the moving average. value holds the moving average.
+    """
+    average: StreamingIndicator
+    deviation: RollingVariance
+    num_std: float
+    upper_band: float
+    lower_band: float
+
+    def __init__(self, average_type: MovingAverageType, window: int, num_std: float = 2) -> None:
+        super().__init__()
+        self.average = create_moving_average(average_type,window)
+        self.deviation = RollingVariance(window)
+        self.num_std = num_std
+        self.upper_band = math.nan
+        self.lower_band = math.nan
+
+    def update(self, value: float) -> float:
+        average = self.average.update(value)
+        self.count += 1
+        self.value = average
+        if math.isnan(average):
+            return self.value
+        self.deviation.update(value - average)
+        width = self.num_std * self.deviation.get_std()
+        self.upper_band = average + width
+        self.lower_band = average - width
+        return self.value
+
+
+class StreamingRSI(StreamingIndicator):
+    """
+    Relative strength index using Wilder smoothing. Matches the ewm based
+    calculation in Strategy.__generate_rsi
+    """
+    window: int
+    avg_gain: StreamingEMA
+    avg_loss: StreamingEMA
+    _previous: float
+
+    def __init__(self, window: int = 14) -> None:
+        super().__init__()
+        self.window = window
+        self.avg_gain = StreamingEMA(window,alpha=1.0 / window)
+        self.avg_loss = StreamingEMA(window,alpha=1.0 / window)
+        self._previous = math.nan
+
+    def update(self, value: float) -> float:
+        previous = self._previous
+        self._previous = value
+        self.count += 1
+        if math.isnan(previous):
+            return self.value
+        delta = value - previous
+        gain = self.avg_gain.update(delta if delta > 0 else 0.0)
+        loss = self.avg_loss.update(-delta if delta < 0 else 0.0)
+        if loss == 0.0:
+            self.value = 100.0 if gain > 0.0 else math.nan
+        else:
+            self.value = 100.0 - 100.0 / (1.0 + gain / loss)
+        return self.value
+
+
+def create_moving_average(average_type: MovingAverageType, window: int) -> StreamingIndicator:
+    if average_type == MovingAverageType.EXPONENTIAL:
+        return StreamingEMA(window)
+    return StreamingSMA(window)
+
+
+class BollingerBandState:
+    """
+    The streaming state the bollinger band strategy needs for one ticker
+    """
+    ticker: str
+    bands: StreamingBollingerBands
+    rsi: StreamingRSI
+    close: float
+    date: int
+
+    def __init__(self, ticker: str, average_type: MovingAverageType, window: int, std: float = 2, rsi_val: int = 14) -> None:
+        self.ticker = ticker
+        self.bands = StreamingBollingerBands(average_type,window,std)
+        self.rsi = StreamingRSI(rsi_val)
+        self.close = math.nan
+        self.date = None
+
+    def seed(self, history: PriceHistory) -> 'BollingerBandState':
+        closes = history.get_close()
+        for close in closes.tolist():
+            self.bands.update(close)
+            self.rsi.update(close)
+        if len(closes):
+            self.close = float(closes[-1])
+            self.date = int(history.get_dates()[-1])
+        return self
+
+    def update(self, candle: Candle) -> None:
+        self.bands.update(candle.close)
+        self.rsi.update(candle.close)
+        self.close = candle.close
+        self.date = candle.date
+
+
+class DualMovingAverageState:
+    """
+    The streaming state the dual moving average strategy needs for one ticker
+    """
+    ticker: str
+    fast_average: StreamingIndicator
+    slow_average: StreamingIndicator
+    rsi: StreamingRSI
+    close: float
+    date: int
+
+    def __init__(self, ticker: str, average_type: MovingAverageType, fast_window: int, slow_window: int, rsi_val: int = 14) -> None:
+        self.ticker = ticker
+        self.fast_average = create_moving_average(average_type,fast_window)
+        self.slow_average = create_moving_average(average_type,slow_window)
+        self.rsi = StreamingRSI(rsi_val)
+        self.close = math.nan
+        self.date = None
+
+    def seed(self, history: PriceHistory) -> 'DualMovingAverageState':
+        closes = history.get_close()
+        for close in closes.tolist():
+            self.fast_average.update(close)
+            self.slow_average.update(close)
+            self.rsi.update(close)
+        if len(closes):
+            self.close = float(closes[-1])
+            self.date = int(history.get_dates()[-1])
+        return self
+
+    def update(self, candle: Candle) -> None:
+        self.fast_average.update(candle.close)
+        self.slow_average.update(candle.close)
+        self.rsi.update(candle.close)
+        self.close = candle.close
+        self.date = candle.date
+
+
+class ScalpingState:
+    """
+    The streaming state the scalping strategy needs for one ticker. The
+    closes, volumes and typical price * volume of the last bars sit in
+    preallocated ring buffers, with running sums for the vwap and average
+    volume windows, so every signal is updated in O(1) per bar:
+
+    momentum is the return over the last momentum_window bars, vwap_deviation
+    is how far the close is above (positive) or below the vwap of the last
+    vwap_window bars, and volume_ratio is the bar's volume over the average
+    volume of the volume_window bars before it.
+    """
+    ticker: str
+    momentum_window: int
+    vwap_window: int
+    volume_window: int
+    close: float
+    date: int
+    count: int
+    momentum: float
+    vwap: float
+    vwap_deviation: float
+    volume_ratio: float
+    _size: int
+    _closes: numpy.ndarray
+    _volumes: numpy.ndarray
+    _price_volumes: numpy.ndarray
+    _vwap_price_volume: float
+    _vwap_volume: float
+    _window_volume: float
+
+    def __init__(self, ticker: str, momentum_window: int = 5, vwap_window: int = 20, volume_window: int = 20) -> None:
+        if min(momentum_window,vwap_window,volume_window) < 1:
+            raise ValueError(f'[ERROR]: Scalping windows must be positive, got {(momentum_window,vwap_window,volume_window)}')
+        self.ticker = ticker
+        self.momentum_window = int(momentum_window)
+        self.vwap_window = int(vwap_window)
+        self.volume_window = int(volume_window)
+        self._size = max(self.momentum_window,self.vwap_window,self.volume_window)
+        self._closes = numpy.zeros(self._size,dtype=numpy.float64)
+        self._volumes = numpy.zeros(self._size,dtype=numpy.float64)
+        self._price_volumes = numpy.zeros(self._size,dtype=numpy.float64)
+        self._vwap_price_volume = 0.0
+        self._vwap_volume = 0.0
+        self._window_volume = 0.0
+        self.close = math.nan
+        self.date = None
+        self.count = 0
+        self.momentum = math.nan
+        self.vwap = math.nan
+        self.vwap_deviation = math.nan
+        self.volume_ratio = math.nan
+
+    # Only the bars the windows can still see are replayed, plus the one
+    # before them that momentum and volume_ratio compare against
+    def seed(self, history: PriceHistory) -> 'ScalpingState':
+        columns = history.get_columns()
+        tail = slice(-(self._size + 1),None)
+        for close, high, low, volume, date in zip(columns['close'][tail].tolist(),columns['high'][tail].tolist(),columns['low'][tail].tolist(),columns['volume'][tail].tolist(),columns['date'][tail].tolist()):
+            self.update_values(close,high,low,volume,date)
+        return self
+
+    def update(self, candle: Candle) -> None:
+        self.update_values(candle.close,candle.high,candle.low,candle.volume,candle.date)
+
+    def update_values(self, close: float, high: float, low: float, volume: float, date: int) -> None:
+        count = self.count
+        size = self._size
+        price_volume = (high + low + close) / 3.0 * volume
+
+        if count >= self.momentum_window:
+            self.momentum = close / self._closes[(count - self.momentum_window) % size] - 1.0
+
+        self._vwap_price_volume += price_volume
+        self._vwap_volume += volume
+        if count >= self.vwap_window:
+            leaving = (count - self.vwap_window) % size
+            self._vwap_price_volume -= self._price_volumes[leaving]
+            self._vwap_volume -= self._volumes[leaving]
+        if self._vwap_volume > 0:
+            self.vwap = self._vwap_price_volume / self._vwap_volume
+            self.vwap_deviation = close / self.vwap - 1.0
+
+        # The ratio compares against the bars before this one, so the window
+        # sum is moved forward only afterwards
+        if count >= self.volume_window:
+            self.volume_ratio = volume * self.volume_window / self._window_volume if self._window_volume > 0 else math.nan
+            self._window_volume -= self._volumes[(count - self.volume_window) % size]
+        self._window_volume += volume
+
+        slot = count % size
+        self._closes[slot] = close
+        self._volumes[slot] = volume
+        self._price_volumes[slot] = price_volume
+        self.count = count + 1
+        self.close = close
+        self.date = date
+        # Re-sum once per lap of the ring so rounding error cannot build up
+        if slot == size - 1:
+            self.__resum()
+
+    def is_ready(self) -> bool:
+        return not (math.isnan(self.momentum) or math.isnan(self.vwap_deviation) or math.isnan(self.volume_ratio))
+
+    def __resum(self) -> None:
+        vwap_slots = (self.count - 1 - numpy.arange(min(self.count,self.vwap_window))) % self._size
+        volume_slots = (self.count - 1 - numpy.arange(min(self.count,self.volume_window))) % self._size
+        self._vwap_price_volume = float(self._price_volumes[vwap_slots].sum())
+        self._vwap_volume = float(self._volumes[vwap_slots].sum())
+        self._window_volume = float(self._volumes[volume_slots].sum())
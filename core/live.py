@@ -0,0 +1,328 @@
+from .models.history import PriceHistory, ColumnarPriceHistory, Candle
+from .models.portfolio import Portfolio
+from .enums.enums import TradeSignal, MovingAverageType, FrequencyType
+from .indicators.streaming import BollingerBandState, DualMovingAverageState, ScalpingState
+from .strategy import Strategy
+from abc import ABC, abstractmethod
+from collections import deque
+from typing import AsyncIterator, Awaitable, Callable, Deque, Dict, List, Tuple, Union
+import asyncio
+import contextlib
+import csv
+import inspect
+import time
+
+
+class CandleSource(ABC):
+    """
+    An asynchronous feed of (ticker, candle) updates
+    """
+
+    @abstractmethod
+    def stream(self) -> AsyncIterator[Tuple[str,Candle]]:
+        ...
+
+
+class QueueSource(CandleSource):
+    """
+    An in-process feed. Producers call put() and close() when done. Useful
+    for tests and for bridging a websocket client running in the same loop.
+    """
+    _queue: asyncio.Queue
+
+    _CLOSED = object()
+
+    def __init__(self, maxsize: int = 0) -> None:
+        self._queue = asyncio.Queue(maxsize)
+
+    async def put(self, ticker: str, candle: Candle) -> None:
+        await self._queue.put((ticker,candle))
+
+    async def close(self) -> None:
+        await self._queue.put(self._CLOSED)
+
+    async def stream(self) -> AsyncIterator[Tuple[str,Candle]]:
+        while True:
+            item = await self._queue.get()
+            if item is self._CLOSED:
+                return
+            yield item
+
+
+class ReplaySource(CandleSource):
+    """
+    Replays candles from a csv file with the columns
+    ticker,open,close,low,high,volume,date in date order. With a speed the
+    gaps between candle dates are replayed, divided by speed; without one
+    the file is replayed as fast as it can be read.
+    """
+    path: str
+    speed: float
+
+    def __init__(self, path: str, speed: float = None) -> None:
+        self.path = path
+        self.speed = speed
+
+    async def stream(self) -> AsyncIterator[Tuple[str,Candle]]:
+        previous_date = None
+        with open(self.path,newline='') as file:
+            for count, row in enumerate(csv.DictReader(file)):
+                candle = Candle(float(row['open']),float(row['close']),float(row['low']),float(row['high']),float(row['volume']),int(row['date']))
+                if self.speed and previous_date is not None and candle.date > previous_date:
+                    await asyncio.sleep((candle.date - previous_date) / 1000.0 / self.speed)
+                elif count % 256 == 0:
+                    # Let the rest of the loop run while reading a large file
+                    await asyncio.sleep(0)
+                previous_date = candle.date
+                yield row['ticker'], candle
+
+
+class LiveStrategy(ABC):
+    """
+    A strategy the live runtime evaluates for the tickers whose data changed.
+    new_candles holds the candles each ticker received since the last
+    evaluation; they are already appended to its history.
+    """
+
+    @abstractmethod
+    def evaluate(self, histories: List[PriceHistory], new_candles: Dict[str,List[Candle]]) -> List[Tuple[PriceHistory, TradeSignal, int]]:
+        ...
+
+
+class BollingerBandStream(LiveStrategy):
+    """
+    Runs the bollinger band strategy on streaming indicator state, so each
+    new candle costs O(1) no matter how long the history is
+    """
+    strategy: Strategy
+    portfolio: Portfolio
+    triggers: dict
+    states: Dict[str,BollingerBandState]
+
+    def __init__(self, strategy: Strategy, portfolio: Portfolio, triggers: dict, average_type: MovingAverageType = MovingAverageType.SIMPLE, window: int = 20, std: int = 2, rsi_window: int = 14, rsi_upper_bound: float = 70.0, rsi_lower_bound: float = 30.0) -> None:
+        self.strategy = strategy
+        self.portfolio = portfolio
+        self.triggers = triggers
+        self.average_type = average_type
+        self.window = window
+        self.std = std
+        self.rsi_window = rsi_window
+        self.rsi_upper_bound = rsi_upper_bound
+        self.rsi_lower_bound = rsi_lower_bound
+        self.states = dict()
+
+    def evaluate(self, histories: List[PriceHistory], new_candles: Dict[str,List[Candle]]) -> List[Tuple[PriceHistory, TradeSignal, int]]:
+        results: List[Tuple[PriceHistory, TradeSignal, int]] = []
+        for history in histories:
+            state = self.states.get(history.get_ticker())
+            if state is None:
+                # Seeding reads the whole history, new candles included
+                state = self.states[history.get_ticker()] = self.strategy.create_bollinger_band_stream(history,self.average_type,self.window,self.std,self.rsi_window)
+            else:
+                for candle in new_candles[history.get_ticker()]:
+                    state.update(candle)
+            signal, date = self.strategy.execute_bollinger_band_stream(self.portfolio,state,self.triggers,None,self.rsi_upper_bound,self.rsi_lower_bound)
+            results.append((history,signal,date))
+        return results
+
+
+class DualMovingAverageStream(LiveStrategy):
+    """
+    Runs the dual moving average strategy on streaming indicator state
+    """
+    strategy: Strategy
+    portfolio: Portfolio
+    triggers: dict
+    states: Dict[str,DualMovingAverageState]
+
+    def __init__(self, strategy: Strategy, portfolio: Portfolio, triggers: dict, average_type: MovingAverageType = MovingAverageType.SIMPLE, fast_window: int = 50, slow_window: int = 200, rsi_window: int = 14, rsi_upper_bound: float = 70.0, rsi_lower_bound: float = 30.0) -> None:
+        self.strategy = strategy
+        self.portfolio = portfolio
+        self.triggers = triggers
+        self.average_type = average_type
+        self.fast_window = fast_window
+        self.slow_window = slow_window
+        self.rsi_window = rsi_window
+        self.rsi_upper_bound = rsi_upper_bound
+        self.rsi_lower_bound = rsi_lower_bound
+        self.states = dict()
+
+    def evaluate(self, histories: List[PriceHistory], new_candles: Dict[str,List[Candle]]) -> List[Tuple[PriceHistory, TradeSignal, int]]:
+        results: List[Tuple[PriceHistory, TradeSignal, int]] = []
+        for history in histories:
+            state = self.states.get(history.get_ticker())
+            if state is None:
+                state = self.states[history.get_ticker()] = self.strategy.create_dual_moving_average_stream(history,self.average_type,self.fast_window,self.slow_window,self.rsi_window)
+            else:
+                for candle in new_candles[history.get_ticker()]:
+                    state.update(candle)
+            signal, date = self.strategy.execute_dual_moving_average_stream(self.portfolio,state,self.triggers,None,self.rsi_upper_bound,self.rsi_lower_bound)
+            results.append((history,signal,date))
+        return results
+
+
+class ScalpingStream(LiveStrategy):
+    """
+    Runs the scalping strategy on streaming state, deciding on every candle
+    a ticker receives in O(1)
+    """
+    strategy: Strategy
+    portfolio: Portfolio
+    states: Dict[str,ScalpingState]
+
+    def __init__(self, strategy: Strategy, portfolio: Portfolio, momentum_window: int = 5, vwap_window: int = 20, volume_window: int = 20, momentum_threshold: float = 0.001, vwap_threshold: float = 0.002, volume_spike: float = 2.0) -> None:
+        self.strategy = strategy
+        self.portfolio = portfolio
+        self.momentum_window = momentum_window
+        self.vwap_window = vwap_window
+        self.volume_window = volume_window
+        self.momentum_threshold = momentum_threshold
+        self.vwap_threshold = vwap_threshold
+        self.volume_spike = volume_spike
+        self.states = dict()
+
+    def evaluate(self, histories: List[PriceHistory], new_candles: Dict[str,List[Candle]]) -> List[Tuple[PriceHistory, TradeSignal, int]]:
+        results: List[Tuple[PriceHistory, TradeSignal, int]] = []
+        for history in histories:
+            state = self.states.get(history.get_ticker())
+            if state is None:
+                state = self.states[history.get_ticker()] = self.strategy.create_scalping_stream(history,self.momentum_window,self.vwap_window,self.volume_window)
+            else:
+                for candle in new_candles[history.get_ticker()]:
+                    state.update(candle)
+            signal, date = self.strategy.execute_scalping_stream(self.portfolio,state,None,self.momentum_threshold,self.vwap_threshold,self.volume_spike)
+            results.append((history,signal,date))
+        return results
+
+
+class LiveRuntime:
+    """
+    Drives strategies from a live candle source. A reader task moves updates
+    from the source into a bounded queue; when the queue is full the reader
+    waits, which pushes back on the source. The evaluator drains everything
+    that is waiting, up to max_batch updates, appends the candles to each
+    ticker's history and evaluates the strategies once for the tickers that
+    changed, so a burst of updates to one ticker costs one evaluation.
+
+    Columnar histories handed to the runtime are appended to in place.
+    """
+    source: CandleSource
+    strategies: List[LiveStrategy]
+    histories: Dict[str,ColumnarPriceHistory]
+    on_signals: Callable[[List[Tuple[PriceHistory, TradeSignal, int]]],Union[None,Awaitable[None]]]
+    """
+    Called with the results of every evaluation. May be a coroutine function
+    """
+    max_pending: int
+    max_batch: int
+    latencies: Deque[float]
+    """
+    Seconds from an update being read to its signals being handed to
+    on_signals, for the most recent updates
+    """
+    frequency_type: FrequencyType
+    """
+    The frequency given to histories of tickers first seen on the feed
+    """
+    frequency: int
+    evaluations: int
+    updates: int
+    """
+    Candles appended to the histories and evaluated
+    """
+    dropped: int
+    """
+    Late or repeated candles skipped because they are not newer than their
+    ticker's last candle
+    """
+
+    def __init__(self, source: CandleSource, strategies: List[LiveStrategy], histories: List[PriceHistory] = None, on_signals: Callable = None, max_pending: int = 10000, max_batch: int = 1000, frequency_type: FrequencyType = FrequencyType.MINUTE, frequency: int = 1) -> None:
+        self.source = source
+        self.strategies = strategies
+        self.histories = {history.get_ticker(): ColumnarPriceHistory.from_history(history) for history in (histories if histories is not None else [])}
+        self.on_signals = on_signals
+        self.max_pending = max_pending
+        self.max_batch = max_batch
+        self.latencies = deque(maxlen=10000)
+        self.frequency_type = frequency_type
+        self.frequency = frequency
+        self.evaluations = 0
+        self.updates = 0
+        self.dropped = 0
+
+    def get_history(self, ticker: str) -> ColumnarPriceHistory:
+        history = self.histories.get(ticker)
+        if history is None:
+            history = self.histories[ticker] = ColumnarPriceHistory(ticker,[],frequency_type=self.frequency_type,frequency=self.frequency)
+        return history
+
+    # Runs until the source is exhausted and every update is evaluated. An
+    # error raised by the source is raised here once the updates read
+    # before it are evaluated. An error raised by a strategy stops the
+    # reader and is raised here once the reader has finished.
+    async def run(self) -> None:
+        queue: asyncio.Queue = asyncio.Queue(self.max_pending)
+        reader = asyncio.ensure_future(self.__read(queue))
+        try:
+            await self.__evaluate(queue)
+        except BaseException:
+            reader.cancel()
+            # The strategy's error wins over anything the reader raised
+            with contextlib.suppress(asyncio.CancelledError,Exception):
+                await reader
+            raise
+        await reader
+
+    async def __read(self, queue: asyncio.Queue) -> None:
+        cancelled = False
+        try:
+            async for ticker, candle in self.source.stream():
+                await queue.put((ticker,candle,time.perf_counter()))
+        except asyncio.CancelledError:
+            cancelled = True
+            raise
+        finally:
+            # Nobody reads the end marker once the runtime has cancelled the
+            # reader, and a full queue would block on it forever
+            if not cancelled:
+                await queue.put(None)
+
+    async def __evaluate(self, queue: asyncio.Queue) -> None:
+        finished = False
+        while not finished:
+            updates = [await queue.get()]
+            while len(updates) < self.max_batch and not queue.empty():
+                updates.append(queue.get_nowait())
+            if updates[-1] is None:
+                finished = True
+                updates.pop()
+            if not updates:
+                continue
+
+            new_candles: Dict[str,List[Candle]] = dict()
+            for ticker, candle, _ in updates:
+                history = self.get_history(ticker)
+                # Late or repeated candles would corrupt the streaming state
+                if len(history) and candle.date <= history.get_dates()[-1]:
+                    self.dropped += 1
+                    continue
+                history.append(candle)
+                new_candles.setdefault(ticker,[]).append(candle)
+            if not new_candles:
+                continue
+
+            changed = [self.histories[ticker] for ticker in new_candles]
+            results: List[Tuple[PriceHistory, TradeSignal, int]] = []
+            for strategy in self.strategies:
+                results.extend(strategy.evaluate(changed,new_candles))
+            self.evaluations += 1
+            self.updates += sum(len(candles) for candles in new_candles.values())
+
+            if self.on_signals is not None:
+                handled = self.on_signals(results)
+                if inspect.isawaitable(handled):
+                    await handled
+            now = time.perf_counter()
+            self.latencies.extend(now - received for _, _, received in updates)
+            # Give the reader a chance to refill the queue between batches
+            await asyncio.sleep(0)
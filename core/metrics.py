@@ -0,0 +1,182 @@
+from typing import Any, Dict, List
+import itertools
+import json
+import threading
+import time
+import numpy
+
+
+class StageStats:
+    """
+    Running statistics of one timed stage. Count, total, min and max cover
+    every sample, percentiles come from the most recent `reservoir_size`
+    samples so memory stays fixed however long the process runs
+    """
+    count: int
+    total: float
+    min: float
+    max: float
+    _recent: numpy.ndarray
+    _position: int
+
+    def __init__(self, reservoir_size: int = 1024) -> None:
+        self.count = 0
+        self.total = 0.0
+        self.min = float('inf')
+        self.max = 0.0
+        self._recent = numpy.empty(reservoir_size,dtype=numpy.float64)
+        self._position = 0
+
+    def add(self, seconds: float) -> None:
+        self.count += 1
+        self.total += seconds
+        if seconds < self.min:
+            self.min = seconds
+        if seconds > self.max:
+            self.max = seconds
+        self._recent[self._position % len(self._recent)] = seconds
+        self._position += 1
+
+    def to_dict(self) -> Dict[str,float]:
+        if self.count == 0:
+            return {'count': 0}
+        recent = self._recent[:min(self._position,len(self._recent))]
+        p50, p90, p99 = numpy.percentile(recent,(50,90,99))
+        return {
+            'count': self.count,
+            'total_seconds': self.total,
+            'mean_seconds': self.total / self.count,
+            'min_seconds': self.min,
+            'max_seconds': self.max,
+            'p50_seconds': float(p50),
+            'p90_seconds': float(p90),
+            'p99_seconds': float(p99),
+        }
+
+
+class StageTimer:
+    """
+    Times consecutive stages of one unit of work. Each mark() closes the
+    stage that started at the previous mark (or at creation) and the
+    durations are handed to the registry together on finish(), taking the
+    registry lock once per unit of work instead of once per stage
+    """
+    registry: 'MetricsRegistry'
+    scope: str
+    _last: float
+    _stages: List
+
+    def __init__(self, registry: 'MetricsRegistry', scope: str) -> None:
+        self.registry = registry
+        self.scope = scope
+        self._stages = list()
+        self._last = time.perf_counter()
+
+    def mark(self, stage: str) -> None:
+        now = time.perf_counter()
+        self._stages.append((stage,now - self._last))
+        self._last = now
+
+    def finish(self) -> None:
+        self.registry.record_stages(self.scope,self._stages)
+
+
+class NullTimer:
+    """
+    Stands in for a StageTimer when metrics are off or the call was not
+    sampled, so instrumented code never has to check
+    """
+
+    def mark(self, stage: str) -> None:
+        pass
+
+    def finish(self) -> None:
+        pass
+
+
+NULL_TIMER = NullTimer()
+
+
+class MetricsRegistry:
+    """
+    In process registry of stage timings and counters. Timings are grouped
+    by scope (e.g. the strategy task) and stage (e.g. rsi), counters by name
+    and optionally by ticker. Counters are always exact, timings can be
+    sampled so only one unit of work in every 1 / sample_rate is timed.
+    Safe to share between threads. Work run on a ProcessExecutor records into
+    the worker's own registry and is not seen here.
+    """
+    sample_rate: float
+    reservoir_size: int
+    _sample_every: int
+    _calls: itertools.count
+    _stages: Dict[str,Dict[str,StageStats]]
+    _counters: Dict[str,int]
+    _ticker_counters: Dict[str,Dict[str,int]]
+    _lock: threading.Lock
+
+    def __init__(self, sample_rate: float = 1.0, reservoir_size: int = 1024) -> None:
+        if not 0 < sample_rate <= 1:
+            raise ValueError(f'[ERROR]: sample_rate must be in (0, 1], got {sample_rate}')
+        self.sample_rate = sample_rate
+        self.reservoir_size = reservoir_size
+        self._sample_every = max(1,round(1 / sample_rate))
+        self._calls = itertools.count()
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stages = dict()
+            self._counters = dict()
+            self._ticker_counters = dict()
+
+    # Returns a timer for one unit of work, or the no-op timer when this
+    # unit falls outside the sample
+    def start_timer(self, scope: str) -> StageTimer:
+        if self._sample_every > 1 and next(self._calls) % self._sample_every:
+            return NULL_TIMER
+        return StageTimer(self,scope)
+
+    def record_stages(self, scope: str, stages: List) -> None:
+        with self._lock:
+            scope_stats = self._stages.setdefault(scope,dict())
+            for stage, seconds in stages:
+                stats = scope_stats.get(stage)
+                if stats is None:
+                    stats = scope_stats[stage] = StageStats(self.reservoir_size)
+                stats.add(seconds)
+
+    def record_time(self, scope: str, stage: str, seconds: float) -> None:
+        self.record_stages(scope,[(stage,seconds)])
+
+    def increment(self, name: str, ticker: str = None, amount: int = 1) -> None:
+        with self._lock:
+            self._counters[name] = self._counters.get(name,0) + amount
+            if ticker is not None:
+                per_ticker = self._ticker_counters.setdefault(name,dict())
+                per_ticker[ticker] = per_ticker.get(ticker,0) + amount
+
+    def get_counter(self, name: str, ticker: str = None) -> int:
+        with self._lock:
+            if ticker is None:
+                return self._counters.get(name,0)
+            return self._ticker_counters.get(name,dict()).get(ticker,0)
+
+    # A point in time copy of everything recorded, made of plain dicts and
+    # numbers so it can be serialized as is
+    def snapshot(self) -> Dict[str,Any]:
+        with self._lock:
+            return {
+                'created': time.time(),
+                'sample_rate': self.sample_rate,
+                'timings': {scope: {stage: stats.to_dict() for stage, stats in stages.items()} for scope, stages in self._stages.items()},
+                'counters': dict(self._counters),
+                'ticker_counters': {name: dict(per_ticker) for name, per_ticker in self._ticker_counters.items()},
+            }
+
+    def export(self, path: str) -> Dict[str,Any]:
+        snapshot = self.snapshot()
+        with open(path,'w') as file:
+            json.dump(snapshot,file,indent=2)
+        return snapshot
@@ -1,6 +1,10 @@
-from typing import List
+from typing import TYPE_CHECKING, Dict, Iterable, List
 from datetime import datetime
-from enums.enums import *
+from ..enums.enums import *
+import numpy
+
+if TYPE_CHECKING:
+    import pandas
 
 class Candle:
     """
@@ -21,6 +25,17 @@ class Candle:
         self.volume = volume
         self.date = date
 
+CANDLE_COLUMNS = ('open','close','low','high','volume','date')
+"""
+The column order used by every array-backed representation of a candle
+"""
+
+# Converts a list of candles into one numpy array per candle field
+def candles_to_columns(candles: List[Candle]) -> Dict[str,numpy.ndarray]:
+    columns = {name: numpy.fromiter((getattr(candle,name) for candle in candles),dtype=numpy.float64,count=len(candles)) for name in CANDLE_COLUMNS[:-1]}
+    columns['date'] = numpy.fromiter((candle.date for candle in candles),dtype=numpy.int64,count=len(candles))
+    return columns
+
 class PriceHistory:
     """
     Historical Price data for a given stock
@@ -64,6 +79,7 @@ class PriceHistory:
         self.ticker = ticker
         self.frequency_type = frequency_type
         self.interval = frequency
+        self.frequency = frequency
         self.period = period
         self.period_type = period_type
         self.candles = info
@@ -75,6 +91,8 @@ class PriceHistory:
         dt = datetime.strptime(date_string, "%Y-%m-%d %H:%M:%S.%f")
         return int((dt - datetime(1970, 1, 1)).total_seconds() * 1000)
 
+    def __len__(self) -> int: return len(self.candles)
+
     def get_ticker(self) -> str: return self.ticker
 
     def get_info(self) -> List[Candle]: return self.candles    
@@ -90,3 +108,176 @@ class PriceHistory:
     def get_start_date(self) -> int: return self.start_date
 
     def get_end_date(self) -> int: return self.end_date
+
+    # Returns the candles as a dictionary of numpy columns. The list backed
+    # history has to build these on every call.
+    def get_columns(self) -> Dict[str,numpy.ndarray]: return candles_to_columns(self.candles)
+
+    def get_column(self, name: str) -> numpy.ndarray: return self.get_columns()[name]
+
+    def get_close(self) -> numpy.ndarray: return self.get_column('close')
+
+    def get_dates(self) -> numpy.ndarray: return self.get_column('date')
+
+    # Returns a DataFrame with one column per candle field. The frame wraps
+    # the arrays from get_columns without copying them.
+    def to_frame(self) -> 'pandas.DataFrame':
+        import pandas
+        return pandas.DataFrame(self.get_columns(),copy=False)
+
+
+class ColumnarPriceHistory(PriceHistory):
+    """
+    Historical Price data for a given stock stored as contiguous numpy
+    arrays, one per candle field, instead of a list of Candle objects.
+    Columns are handed out as views so strategies can build DataFrames
+    without copying. Candles can be appended in amortized O(1).
+
+    Views from get_columns and frames from to_frame share storage with the
+    history, so they see replace_last rewrite the newest candle. Arrays
+    given to from_arrays are never written to: they are copied before the
+    first in-place write.
+    """
+    _buffers: Dict[str,numpy.ndarray]
+    """
+    Preallocated storage for each column. Only the first _size rows are valid
+    """
+    _size: int
+    _owned: bool
+    """
+    Whether the buffers were allocated by this history. Buffers that alias
+    the caller's arrays or a read only file are copied before being written
+    """
+    version: int
+    """
+    Bumped whenever candles are set, appended or replaced, so caches can tell
+    a history whose forming bar was rewritten in place from an unchanged one
+    """
+
+    _candle_cache: List[Candle]
+    """
+    Candle objects built for get_info(). Cleared whenever data is appended
+    """
+
+    @property
+    def candles(self) -> List[Candle]:
+        return self.get_info()
+
+    @candles.setter
+    def candles(self, info: List[Candle]) -> None:
+        self._set_columns(candles_to_columns(info if info is not None else []))
+
+    @classmethod
+    def from_arrays(cls, ticker: str, open, close, low, high, volume, date, **kwargs) -> 'ColumnarPriceHistory':
+        history = cls(ticker,None,**kwargs)
+        history._set_columns({'open': open,'close': close,'low': low,'high': high,'volume': volume,'date': date})
+        return history
+
+    # Builds a history from bulk records. Accepts a numpy structured array,
+    # a 2-D array with the columns in CANDLE_COLUMNS order, or an iterable
+    # of (open, close, low, high, volume, date) tuples.
+    @classmethod
+    def from_records(cls, ticker: str, records, **kwargs) -> 'ColumnarPriceHistory':
+        if isinstance(records,numpy.ndarray) and records.dtype.names is not None:
+            return cls.from_arrays(ticker,*(records[name] for name in CANDLE_COLUMNS),**kwargs)
+        if not isinstance(records,numpy.ndarray):
+            records = list(records)
+        block = numpy.asarray(records,dtype=numpy.float64).reshape(-1,len(CANDLE_COLUMNS))
+        return cls.from_arrays(ticker,*(block[:,i] for i in range(len(CANDLE_COLUMNS))),**kwargs)
+
+    @classmethod
+    def from_history(cls, history: PriceHistory) -> 'ColumnarPriceHistory':
+        if isinstance(history,ColumnarPriceHistory):
+            return history
+        columnar = cls(history.get_ticker(),None,frequency_type=history.get_frequency_type(),frequency=history.get_frequency(),period=history.get_period(),period_type=history.get_period_type())
+        columnar._set_columns(history.get_columns())
+        columnar.start_date = history.get_start_date()
+        columnar.end_date = history.get_end_date()
+        return columnar
+
+    # Pickles only the filled part of each buffer and never the Candle cache,
+    # so shipping a history to a worker process costs a few arrays.
+    def __getstate__(self) -> dict:
+        state = self.__dict__.copy()
+        state['_buffers'] = self.get_columns()
+        state['_candle_cache'] = None
+        state['_owned'] = True
+        return state
+
+    def _set_columns(self, columns: Dict[str,Iterable]) -> None:
+        buffers = {name: numpy.ascontiguousarray(columns[name],dtype=numpy.float64) for name in CANDLE_COLUMNS[:-1]}
+        buffers['date'] = numpy.ascontiguousarray(columns['date'],dtype=numpy.int64)
+        sizes = {len(column) for column in buffers.values()}
+        if len(sizes) > 1:
+            raise ValueError(f'[ERROR]: Candle columns must share one length, got {sorted(sizes)}')
+        self._buffers = buffers
+        self._owned = all(buffer is not columns[name] and buffer.base is None for name, buffer in buffers.items())
+        self._size = sizes.pop() if sizes else 0
+        self._candle_cache = None
+        self.version = getattr(self,'version',0) + 1
+
+    def __len__(self) -> int: return self._size
+
+    def get_info(self) -> List[Candle]:
+        if self._candle_cache is None:
+            columns = self.get_columns()
+            self._candle_cache = [Candle(*row) for row in zip(*(columns[name].tolist() for name in CANDLE_COLUMNS))]
+        return self._candle_cache
+
+    def get_columns(self) -> Dict[str,numpy.ndarray]:
+        size = self._size
+        return {name: buffer[:size] for name, buffer in self._buffers.items()}
+
+    def get_column(self, name: str) -> numpy.ndarray: return self._buffers[name][:self._size]
+
+    # Appends a single candle, doubling the underlying buffers when they are
+    # full. Views handed out earlier keep pointing at the old data.
+    def append(self, candle: Candle) -> None:
+        size = self._size
+        if size == len(self._buffers['date']):
+            self._grow(max(16,size * 2))
+        for name in CANDLE_COLUMNS:
+            self._buffers[name][size] = getattr(candle,name)
+        self._size = size + 1
+        self._candle_cache = None
+        self.version += 1
+
+    def get_last(self) -> Candle:
+        size = self._size
+        if size == 0:
+            raise IndexError(f'[ERROR]: {self.get_ticker()} has no candles')
+        return Candle(*(self._buffers[name][size - 1].item() for name in CANDLE_COLUMNS))
+
+    # Overwrites the newest candle, e.g. while a resampled bar is still forming
+    def replace_last(self, candle: Candle) -> None:
+        size = self._size
+        if size == 0:
+            raise IndexError(f'[ERROR]: {self.get_ticker()} has no candle to replace')
+        if not self._owned:
+            self._grow(len(self._buffers['date']))
+        for name in CANDLE_COLUMNS:
+            self._buffers[name][size - 1] = getattr(candle,name)
+        self._candle_cache = None
+        self.version += 1
+
+    # Appends many rows at once from arrays keyed by column name
+    def extend(self, columns: Dict[str,Iterable]) -> None:
+        incoming = {name: numpy.asarray(columns[name]) for name in CANDLE_COLUMNS}
+        count = len(incoming['date'])
+        size = self._size
+        if size + count > len(self._buffers['date']):
+            self._grow(max(16,2 * (size + count)))
+        for name in CANDLE_COLUMNS:
+            self._buffers[name][size:size + count] = incoming[name]
+        self._size = size + count
+        self._candle_cache = None
+        self.version += 1
+
+    def _grow(self, capacity: int) -> None:
+        size = self._size
+        for name, buffer in self._buffers.items():
+            grown = numpy.empty(capacity,dtype=buffer.dtype)
+            grown[:size] = buffer[:size]
+            self._buffers[name] = grown
+        self._owned = True
+
@@ -29,7 +29,7 @@ class Portfolio:
         self.current_available_funds = current_funds
         self.total_funds = total_funds
         self.holdings = holdings
-        self.max_exposure_allowed
+        self.max_exposure_allowed = max_exposure_allowed
         self.stop_loss = 1 - stop_loss_percent
         self.limit_order = 1 + limit_order_percent
 
@@ -1,55 +1,344 @@
-from enums.enums import TradeSignal, Side
-from typing import Dict, List
+from ..enums.enums import TradeSignal, Side, RecordAction
+from typing import TYPE_CHECKING, Dict, List, Tuple
+import json
+import logging
+import math
+import os
+import threading
+import numpy
+
+if TYPE_CHECKING:
+    import pandas
+
+logger = logging.getLogger(__name__)
+
+
+JOURNAL_COLUMNS: Dict[str,numpy.dtype] = {
+    'ticker': numpy.dtype('<i4'),
+    'action': numpy.dtype('i1'),
+    'signal': numpy.dtype('i1'),
+    'side': numpy.dtype('i1'),
+    'price': numpy.dtype('<f8'),
+    'shares': numpy.dtype('<f8'),
+    'value': numpy.dtype('<f8'),
+    'date': numpy.dtype('<i8'),
+}
+"""
+The fixed schema of a journal entry. Tickers are stored as ids into the
+journal's ticker table, actions, signals and sides as enum codes with -1 for
+none, and dates as epoch milliseconds. Missing prices, shares and values are
+NaN
+"""
+
+SIGNALS: List[TradeSignal] = list(TradeSignal)
+
+SIGNAL_CODES: Dict[TradeSignal,int] = {signal: code for code, signal in enumerate(SIGNALS)}
+
+NO_CODE = -1
+
+MINIMUM_CAPACITY = 1024
+
+READ_CHUNK = 1 << 20
+"""
+Flushed entries filtered per pass of a query, so a narrow query over a
+large journal only holds one chunk of the ticker and date columns at a time
+"""
+
 
 class TradeRecord:
     """
-    The TradeRecord class is used to keep track of decisions made during the 
+    The TradeRecord class is used to keep track of decisions made during the
     execution of the strategy. We will use this class wihtin the Strategy
     class to keep a record for our back tester, where we will print out
     the record to allow for more decisions to be made.
+
+    Entries are kept as compact rows in the journal schema until the record
+    is inserted into a RecordHolder, which appends them to its journal.
     """
     ticker: str
-    record_list: List[Dict[str,str]]
+    rows: List[Tuple]
     open_position: bool
 
     def __init__(self, ticker: str) -> None:
         self.ticker = ticker
         self.open_position = False
-        self.record_list = list()
-    
-    # def write(self,choice: TradeSignal, price: float, date: float) -> None:
-    #     self.record_list.append((choice,price,date))
-    #     print('[ACTION]: Record inserted....')
+        self.rows = list()
 
     def write_to_closed(self, value: float, date: float, side: Side) -> None:
-        self.record_list.append({
-                        'date':str(date),
-                        'action': 'CLOSED POSITION',
-                        'side': side.name,
-                        'P/L': f'{value} per share',
-                    })
-        
+        self.rows.append((RecordAction.CLOSE.value,NO_CODE,side.value,math.nan,math.nan,value,int(date)))
+
     def write_to_open(self,signal: TradeSignal,side: Side, value: float,number_of_shares: float, date: float) -> None:
-        a = 'BUYING '+ str(number_of_shares) + 'shares' if signal == TradeSignal.BUY else 'SELLING ' + str(number_of_shares) + 'shares'
-        self.record_list.append({
-                        'date':str(date),
-                        'action': f'OPENED POSITION @ {str(date)} for ${value}/share. {a}',
-                        'side': side.name,
-                        'Price Point': value,
-                    })
+        self.rows.append((RecordAction.OPEN.value,SIGNAL_CODES[signal],side.value,value,number_of_shares,math.nan,int(date)))
 
-    
+    def write_signal(self, signal: TradeSignal, price: float, date: float) -> None:
+        self.rows.append((RecordAction.SIGNAL.value,SIGNAL_CODES[signal],NO_CODE,price,math.nan,math.nan,int(date)))
 
+    # Decodes the rows into readable entries
     def get_records(self) -> List[Dict[str,str]]:
-        return self.record_list
+        return [describe_entry(*row) for row in self.rows]
+
+
+# Turns one journal row (without its ticker) back into a readable entry
+def describe_entry(action: int, signal: int, side: int, price: float, shares: float, value: float, date: int) -> Dict[str,str]:
+    entry = {'date': str(date),'action': RecordAction(action).name}
+    if side != NO_CODE:
+        entry['side'] = Side(side).name
+    if action == RecordAction.OPEN.value:
+        a = 'BUYING '+ str(shares) + 'shares' if SIGNALS[signal] == TradeSignal.BUY else 'SELLING ' + str(shares) + 'shares'
+        entry['action'] = f'OPENED POSITION @ {date} for ${price}/share. {a}'
+        entry['Price Point'] = price
+    elif action == RecordAction.CLOSE.value:
+        entry['action'] = 'CLOSED POSITION'
+        entry['P/L'] = f'{value} per share'
+    else:
+        entry['signal'] = SIGNALS[signal].name
+        entry['Price Point'] = price
+    return entry
+
+
+class TradeJournal:
+    """
+    An append-only journal of trade records stored as fixed-schema numpy
+    columns (see JOURNAL_COLUMNS), so an entry costs 39 bytes instead of a
+    dict of strings.
+
+    Memory can be bounded two ways. With a path, entries are flushed in
+    chunks of flush_size to one raw column file per field under that
+    directory and nothing is lost. Without a path, a capacity turns the
+    in-memory columns into a ring buffer that drops the oldest entries.
+    Queries see flushed and in-memory entries alike, and only copy the
+    flushed entries they match out of the mapped column files. Safe to write
+    from several threads.
+
+    Chunks are appended after the ticker table is saved, and a journal
+    reopened on an interrupted flush only keeps the rows every column file
+    has, so the files never reference an unknown ticker.
+    """
+    capacity: int
+    """
+    Most entries kept in memory. None grows without bound
+    """
+    path: str
+    """
+    Directory flushed chunks are appended to. None keeps everything in memory
+    """
+    flush_size: int
+    dropped: int
+    """
+    Entries overwritten by the ring buffer
+    """
+    _buffers: Dict[str,numpy.ndarray]
+    _start: int
+    _size: int
+    _flushed: int
+    _tickers: List[str]
+    _ticker_ids: Dict[str,int]
+    _lock: threading.Lock
+
+    def __init__(self, capacity: int = None, path: str = None, flush_size: int = 65536) -> None:
+        if capacity is not None and capacity < 1:
+            raise ValueError(f'[ERROR]: Journal capacity must be at least 1, got {capacity}')
+        self.capacity = capacity
+        self.path = path
+        self.flush_size = min(flush_size,capacity) if capacity is not None else flush_size
+        self.dropped = 0
+        self._start = 0
+        self._size = 0
+        self._flushed = 0
+        self._tickers = list()
+        self._ticker_ids = dict()
+        self._lock = threading.Lock()
+        initial = capacity if capacity is not None and capacity <= MINIMUM_CAPACITY else MINIMUM_CAPACITY
+        self._buffers = {name: numpy.empty(initial,dtype=dtype) for name, dtype in JOURNAL_COLUMNS.items()}
+        if path is not None:
+            os.makedirs(path,exist_ok=True)
+            self.__open_files()
+
+    def __len__(self) -> int:
+        return self._flushed + self._size
+
+    def get_tickers(self) -> List[str]:
+        return list(self._tickers)
+
+    def write(self, ticker: str, action: RecordAction, date: int, signal: TradeSignal = None, side: Side = None, price: float = math.nan, shares: float = math.nan, value: float = math.nan) -> None:
+        self.write_rows(ticker,[(action.value,SIGNAL_CODES[signal] if signal is not None else NO_CODE,side.value if side is not None else NO_CODE,price,shares,value,int(date))])
+
+    def write_open(self, ticker: str, signal: TradeSignal, side: Side, price: float, shares: float, date: int) -> None:
+        self.write(ticker,RecordAction.OPEN,date,signal,side,price=price,shares=shares)
+
+    def write_close(self, ticker: str, value: float, date: int, side: Side) -> None:
+        self.write(ticker,RecordAction.CLOSE,date,side=side,value=value)
+
+    def write_signal(self, ticker: str, signal: TradeSignal, price: float, date: int) -> None:
+        self.write(ticker,RecordAction.SIGNAL,date,signal,price=price)
+
+    # Appends rows of (action, signal, side, price, shares, value, date) codes
+    # for one ticker
+    def write_rows(self, ticker: str, rows: List[Tuple]) -> None:
+        if not rows:
+            return
+        with self._lock:
+            ticker_id = self._ticker_ids.get(ticker)
+            if ticker_id is None:
+                ticker_id = self._ticker_ids[ticker] = len(self._tickers)
+                self._tickers.append(ticker)
+            buffers = self._buffers
+            for row in rows:
+                if self.path is not None and self._size >= self.flush_size:
+                    self.__flush()
+                position = self.__next_position()
+                buffers['ticker'][position] = ticker_id
+                buffers['action'][position], buffers['signal'][position], buffers['side'][position], buffers['price'][position], buffers['shares'][position], buffers['value'][position], buffers['date'][position] = row
+
+    def flush(self) -> None:
+        if self.path is None:
+            raise ValueError('[ERROR]: Journal has no path to flush to')
+        with self._lock:
+            self.__flush()
+
+    # Returns the entries, oldest first, as one array per column. Can be
+    # limited to one ticker and to dates in [start_date, end_date].
+    def get_columns(self, ticker: str = None, start_date: int = None, end_date: int = None) -> Dict[str,numpy.ndarray]:
+        with self._lock:
+            memory = self.__ordered_columns()
+            flushed = self._flushed
+            ticker_id = self._ticker_ids.get(ticker,NO_CODE) if ticker is not None else None
+        # Flushed chunks are only appended, so the first flushed rows can be
+        # read without holding the lock
+        parts = [self.__read_flushed(flushed,ticker_id,start_date,end_date)] if flushed else []
+        mask = select_entries(memory,ticker_id,start_date,end_date)
+        parts.append(memory if mask is None else {name: column[mask] for name, column in memory.items()})
+        if len(parts) == 1:
+            return parts[0]
+        return {name: numpy.concatenate([part[name] for part in parts]) for name in JOURNAL_COLUMNS}
+
+    # The same query as get_columns with the codes decoded into names
+    def to_frame(self, ticker: str = None, start_date: int = None, end_date: int = None) -> 'pandas.DataFrame':
+        import pandas
+        columns = self.get_columns(ticker,start_date,end_date)
+        tickers = numpy.array(self._tickers + [None],dtype=object)
+        actions = numpy.array([action.name for action in RecordAction],dtype=object)
+        signals = numpy.array([signal.name for signal in SIGNALS] + [None],dtype=object)
+        sides = numpy.array([side.name for side in Side] + [None],dtype=object)
+        return pandas.DataFrame({
+            'ticker': tickers[columns['ticker']],
+            'action': actions[columns['action']],
+            'signal': signals[columns['signal']],
+            'side': sides[columns['side']],
+            'price': columns['price'],
+            'shares': columns['shares'],
+            'value': columns['value'],
+            'date': columns['date'],
+        })
+
+    # Returns the buffer position of a new entry, growing the buffers or
+    # dropping the oldest entry when they are full
+    def __next_position(self) -> int:
+        length = len(self._buffers['date'])
+        if self._size < length:
+            position = (self._start + self._size) % length
+            self._size += 1
+            return position
+        if self.capacity is None or length < self.capacity:
+            self.__grow(length * 2 if self.capacity is None else min(length * 2,self.capacity))
+            self._size += 1
+            return self._size - 1
+        position = self._start
+        self._start = (self._start + 1) % length
+        self.dropped += 1
+        return position
+
+    def __grow(self, capacity: int) -> None:
+        ordered = self.__ordered_columns()
+        for name, column in ordered.items():
+            grown = numpy.empty(capacity,dtype=column.dtype)
+            grown[:self._size] = column
+            self._buffers[name] = grown
+        self._start = 0
+
+    def __ordered_columns(self) -> Dict[str,numpy.ndarray]:
+        end = self._start + self._size
+        length = len(self._buffers['date'])
+        if end <= length:
+            return {name: buffer[self._start:end].copy() for name, buffer in self._buffers.items()}
+        return {name: numpy.concatenate((buffer[self._start:],buffer[:end - length])) for name, buffer in self._buffers.items()}
+
+    def __column_path(self, name: str) -> str:
+        return os.path.join(self.path,f'{name}.column')
+
+    def __tickers_path(self) -> str:
+        return os.path.join(self.path,'tickers.json')
+
+    # Picks up the entries of a journal already at path. Rows beyond the
+    # shortest column file come from an interrupted flush and are cut off.
+    def __open_files(self) -> None:
+        if os.path.exists(self.__tickers_path()):
+            with open(self.__tickers_path()) as file:
+                self._tickers = json.load(file)
+            self._ticker_ids = {ticker: position for position, ticker in enumerate(self._tickers)}
+        sizes = [os.path.getsize(self.__column_path(name)) // dtype.itemsize if os.path.exists(self.__column_path(name)) else 0 for name, dtype in JOURNAL_COLUMNS.items()]
+        self._flushed = min(sizes)
+        for name, dtype in JOURNAL_COLUMNS.items():
+            if os.path.exists(self.__column_path(name)) and os.path.getsize(self.__column_path(name)) != self._flushed * dtype.itemsize:
+                logger.warning('[ACTION]: Truncating %s to %d journal entries',self.__column_path(name),self._flushed)
+                os.truncate(self.__column_path(name),self._flushed * dtype.itemsize)
+
+    def __flush(self) -> None:
+        if self._size == 0:
+            return
+        temporary = self.__tickers_path() + '.tmp'
+        with open(temporary,'w') as file:
+            json.dump(self._tickers,file)
+        os.replace(temporary,self.__tickers_path())
+        for name, column in self.__ordered_columns().items():
+            with open(self.__column_path(name),'ab') as file:
+                file.write(column.tobytes())
+        self._flushed += self._size
+        self._start = 0
+        self._size = 0
+        logger.debug('[ACTION]: Flushed journal to %s, %d entries on disk',self.path,self._flushed)
+
+    # Maps the first count flushed entries and copies out the ones matching
+    # the query. Only the ticker and date columns are scanned, chunk by chunk,
+    # and the other columns are read at the matching rows.
+    def __read_flushed(self, count: int, ticker_id: int, start_date: int, end_date: int) -> Dict[str,numpy.ndarray]:
+        files = {name: numpy.memmap(self.__column_path(name),dtype=dtype,mode='r',shape=(count,)) for name, dtype in JOURNAL_COLUMNS.items()}
+        if ticker_id is None and start_date is None and end_date is None:
+            return {name: numpy.array(file) for name, file in files.items()}
+        rows = list()
+        for start in range(0,count,READ_CHUNK):
+            chunk = {name: files[name][start:start + READ_CHUNK] for name in ('ticker','date')}
+            rows.append(numpy.flatnonzero(select_entries(chunk,ticker_id,start_date,end_date)) + start)
+        rows = numpy.concatenate(rows)
+        return {name: file[rows].view(numpy.ndarray) for name, file in files.items()}
+
+
+# The mask of the entries of the ticker id dated in [start_date, end_date],
+# or None when the query has no filter
+def select_entries(columns: Dict[str,numpy.ndarray], ticker_id: int = None, start_date: int = None, end_date: int = None) -> numpy.ndarray:
+    mask = None
+    if ticker_id is not None:
+        mask = columns['ticker'] == ticker_id
+    if start_date is not None:
+        mask = columns['date'] >= start_date if mask is None else mask & (columns['date'] >= start_date)
+    if end_date is not None:
+        mask = columns['date'] <= end_date if mask is None else mask & (columns['date'] <= end_date)
+    return mask
 
 
 class RecordHolder:
-    records: Dict[str,TradeRecord]
+    """
+    Collects the records of every ticker into one TradeJournal. Inserting a
+    record appends its entries, earlier records of the same ticker are kept
+    """
+    journal: TradeJournal
+
+    def __init__(self, journal: TradeJournal = None) -> None:
+        self.journal = journal if journal is not None else TradeJournal()
 
-    def __init__(self) -> None:
-        self.records = dict()
-    
     def insert_record(self,record: TradeRecord) -> None:
-        self.records[record.ticker] = record
-        print('[ACTION]: Inserted record.....')
\ No newline at end of file
+        self.journal.write_rows(record.ticker,record.rows)
+        logger.debug('[ACTION]: Inserted record for %s',record.ticker)
+
+    def get_records(self, ticker: str = None, start_date: int = None, end_date: int = None) -> 'pandas.DataFrame':
+        return self.journal.to_frame(ticker,start_date,end_date)
@@ -0,0 +1,123 @@
+from .models.history import PriceHistory, ColumnarPriceHistory
+from .models.portfolio import Portfolio
+from .backtester import BacktestConfig, SignalGenerator, simulate_trades
+from .executors import StrategyExecutor, SerialExecutor
+from typing import TYPE_CHECKING, Any, Dict, List
+import copy
+import math
+import numpy
+
+if TYPE_CHECKING:
+    import pandas
+
+
+SWEEPABLE_PARAMETERS = ('average_type','window','std','fast_window','slow_window','rsi_window','rsi_upper_bound','rsi_lower_bound')
+"""
+The BacktestConfig attributes a sweep can vary
+"""
+
+
+class ParameterGrid:
+    """
+    Every combination of the given parameter values, e.g.
+    {'window': [10, 20], 'std': [1.5, 2, 2.5]}. Combinations can also be
+    sampled at random without building the full product.
+    """
+    parameters: Dict[str,List[Any]]
+
+    def __init__(self, parameters: Dict[str,List[Any]]) -> None:
+        unknown = set(parameters) - set(SWEEPABLE_PARAMETERS)
+        if unknown:
+            raise ValueError(f'[ERROR]: Cannot sweep {sorted(unknown)}. Valid parameters are {SWEEPABLE_PARAMETERS}')
+        self.parameters = {name: list(values) for name, values in parameters.items()}
+
+    def __len__(self) -> int:
+        return math.prod(len(values) for values in self.parameters.values())
+
+    # Decodes a position in the full product into its combination
+    def get_combination(self, position: int) -> Dict[str,Any]:
+        combination: Dict[str,Any] = dict()
+        for name, values in reversed(self.parameters.items()):
+            position, index = divmod(position,len(values))
+            combination[name] = values[index]
+        return {name: combination[name] for name in self.parameters}
+
+    def get_combinations(self) -> List[Dict[str,Any]]:
+        return [self.get_combination(position) for position in range(len(self))]
+
+    def sample(self, samples: int, seed: int = None) -> List[Dict[str,Any]]:
+        total = len(self)
+        if samples >= total:
+            return self.get_combinations()
+        positions = numpy.random.default_rng(seed).choice(total,size=samples,replace=False)
+        return [self.get_combination(int(position)) for position in numpy.sort(positions)]
+
+
+class ParameterSweep:
+    """
+    Backtests many parameter combinations over many tickers and ranks them.
+    Each ticker is handled by one task that evaluates every combination, so
+    the indicators behind them (the cumulative sums of every simple moving
+    average window, each EMA, RSI and band width) are computed once per
+    ticker and shared. Tickers are spread over the executor, which can be a
+    ProcessExecutor to use every core.
+    """
+    portfolio: Portfolio
+    base_config: BacktestConfig
+    """
+    The config every combination starts from before its parameters are set
+    """
+    executor: StrategyExecutor
+
+    def __init__(self, portfolio: Portfolio, base_config: BacktestConfig, executor: StrategyExecutor = None) -> None:
+        self.portfolio = portfolio
+        self.base_config = base_config
+        self.executor = executor if executor is not None else SerialExecutor()
+
+    # Returns one row per combination with its parameters, total profit,
+    # number of trades, win rate and average trade return, best first.
+    def run(self, histories: List[PriceHistory], grid: ParameterGrid, samples: int = None, seed: int = None, rank_by: str = 'total_profit') -> 'pandas.DataFrame':
+        combinations = grid.sample(samples,seed) if samples is not None else grid.get_combinations()
+        configs = [self.__create_config(combination) for combination in combinations]
+        allocation = self.portfolio.get_total_funds() * self.portfolio.get_max_exposure_allowed()
+        if self.executor.uses_processes:
+            histories = [ColumnarPriceHistory.from_history(history) for history in histories]
+
+        statistics = numpy.zeros((len(configs),4))
+        for ticker_statistics in self.executor.map(sweep_history,histories,configs,self.portfolio.get_stop_loss(),self.portfolio.get_limit_order(),allocation):
+            statistics += ticker_statistics
+
+        import pandas
+        results = pandas.DataFrame(combinations)
+        for name in results.columns:
+            if name == 'average_type':
+                results[name] = [average_type.name for average_type in results[name]]
+        trades = statistics[:,1]
+        results['total_profit'] = statistics[:,0]
+        results['number_of_trades'] = trades.astype(numpy.int64)
+        with numpy.errstate(invalid='ignore',divide='ignore'):
+            results['win_rate'] = statistics[:,2] / trades
+            results['average_return'] = statistics[:,3] / trades
+        return results.sort_values(rank_by,ascending=False,kind='stable').reset_index(drop=True)
+
+    def __create_config(self, combination: Dict[str,Any]) -> BacktestConfig:
+        config = copy.copy(self.base_config)
+        for name, value in combination.items():
+            setattr(config,name,value)
+        return config
+
+
+# Evaluates every config on one ticker and returns a (configs x 4) array of
+# total profit, trades, winning trades and summed trade returns. Kept at
+# module level so process pool workers can unpickle it.
+def sweep_history(history: PriceHistory, configs: List[BacktestConfig], stop_loss: float, limit_order: float, allocation: float) -> numpy.ndarray:
+    columns = history.get_columns()
+    signals = SignalGenerator(columns['close'])
+    statistics = numpy.zeros((len(configs),4))
+    for row, config in enumerate(configs):
+        entries, exits = signals.generate(config)
+        trades = simulate_trades(history.get_ticker(),columns,entries,exits,config.triggers,stop_loss,limit_order,allocation)
+        if trades:
+            returns = numpy.array([trade.get_return() for trade in trades])
+            statistics[row] = (sum(trade.get_profit() for trade in trades),len(trades),numpy.count_nonzero(returns > 0),returns.sum())
+    return statistics
@@ -0,0 +1,162 @@
+from .models.history import PriceHistory
+from .executors import StrategyExecutor, SerialExecutor
+from .indicators import batch
+from typing import Dict, List, Tuple
+import math
+import numpy
+
+
+ENGLE_GRANGER_CRITICAL_VALUE = -3.34
+"""
+The 5% critical value of the Engle-Granger test for two series without a
+trend. Spreads whose adf statistic is below it are treated as cointegrated
+"""
+
+
+class PairStatistics:
+    """
+    The fitted relationship between two tickers. The spread is
+    log(first) - intercept - hedge_ratio * log(second).
+    """
+    first: PriceHistory
+    second: PriceHistory
+    correlation: float
+    hedge_ratio: float
+    intercept: float
+    spread_std: float
+    zscore: float
+    """
+    The latest spread in standard deviations from its mean
+    """
+    adf_statistic: float
+    """
+    The Dickey-Fuller t statistic of the spread. More negative means more
+    mean reverting
+    """
+    half_life: float
+    """
+    The number of bars the spread takes to revert half way to its mean
+    """
+
+    def __init__(self, first: PriceHistory, second: PriceHistory, correlation: float, hedge_ratio: float, intercept: float, spread_std: float, zscore: float, adf_statistic: float, half_life: float) -> None:
+        self.first = first
+        self.second = second
+        self.correlation = correlation
+        self.hedge_ratio = hedge_ratio
+        self.intercept = intercept
+        self.spread_std = spread_std
+        self.zscore = zscore
+        self.adf_statistic = adf_statistic
+        self.half_life = half_life
+
+    def get_pair(self) -> Tuple[PriceHistory,PriceHistory]:
+        return (self.first,self.second)
+
+
+class PairScreener:
+    """
+    Finds cointegrated pairs in a universe without testing every pair one at
+    a time. The closes of every ticker are aligned on a common timestamp
+    grid and one correlation matrix of their returns is computed with a
+    single matrix product. Only pairs above min_correlation go on to the
+    hedge ratio regression and Dickey-Fuller test on their spread, which
+    are vectorized over all surviving pairs and split across the executor.
+    """
+    lookback: int
+    min_correlation: float
+    adf_threshold: float
+    executor: StrategyExecutor
+
+    def __init__(self, lookback: int = 250, min_correlation: float = 0.8, adf_threshold: float = ENGLE_GRANGER_CRITICAL_VALUE, executor: StrategyExecutor = None) -> None:
+        self.lookback = lookback
+        self.min_correlation = min_correlation
+        self.adf_threshold = adf_threshold
+        self.executor = executor if executor is not None else SerialExecutor()
+
+    # Returns the cointegrated pairs of the universe, most mean reverting first
+    def screen(self, histories: List[PriceHistory]) -> List[PairStatistics]:
+        panel, _ = batch.align_on_dates(histories,self.lookback + 1)
+        with numpy.errstate(divide='ignore',invalid='ignore'):
+            log_closes = numpy.log(panel)
+        # Tickers missing part of the window cannot be compared fairly
+        complete = numpy.flatnonzero(~numpy.isnan(log_closes).any(axis=0))
+        if len(complete) < 2:
+            return []
+        log_closes = log_closes[:,complete]
+
+        correlation = correlation_matrix(numpy.diff(log_closes,axis=0))
+        first, second = numpy.nonzero(numpy.triu(correlation >= self.min_correlation,k=1))
+        if len(first) == 0:
+            return []
+
+        # Each chunk ships only the columns its pairs use
+        chunk_size = max(1,math.ceil(len(first) / (self.executor.max_workers * 4)))
+        chunks = []
+        for start in range(0,len(first),chunk_size):
+            chunk_first, chunk_second = first[start:start + chunk_size], second[start:start + chunk_size]
+            columns, positions = numpy.unique(numpy.concatenate((chunk_first,chunk_second)),return_inverse=True)
+            chunks.append((log_closes[:,columns],positions[:len(chunk_first)],positions[len(chunk_first):]))
+        scores = self.executor.map(_score_chunk,chunks)
+
+        pairs: List[PairStatistics] = []
+        for start, score in zip(range(0,len(first),chunk_size),scores):
+            for offset in numpy.flatnonzero(score['adf_statistic'] < self.adf_threshold):
+                i, j = complete[first[start + offset]], complete[second[start + offset]]
+                pairs.append(PairStatistics(histories[i],histories[j],float(correlation[first[start + offset],second[start + offset]]),
+                                            *(float(score[name][offset]) for name in ('hedge_ratio','intercept','spread_std','zscore','adf_statistic','half_life'))))
+        pairs.sort(key=lambda pair: pair.adf_statistic)
+        return pairs
+
+
+# Pearson correlation of every pair of columns from one matrix product
+def correlation_matrix(values: numpy.ndarray) -> numpy.ndarray:
+    centered = values - values.mean(axis=0)
+    norms = numpy.sqrt((centered * centered).sum(axis=0))
+    with numpy.errstate(divide='ignore',invalid='ignore'):
+        standardized = centered / norms
+    return numpy.nan_to_num(standardized.T @ standardized)
+
+
+# Regresses first on second for every column pair of two (time x pairs) log
+# close panels and tests the resulting spreads for mean reversion. Returns
+# one array per statistic.
+def score_pairs(first: numpy.ndarray, second: numpy.ndarray) -> Dict[str,numpy.ndarray]:
+    second_centered = second - second.mean(axis=0)
+    first_mean = first.mean(axis=0)
+    with numpy.errstate(divide='ignore',invalid='ignore'):
+        hedge_ratio = (second_centered * (first - first_mean)).sum(axis=0) / (second_centered * second_centered).sum(axis=0)
+        intercept = first_mean - hedge_ratio * second.mean(axis=0)
+        spread = first - intercept - hedge_ratio * second
+        spread_std = spread.std(axis=0,ddof=1)
+        zscore = (spread[-1] - spread.mean(axis=0)) / spread_std
+
+        # Dickey-Fuller regression of the spread's change on its last value
+        lagged = spread[:-1] - spread[:-1].mean(axis=0)
+        change = numpy.diff(spread,axis=0)
+        change = change - change.mean(axis=0)
+        lagged_ss = (lagged * lagged).sum(axis=0)
+        beta = (lagged * change).sum(axis=0) / lagged_ss
+        residuals = change - beta * lagged
+        standard_error = numpy.sqrt((residuals * residuals).sum(axis=0) / (len(change) - 2) / lagged_ss)
+        adf_statistic = beta / standard_error
+        half_life = numpy.where((beta < 0) & (beta > -1),-math.log(2) / numpy.log1p(beta),numpy.inf)
+    return {'hedge_ratio': hedge_ratio,'intercept': intercept,'spread_std': spread_std,'zscore': zscore,'adf_statistic': numpy.nan_to_num(adf_statistic,nan=0.0),'half_life': half_life}
+
+
+# Scores a single pair from the (dates, closes) tails of its two tickers,
+# using only the dates both of them traded. Module level so process pool
+# workers can unpickle it.
+def pair_statistics(item: Tuple[Tuple[numpy.ndarray,numpy.ndarray],Tuple[numpy.ndarray,numpy.ndarray]]) -> Dict[str,float]:
+    (first_dates, first_closes), (second_dates, second_closes) = item
+    _, first_rows, second_rows = numpy.intersect1d(first_dates,second_dates,assume_unique=True,return_indices=True)
+    if len(first_rows) < 3:
+        return None
+    with numpy.errstate(divide='ignore',invalid='ignore'):
+        score = score_pairs(numpy.log(first_closes[first_rows]).reshape(-1,1),numpy.log(second_closes[second_rows]).reshape(-1,1))
+    return {name: float(values[0]) for name, values in score.items()}
+
+
+# Module level so process pool workers can unpickle it
+def _score_chunk(chunk: Tuple[numpy.ndarray,numpy.ndarray,numpy.ndarray]) -> Dict[str,numpy.ndarray]:
+    log_closes, first, second = chunk
+    return score_pairs(log_closes[:,first],log_closes[:,second])
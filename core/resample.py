@@ -0,0 +1,161 @@
+from .models.history import PriceHistory, ColumnarPriceHistory, Candle, CANDLE_COLUMNS
+from .enums.enums import FrequencyType
+from typing import Dict, List, Tuple
+import numpy
+
+
+BARS_PER_DAY: Dict[FrequencyType,float] = {
+    FrequencyType.SECOND: 24 * 60 * 60,
+    FrequencyType.MINUTE: 24 * 60,
+    FrequencyType.HOUR: 24,
+    FrequencyType.DAY: 1,
+    FrequencyType.WEEK: 1 / 7,
+    FrequencyType.MONTH: 1 / 30,
+    FrequencyType.QUARTER: 1 / 91,
+    FrequencyType.YEAR: 1 / 365,
+}
+"""
+Bars of a frequency type with a frequency of 1 that fit in a day
+"""
+
+FIXED_MILLISECONDS: Dict[FrequencyType,int] = {
+    FrequencyType.SECOND: 1000,
+    FrequencyType.MINUTE: 60 * 1000,
+    FrequencyType.HOUR: 60 * 60 * 1000,
+    FrequencyType.DAY: 24 * 60 * 60 * 1000,
+    FrequencyType.WEEK: 7 * 24 * 60 * 60 * 1000,
+}
+"""
+Length of the frequency types whose bars all last the same time. Months,
+quarters and years follow the calendar instead
+"""
+
+WEEK_OFFSET = 3 * 24 * 60 * 60 * 1000
+"""
+The epoch started on a Thursday. Shifting by three days starts weeks on Monday
+"""
+
+
+# Converts a window given in days into a number of bars of the frequency.
+# Never returns less than minimum bars, e.g. 2 for a standard deviation.
+def window_in_bars(frequency_type: FrequencyType, frequency: int, days: float, minimum: int = 1) -> int:
+    return max(minimum,int(days * BARS_PER_DAY[frequency_type] // (frequency or 1)))
+
+
+# Returns the epoch millisecond start of the bar each date falls into
+def bucket_starts(dates: numpy.ndarray, frequency_type: FrequencyType, frequency: int = 1) -> numpy.ndarray:
+    dates = numpy.asarray(dates,dtype=numpy.int64)
+    frequency = frequency or 1
+    if frequency_type == FrequencyType.WEEK:
+        size = FIXED_MILLISECONDS[FrequencyType.WEEK] * frequency
+        return (dates + WEEK_OFFSET) // size * size - WEEK_OFFSET
+    if frequency_type in FIXED_MILLISECONDS:
+        size = FIXED_MILLISECONDS[frequency_type] * frequency
+        return dates // size * size
+    if frequency_type == FrequencyType.YEAR:
+        units = dates.astype('datetime64[ms]').astype('datetime64[Y]').astype(numpy.int64)
+        return (units // frequency * frequency).astype('datetime64[Y]').astype('datetime64[ms]').astype(numpy.int64)
+    months_per_bar = 3 * frequency if frequency_type == FrequencyType.QUARTER else frequency
+    months = dates.astype('datetime64[ms]').astype('datetime64[M]').astype(numpy.int64)
+    return (months // months_per_bar * months_per_bar).astype('datetime64[M]').astype('datetime64[ms]').astype(numpy.int64)
+
+
+# Aggregates date ordered candle columns into bars of the given frequency:
+# first open, last close, lowest low, highest high and summed volume. Each
+# bar is dated with the start of its period.
+def resample_columns(columns: Dict[str,numpy.ndarray], frequency_type: FrequencyType, frequency: int = 1) -> Dict[str,numpy.ndarray]:
+    dates = columns['date']
+    if len(dates) == 0:
+        return {name: column[:0] for name, column in columns.items()}
+    buckets = bucket_starts(dates,frequency_type,frequency)
+    starts = numpy.concatenate(([0],numpy.flatnonzero(buckets[1:] != buckets[:-1]) + 1))
+    ends = numpy.concatenate((starts[1:],[len(dates)]))
+    return {
+        'open': columns['open'][starts],
+        'close': columns['close'][ends - 1],
+        'low': numpy.minimum.reduceat(columns['low'],starts),
+        'high': numpy.maximum.reduceat(columns['high'],starts),
+        'volume': numpy.add.reduceat(columns['volume'],starts),
+        'date': buckets[starts],
+    }
+
+
+def resample(history: PriceHistory, frequency_type: FrequencyType, frequency: int = 1) -> ColumnarPriceHistory:
+    columns = resample_columns(history.get_columns(),frequency_type,frequency)
+    resampled = ColumnarPriceHistory.from_arrays(history.get_ticker(),*(columns[name] for name in CANDLE_COLUMNS),frequency_type=frequency_type,frequency=frequency,period=history.get_period(),period_type=history.get_period_type())
+    resampled.start_date = history.get_start_date()
+    resampled.end_date = history.get_end_date()
+    return resampled
+
+
+class IncrementalResampler:
+    """
+    Keeps a higher timeframe history of one ticker up to date as base
+    candles arrive. A base candle in the current bar's period updates that
+    bar in place; one in a later period starts a new bar. The last bar of
+    the history is therefore still forming until the next period starts.
+    """
+    history: ColumnarPriceHistory
+    frequency_type: FrequencyType
+    frequency: int
+    _bucket_end: int
+    """
+    The first date after the current bar's period, for fixed size periods
+    """
+
+    def __init__(self, base: PriceHistory, frequency_type: FrequencyType, frequency: int = 1) -> None:
+        self.frequency_type = frequency_type
+        self.frequency = frequency or 1
+        self.history = resample(base,frequency_type,self.frequency)
+        self._bucket_end = None
+        if len(self.history):
+            self._bucket_end = self.__next_bucket_start(int(self.history.get_dates()[-1]))
+
+    # Adds a base candle and returns the bar it completed, if it started a
+    # new period, otherwise None
+    def update(self, candle: Candle) -> Candle:
+        history = self.history
+        if len(history) and candle.date < self._bucket_end:
+            last = history.get_last()
+            history.replace_last(Candle(last.open,candle.close,min(last.low,candle.low),max(last.high,candle.high),last.volume + candle.volume,last.date))
+            return None
+        completed = history.get_last() if len(history) else None
+        start = int(bucket_starts(numpy.array([candle.date]),self.frequency_type,self.frequency)[0])
+        history.append(Candle(candle.open,candle.close,candle.low,candle.high,candle.volume,start))
+        self._bucket_end = self.__next_bucket_start(start)
+        return completed
+
+    def __next_bucket_start(self, start: int) -> int:
+        if self.frequency_type in FIXED_MILLISECONDS:
+            return start + FIXED_MILLISECONDS[self.frequency_type] * self.frequency
+        # Calendar periods differ in length, so step past the longest one and
+        # snap back to the start of that period
+        longest = {FrequencyType.MONTH: 31,FrequencyType.QUARTER: 92,FrequencyType.YEAR: 366}[self.frequency_type] * self.frequency
+        return int(bucket_starts(numpy.array([start + longest * FIXED_MILLISECONDS[FrequencyType.DAY]]),self.frequency_type,self.frequency)[0])
+
+
+class MultiTimeframeFeed:
+    """
+    Shares one raw candle feed between several timeframes of a ticker, so
+    multi timeframe strategies do not each resample the full history
+    """
+    base: ColumnarPriceHistory
+    resamplers: Dict[Tuple[FrequencyType,int],IncrementalResampler]
+
+    def __init__(self, base: PriceHistory, timeframes: List[Tuple[FrequencyType,int]]) -> None:
+        self.base = ColumnarPriceHistory.from_history(base)
+        self.resamplers = {(frequency_type,frequency): IncrementalResampler(self.base,frequency_type,frequency) for frequency_type, frequency in timeframes}
+
+    def get_history(self, frequency_type: FrequencyType, frequency: int = 1) -> ColumnarPriceHistory:
+        return self.resamplers[(frequency_type,frequency)].history
+
+    # Appends a base candle to every timeframe and returns the bars it
+    # completed, keyed by timeframe
+    def update(self, candle: Candle) -> Dict[Tuple[FrequencyType,int],Candle]:
+        self.base.append(candle)
+        completed: Dict[Tuple[FrequencyType,int],Candle] = dict()
+        for timeframe, resampler in self.resamplers.items():
+            bar = resampler.update(candle)
+            if bar is not None:
+                completed[timeframe] = bar
+        return completed
@@ -0,0 +1,277 @@
+from .models.history import PriceHistory
+from .models.portfolio import Portfolio, Holdings
+from .enums.enums import TradeSignal, Side, ExitType
+from typing import Dict, List, Sequence, Tuple
+import threading
+import numpy
+
+
+BUY_SIGNALS = frozenset((TradeSignal.BUY,TradeSignal.STRONG_BUY,TradeSignal.LONG))
+
+SELL_SIGNALS = frozenset((TradeSignal.SELL,TradeSignal.STRONG_SELL,TradeSignal.TAKE_PROFIT,TradeSignal.SHORT))
+
+MINIMUM_CAPACITY = 256
+
+
+class Order:
+    """
+    A sized order that passed the risk checks. exit_type is set when the
+    order closes a position because of a stop loss or limit order
+    """
+    ticker: str
+    signal: TradeSignal
+    side: Side
+    shares: float
+    price: float
+    date: int
+    exit_type: ExitType
+
+    def __init__(self, ticker: str, signal: TradeSignal, side: Side, shares: float, price: float, date: int = None, exit_type: ExitType = None) -> None:
+        self.ticker = ticker
+        self.signal = signal
+        self.side = side
+        self.shares = shares
+        self.price = price
+        self.date = date
+        self.exit_type = exit_type
+
+    def get_value(self) -> float:
+        return self.shares * self.price
+
+    def __repr__(self) -> str:
+        return f'Order({self.ticker}, {self.signal.name}, {self.side.name}, {self.shares}, {self.price})'
+
+
+class RiskSnapshot:
+    """
+    The risk of the whole portfolio at one set of prices. Arrays are indexed
+    by position id, see RiskEngine.get_tickers
+    """
+    equity: float
+    """
+    Available funds plus the market value of every position
+    """
+    gross_exposure: float
+    """
+    Summed absolute market value of every position as a fraction of equity
+    """
+    market_values: numpy.ndarray
+    unrealized: numpy.ndarray
+    exposure: numpy.ndarray
+    """
+    Absolute market value of each position as a fraction of equity
+    """
+    stop_loss: numpy.ndarray
+    limit_order: numpy.ndarray
+    over_exposed: numpy.ndarray
+
+    def __init__(self, equity: float, gross_exposure: float, market_values: numpy.ndarray, unrealized: numpy.ndarray, exposure: numpy.ndarray, stop_loss: numpy.ndarray, limit_order: numpy.ndarray, over_exposed: numpy.ndarray) -> None:
+        self.equity = equity
+        self.gross_exposure = gross_exposure
+        self.market_values = market_values
+        self.unrealized = unrealized
+        self.exposure = exposure
+        self.stop_loss = stop_loss
+        self.limit_order = limit_order
+        self.over_exposed = over_exposed
+
+    def get_total_market_value(self) -> float:
+        return float(self.market_values.sum())
+
+    def get_total_unrealized(self) -> float:
+        return float(self.unrealized.sum())
+
+
+class RiskEngine:
+    """
+    Enforces a Portfolio's stop loss, limit order and exposure settings over
+    every position at once. Shares, entry prices and last prices are kept in
+    arrays indexed by a position id per ticker, so a price update marks the
+    whole book to market and finds every stop loss and limit order hit in a
+    few vectorized passes, without looking holdings up one ticker at a time.
+
+    Positions are long only, like the strategies. A position is stopped out
+    when its price falls to entry * portfolio.stop_loss and hits its limit
+    order when it reaches entry * portfolio.limit_order. Each position may
+    hold at most max_exposure_allowed of equity, and all positions together
+    at most max_gross_exposure of equity.
+    """
+    portfolio: Portfolio
+    max_gross_exposure: float
+    _tickers: List[str]
+    _ids: Dict[str,int]
+    _size: int
+    _shares: numpy.ndarray
+    _entry_prices: numpy.ndarray
+    _prices: numpy.ndarray
+    _lock: threading.RLock
+
+    def __init__(self, portfolio: Portfolio, max_gross_exposure: float = 1.0) -> None:
+        self.portfolio = portfolio
+        self.max_gross_exposure = max_gross_exposure
+        self._tickers = list()
+        self._ids = dict()
+        self._size = 0
+        self._shares = numpy.zeros(MINIMUM_CAPACITY)
+        self._entry_prices = numpy.zeros(MINIMUM_CAPACITY)
+        self._prices = numpy.full(MINIMUM_CAPACITY,numpy.nan)
+        self._lock = threading.RLock()
+        for ticker, holdings in portfolio.get_holdings().items():
+            position = self.get_id(ticker)
+            self._shares[position] = holdings.number_of_shares
+            self._entry_prices[position] = holdings.purchase_amount
+            self._prices[position] = holdings.value / holdings.number_of_shares if holdings.number_of_shares else holdings.purchase_amount
+
+    def __len__(self) -> int:
+        return self._size
+
+    def get_tickers(self) -> List[str]:
+        return self._tickers[:self._size]
+
+    # Returns the position id of the ticker, adding an empty position the
+    # first time a ticker is seen
+    def get_id(self, ticker: str) -> int:
+        position = self._ids.get(ticker)
+        if position is None:
+            with self._lock:
+                position = self._ids.get(ticker)
+                if position is None:
+                    if self._size == len(self._shares):
+                        self.__grow(2 * self._size)
+                    position = self._ids[ticker] = self._size
+                    self._tickers.append(ticker)
+                    self._size += 1
+        return position
+
+    def get_ids(self, tickers: Sequence[str]) -> numpy.ndarray:
+        return numpy.fromiter((self.get_id(ticker) for ticker in tickers),dtype=numpy.intp,count=len(tickers))
+
+    def get_shares(self) -> numpy.ndarray:
+        return self._shares[:self._size]
+
+    def get_entry_prices(self) -> numpy.ndarray:
+        return self._entry_prices[:self._size]
+
+    def get_prices(self) -> numpy.ndarray:
+        return self._prices[:self._size]
+
+    # Stores new prices for the given position ids (see get_ids) and returns
+    # the risk of the whole portfolio at the updated prices
+    def update_prices(self, ids: numpy.ndarray, prices: numpy.ndarray) -> RiskSnapshot:
+        with self._lock:
+            self._prices[ids] = prices
+            return self.__evaluate()
+
+    def update(self, prices: Dict[str,float]) -> RiskSnapshot:
+        return self.update_prices(self.get_ids(list(prices)),numpy.fromiter(prices.values(),dtype=numpy.float64,count=len(prices)))
+
+    def evaluate(self) -> RiskSnapshot:
+        with self._lock:
+            return self.__evaluate()
+
+    # Sell orders for every open position whose stop loss or limit order the
+    # snapshot found hit. Stop losses win when both are.
+    def get_exit_orders(self, snapshot: RiskSnapshot, date: int = None) -> List[Order]:
+        stopped = numpy.flatnonzero(snapshot.stop_loss)
+        limited = numpy.flatnonzero(snapshot.limit_order & ~snapshot.stop_loss)
+        orders: List[Order] = list()
+        for positions, exit_type in ((stopped,ExitType.STOP_LOSS),(limited,ExitType.LIMIT)):
+            for position, shares, price in zip(positions.tolist(),self._shares[positions].tolist(),self._prices[positions].tolist()):
+                orders.append(Order(self._tickers[position],TradeSignal.SELL,Side.SELL_SIDE,shares,price,date,exit_type))
+        return orders
+
+    # Turns the (history, signal, date) results of an execute_*_strategy call
+    # into sized orders. Sells are capped at the shares held and dropped when
+    # nothing is held. Buys are sized up to the position's exposure limit,
+    # then granted in order against the remaining gross exposure and
+    # available funds, and dropped when nothing is left. HOLD is dropped.
+    def filter_signals(self, signals: List[Tuple[PriceHistory, TradeSignal, int]], prices: Dict[str,float] = None) -> List[Order]:
+        tickers = [history.get_ticker() for history, _, _ in signals]
+        with self._lock:
+            ids = self.get_ids(tickers)
+            latest = self._prices[ids]
+            for i, (history, _, _) in enumerate(signals):
+                if prices is not None and tickers[i] in prices:
+                    latest[i] = prices[tickers[i]]
+                elif not latest[i] > 0:
+                    latest[i] = float(history.get_close()[-1])
+            self._prices[ids] = latest
+            snapshot = self.__evaluate()
+
+            kinds = numpy.array([1 if signal in BUY_SIGNALS else -1 if signal in SELL_SIGNALS else 0 for _, signal, _ in signals],dtype=numpy.int8)
+            held = self._shares[ids]
+            sell_shares = numpy.where((kinds == -1) & (held > 0),held,0.0)
+
+            # Buys, up to what each position may still add, then shared out
+            # in order against the portfolio wide headroom
+            per_position = numpy.maximum(self.portfolio.get_max_exposure_allowed() * snapshot.equity - numpy.abs(snapshot.market_values[ids]),0.0)
+            wanted = numpy.where(kinds == 1,per_position,0.0)
+            budget = max(0.0,min(self.max_gross_exposure * snapshot.equity - snapshot.gross_exposure * snapshot.equity,self.portfolio.get_current_funds()))
+            granted = numpy.diff(numpy.minimum(numpy.cumsum(wanted),budget),prepend=0.0)
+            buy_shares = numpy.floor(granted / latest)
+
+        orders: List[Order] = list()
+        for i, (_, signal, date) in enumerate(signals):
+            if kinds[i] == 1 and buy_shares[i] > 0:
+                orders.append(Order(tickers[i],signal,Side.BUY_SIDE,float(buy_shares[i]),float(latest[i]),date))
+            elif kinds[i] == -1 and sell_shares[i] > 0:
+                orders.append(Order(tickers[i],signal,Side.SELL_SIDE,float(sell_shares[i]),float(latest[i]),date))
+        return orders
+
+    # Books filled orders into the position arrays and the portfolio's
+    # available funds. Buys average into the entry price.
+    def apply_fills(self, orders: List[Order]) -> None:
+        with self._lock:
+            for order in orders:
+                position = self.get_id(order.ticker)
+                shares = self._shares[position]
+                if order.side == Side.BUY_SIDE:
+                    total = shares + order.shares
+                    self._entry_prices[position] = (shares * self._entry_prices[position] + order.get_value()) / total if total else 0.0
+                    self._shares[position] = total
+                    self.portfolio.current_available_funds -= order.get_value()
+                else:
+                    sold = min(order.shares,shares)
+                    self._shares[position] = shares - sold
+                    self.portfolio.current_available_funds += sold * order.price
+                    if self._shares[position] == 0:
+                        self._entry_prices[position] = 0.0
+                self._prices[position] = order.price
+
+    # Writes the positions back into the portfolio's Holdings
+    def sync_portfolio(self) -> Portfolio:
+        with self._lock:
+            snapshot = self.__evaluate()
+            holdings = self.portfolio.get_holdings()
+            for position, ticker in enumerate(self.get_tickers()):
+                shares = float(self._shares[position])
+                if shares == 0 and ticker not in holdings:
+                    continue
+                holdings[ticker] = Holdings(shares,float(self._entry_prices[position]),float(snapshot.market_values[position]))
+            self.portfolio.total_funds = snapshot.equity
+        return self.portfolio
+
+    def __evaluate(self) -> RiskSnapshot:
+        size = self._size
+        shares = self._shares[:size]
+        entry_prices = self._entry_prices[:size]
+        prices = self._prices[:size]
+        # Positions without a price yet are valued at their entry price
+        marks = numpy.where(numpy.isnan(prices),entry_prices,prices)
+        market_values = shares * marks
+        unrealized = shares * (marks - entry_prices)
+        gross = numpy.abs(market_values)
+        equity = self.portfolio.get_current_funds() + float(market_values.sum())
+        exposure = gross / equity if equity > 0 else numpy.full(size,numpy.inf)
+        open_positions = shares > 0
+        stop_loss = open_positions & (marks <= entry_prices * self.portfolio.get_stop_loss())
+        limit_order = open_positions & (marks >= entry_prices * self.portfolio.get_limit_order())
+        over_exposed = exposure > self.portfolio.get_max_exposure_allowed()
+        return RiskSnapshot(equity,float(exposure.sum()),market_values,unrealized,exposure,stop_loss,limit_order,over_exposed)
+
+    def __grow(self, capacity: int) -> None:
+        for name, fill in (('_shares',0.0),('_entry_prices',0.0),('_prices',numpy.nan)):
+            buffer = getattr(self,name)
+            grown = numpy.full(capacity,fill)
+            grown[:len(buffer)] = buffer
+            setattr(self,name,grown)
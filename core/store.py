@@ -0,0 +1,162 @@
+from .models.history import PriceHistory, ColumnarPriceHistory, CANDLE_COLUMNS
+from .enums.enums import FrequencyType
+from typing import Dict, List, Tuple
+import os
+import numpy
+
+
+COLUMN_DTYPES: Dict[str,numpy.dtype] = {name: numpy.dtype('<f8') for name in CANDLE_COLUMNS[:-1]}
+COLUMN_DTYPES['date'] = numpy.dtype('<i8')
+"""
+The on disk type of every column. Fixed little endian so files can move
+between machines
+"""
+
+HEADER_DTYPE = numpy.dtype([('magic','S8'),('capacity','<i8'),('size','<i8'),('reserved','<i8')])
+
+MAGIC = b'CVCANDLE'
+
+MINIMUM_CAPACITY = 1024
+
+
+class CandleStore:
+    """
+    A local, append-only candle store with one memory mapped columnar file
+    per ticker and frequency, e.g. <root>/AAPL/MINUTE_1.candles. A file holds
+    a small header followed by one block per candle column, each sized to
+    the file's capacity. Loading maps the file once and hands a
+    ColumnarPriceHistory contiguous views of the blocks, so only the pages
+    a strategy reads are pulled into memory. Time ranges are found with a
+    binary search on the epoch millisecond date column.
+
+    Writes only append candles newer than the last stored one. Rows are
+    written into the spare capacity first and the size in the header is
+    updated last, so an interrupted write leaves the file as it was. A full
+    file is rewritten with double the capacity. One writer per file is
+    assumed.
+    """
+    root: str
+
+    def __init__(self, root: str) -> None:
+        self.root = root
+        os.makedirs(root,exist_ok=True)
+
+    def get_path(self, ticker: str, frequency_type: FrequencyType, frequency: int) -> str:
+        return os.path.join(self.root,ticker,f'{frequency_type.name}_{frequency}.candles')
+
+    def get_tickers(self) -> List[str]:
+        return sorted(entry for entry in os.listdir(self.root) if os.path.isdir(os.path.join(self.root,entry)))
+
+    # Returns the number of stored candles
+    def get_size(self, ticker: str, frequency_type: FrequencyType, frequency: int) -> int:
+        path = self.get_path(ticker,frequency_type,frequency)
+        return int(self.__read_header(path)['size']) if os.path.exists(path) else 0
+
+    # Returns the date of the newest stored candle, or None if there is none.
+    # Useful to only download what is missing.
+    def get_last_date(self, ticker: str, frequency_type: FrequencyType, frequency: int) -> int:
+        path = self.get_path(ticker,frequency_type,frequency)
+        if not os.path.exists(path):
+            return None
+        header = self.__read_header(path)
+        if header['size'] == 0:
+            return None
+        with open(path,'rb') as file:
+            file.seek(self.__column_offset('date',int(header['capacity'])) + (int(header['size']) - 1) * COLUMN_DTYPES['date'].itemsize)
+            return int(numpy.frombuffer(file.read(COLUMN_DTYPES['date'].itemsize),dtype=COLUMN_DTYPES['date'])[0])
+
+    # Appends the candles of the history that are newer than the last stored
+    # candle and returns how many were written.
+    def write(self, history: PriceHistory) -> int:
+        path = self.get_path(history.get_ticker(),history.get_frequency_type(),history.get_frequency())
+        columns = history.get_columns()
+        dates = columns['date']
+        if len(dates) > 1 and numpy.any(numpy.diff(dates) <= 0):
+            raise ValueError(f'[ERROR]: Candles for {history.get_ticker()} must be in increasing date order')
+
+        last_date = self.get_last_date(history.get_ticker(),history.get_frequency_type(),history.get_frequency())
+        first = int(numpy.searchsorted(dates,last_date,side='right')) if last_date is not None else 0
+        count = len(dates) - first
+        if count == 0:
+            return 0
+
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path),exist_ok=True)
+            self.__create_file(path,max(MINIMUM_CAPACITY,count))
+        header = self.__read_header(path)
+        size, capacity = int(header['size']), int(header['capacity'])
+        if size + count > capacity:
+            capacity = self.__grow_file(path,size,max(2 * capacity,size + count))
+
+        with open(path,'r+b') as file:
+            for name in CANDLE_COLUMNS:
+                file.seek(self.__column_offset(name,capacity) + size * COLUMN_DTYPES[name].itemsize)
+                file.write(numpy.ascontiguousarray(columns[name][first:],dtype=COLUMN_DTYPES[name]).tobytes())
+            file.flush()
+            self.__write_header(file,capacity,size + count)
+        return count
+
+    # Loads the candles of a ticker whose dates fall in [start_date, end_date]
+    # as a ColumnarPriceHistory backed by a memory map of its file.
+    def load(self, ticker: str, frequency_type: FrequencyType = FrequencyType.DAY, frequency: int = 1, start_date: int = None, end_date: int = None) -> ColumnarPriceHistory:
+        columns = self.__map_columns(self.get_path(ticker,frequency_type,frequency))
+        first, last = self.__find_range(columns['date'],start_date,end_date)
+        history = ColumnarPriceHistory.from_arrays(ticker,*(columns[name][first:last] for name in CANDLE_COLUMNS),frequency_type=frequency_type,frequency=frequency)
+        if last > first:
+            history.start_date = int(columns['date'][first])
+            history.end_date = int(columns['date'][last - 1])
+        return history
+
+    def load_all(self, tickers: List[str], frequency_type: FrequencyType = FrequencyType.DAY, frequency: int = 1, start_date: int = None, end_date: int = None) -> List[ColumnarPriceHistory]:
+        return [self.load(ticker,frequency_type,frequency,start_date,end_date) for ticker in tickers]
+
+    def __find_range(self, dates: numpy.ndarray, start_date: int, end_date: int) -> Tuple[int,int]:
+        first = int(numpy.searchsorted(dates,start_date,side='left')) if start_date is not None else 0
+        last = int(numpy.searchsorted(dates,end_date,side='right')) if end_date is not None else len(dates)
+        return first, max(first,last)
+
+    def __column_offset(self, name: str, capacity: int) -> int:
+        return HEADER_DTYPE.itemsize + CANDLE_COLUMNS.index(name) * capacity * 8
+
+    def __read_header(self, path: str) -> numpy.void:
+        with open(path,'rb') as file:
+            header = numpy.frombuffer(file.read(HEADER_DTYPE.itemsize),dtype=HEADER_DTYPE)[0]
+        if header['magic'] != MAGIC:
+            raise ValueError(f'[ERROR]: {path} is not a candle file')
+        return header
+
+    def __write_header(self, file, capacity: int, size: int) -> None:
+        file.seek(0)
+        file.write(numpy.array([(MAGIC,capacity,size,0)],dtype=HEADER_DTYPE).tobytes())
+
+    # Unused capacity is left as a hole, so it takes no disk space on file
+    # systems that support sparse files.
+    def __create_file(self, path: str, capacity: int) -> None:
+        with open(path,'wb') as file:
+            file.truncate(self.__column_offset(CANDLE_COLUMNS[-1],capacity) + capacity * 8)
+            self.__write_header(file,capacity,0)
+
+    # Copies the stored rows into a new file with more capacity and swaps it
+    # in atomically
+    def __grow_file(self, path: str, size: int, capacity: int) -> int:
+        columns = self.__map_columns(path)
+        grown = path + '.tmp'
+        self.__create_file(grown,capacity)
+        with open(grown,'r+b') as file:
+            for name in CANDLE_COLUMNS:
+                file.seek(self.__column_offset(name,capacity))
+                file.write(numpy.ascontiguousarray(columns[name][:size]).tobytes())
+            self.__write_header(file,capacity,size)
+        del columns
+        os.replace(grown,path)
+        return capacity
+
+    def __map_columns(self, path: str) -> Dict[str,numpy.ndarray]:
+        if not os.path.exists(path):
+            return {name: numpy.empty(0,dtype=COLUMN_DTYPES[name]) for name in CANDLE_COLUMNS}
+        header = self.__read_header(path)
+        size, capacity = int(header['size']), int(header['capacity'])
+        if size == 0:
+            return {name: numpy.empty(0,dtype=COLUMN_DTYPES[name]) for name in CANDLE_COLUMNS}
+        mapped = numpy.memmap(path,dtype=numpy.uint8,mode='r')
+        return {name: mapped[self.__column_offset(name,capacity):self.__column_offset(name,capacity) + size * 8].view(COLUMN_DTYPES[name]) for name in CANDLE_COLUMNS}
@@ -1,10 +1,34 @@
-from models.history import PriceHistory, Candle
-from models.record import TradeRecord,RecordHolder
-from models.portfolio import Portfolio
-from enums.enums import TradeSignal, MovingAverageType, FrequencyType, RewardType
-from typing import Set, List, Tuple
-from concurrent.futures import ThreadPoolExecutor, Future
-import pandas
+from .models.history import PriceHistory, Candle
+from .models.record import TradeRecord,RecordHolder
+from .models.portfolio import Portfolio, Holdings
+from .enums.enums import TradeSignal, MovingAverageType, FrequencyType, RewardType
+from .indicators.streaming import BollingerBandState, DualMovingAverageState, ScalpingState
+from .indicators import batch
+from .indicators.cache import IndicatorCache
+from typing import TYPE_CHECKING, List, Tuple, Dict
+from .executors import StrategyExecutor, ThreadExecutor
+from .resample import window_in_bars
+from .pairs import PairScreener, pair_statistics, ENGLE_GRANGER_CRITICAL_VALUE
+from .metrics import MetricsRegistry, StageTimer, NULL_TIMER
+from .arbitrage import ArbitrageScanner, ArbitrageOpportunity
+import logging
+import math
+
+if TYPE_CHECKING:
+    import pandas
+
+logger = logging.getLogger(__name__)
+
+BAND_MINIMUM_WINDOW = 2
+"""
+Fewest bars a bollinger band window converts to. The bands need a sample
+standard deviation, so monthly and slower histories get 2 bars instead of 1
+"""
+
+OPPOSITE_SIGNALS: Dict[TradeSignal,TradeSignal] = {TradeSignal.LONG: TradeSignal.SHORT,TradeSignal.SHORT: TradeSignal.LONG}
+"""
+Signal journaled for the second ticker of a pair, which trades the other side
+"""
 
 
 
@@ -14,39 +38,81 @@ class Strategy:
     The Strategy Class contains all the strategies you can use to predict to buy, sold, or hold a stock.
     """
     record_holder: RecordHolder
+    executor: StrategyExecutor
+    """
+    Runs the per ticker work of the execute_*_strategy functions. Defaults to
+    a bounded thread pool that is reused across calls
+    """
+    indicator_cache: IndicatorCache
+    """
+    Optional cache of moving averages, rsi and band widths shared by every
+    strategy call made through this instance
+    """
+    metrics: MetricsRegistry
+    """
+    Optional registry that receives per stage timings of every strategy task
+    and per ticker evaluation and signal counters. Nothing is measured when
+    it is not set
+    """
 
-    def __init__(self) -> None:
-        self.record_list = RecordHolder()
+    def __init__(self, executor: StrategyExecutor = None, indicator_cache: IndicatorCache = None, metrics: MetricsRegistry = None) -> None:
+        self.record_holder = RecordHolder()
+        self.executor = executor if executor is not None else ThreadExecutor()
+        self.indicator_cache = indicator_cache
+        self.metrics = metrics
 
     ################################################################# HELPER FUNCTIONS ##################################################################################################
 
+    def __start_timer(self, scope: str) -> StageTimer:
+        if self.metrics is None:
+            return NULL_TIMER
+        return self.metrics.start_timer(scope)
+
+    # Counts one evaluation of the ticker and the signal it produced
+    def __count_signal(self, scope: str, ticker: str, signal: TradeSignal) -> None:
+        if self.metrics is None:
+            return
+        self.metrics.increment(f'{scope}.evaluations',ticker)
+        self.metrics.increment(f'{scope}.signal.{signal.name}',ticker)
+
+    # Journals every signal other than HOLD
+    def __record_signal(self, records: TradeRecord, signal: TradeSignal, curr_price: float, curr_date: int) -> None:
+        if signal != TradeSignal.HOLD:
+            records.write_signal(signal,curr_price,curr_date)
+
+    # Journals a non HOLD signal of the ticker in a record of its own, for the
+    # batch paths that have no per ticker record to write into
+    def __journal_signal(self, ticker: str, signal: TradeSignal, curr_price: float, curr_date: int) -> None:
+        if signal == TradeSignal.HOLD:
+            return
+        records = TradeRecord(ticker=ticker)
+        self.__record_signal(records,signal,curr_price,curr_date)
+        self.record_holder.insert_record(records)
+
+    # Journals the buy venue's leg of an arbitrage opportunity as LONG and the
+    # sell venue's leg as SHORT
+    def __journal_opportunity(self, opportunity: ArbitrageOpportunity) -> None:
+        self.__journal_signal(opportunity.instrument,TradeSignal.LONG,opportunity.buy_price,opportunity.date)
+        self.__journal_signal(opportunity.instrument,TradeSignal.SHORT,opportunity.sell_price,opportunity.date)
+
+    # Closes the timer of an execute_*_strategy call and counts the call
+    def __finish_call(self, scope: str, timer: StageTimer, tickers: int) -> None:
+        timer.finish()
+        if self.metrics is not None:
+            self.metrics.increment(f'{scope}.calls')
+            self.metrics.increment(f'{scope}.tickers',amount=tickers)
+        logger.debug('[ACTION]: %s evaluated %d tickers',scope,tickers)
+
     ################################################################# PUBLIC FUNCTIONS ##################################################################################################
 
-    def __generate_correct_window(self, frequency_type: FrequencyType, interval: int, average_window) -> int:
-        if frequency_type.value == FrequencyType.SECOND.value:
-            day_in_seconds = 1 * 24 * 60 * 60  # 86,4000sec/1day
-            day_in_seconds *= average_window  # normalizing window in days to seconds in days
-            average_window = day_in_seconds / interval()  # window represents number of tickers needed to be added to represent
-            return average_window
-        elif frequency_type.value == frequency_type.MINUTE.value:
-            day_in_minutes = 1 * 24 * 60
-            day_in_minutes *= average_window
-            average_window /= interval()
-            return average_window
-        elif frequency_type.value == FrequencyType.HOUR.value:
-            day_in_hours = 24
-            day_in_hours *= average_window
-            day_in_hours /= interval()
-        elif frequency_type.value == FrequencyType.DAY.value:
-            average_window /= interval()
-            return average_window
-        elif frequency_type.value == FrequencyType.MONTH or frequency_type.value == FrequencyType.QUARTER.value or frequency_type.value == FrequencyType.YEAR.value:
-            return 0
-        else:
-            print("[ERROR]: Could not determine course of action against interval type....")
-            return 1
+    # Converts a window in days into the number of bars of the ticker's frequency
+    def __generate_correct_window(self, frequency_type: FrequencyType, interval: int, average_window, minimum: int = 1) -> int:
+        return window_in_bars(frequency_type,interval,average_window,minimum)
 
-    def __generate_rsi(self,data: pandas.DataFrame ,window: int):
+    def __generate_rsi(self,data: 'pandas.DataFrame' ,window: int, ticker: PriceHistory = None):
+        if self.indicator_cache is not None and ticker is not None:
+            data['rsi'] = self.indicator_cache.rsi(ticker,window)
+            return
 
         delta = data['close'].diff()
 
@@ -62,89 +128,339 @@ class Strategy:
 
         data['rsi'] = rsi
 
-    def __generate_moving_average(self,type: MovingAverageType,window: int,df: pandas.DataFrame, frequency_type: FrequencyType) -> None:
-        if type == MovingAverageType.EXPONENTIAL:
-            if window == 0:
-                df.resample(frequency_type.name).last()
-
-            df[f'{window}'] = df['close'].rolling(window=window).mean()
-        else:
-            if window == 0:
-                df.resample(frequency_type.name).last()
+    def __generate_moving_average(self,type: MovingAverageType,window: int,df: 'pandas.DataFrame', frequency_type: FrequencyType, ticker: PriceHistory = None) -> None:
+        if self.indicator_cache is not None and ticker is not None:
+            df[f'{window}'] = self.indicator_cache.moving_average(ticker,type,window)
+            return
 
+        if type == MovingAverageType.EXPONENTIAL:
             df[f'{window}'] = df['close'].ewm(span=window, adjust=False).mean()
+        else:
+            df[f'{window}'] = df['close'].rolling(window=window).mean()
 
-    def execute_arbitrage_strategy(self, potential_stocks: Set[PriceHistory]):
-        pass
+    # Finds instruments quoted far enough apart across venues to buy on one
+    # and sell on the other after costs. potential_stocks holds each venue's
+    # histories keyed by venue, the same ticker on two venues being the same
+    # instrument. Like the pairs strategy, LONG means buy the first history
+    # of the pair and sell the second. For streaming prices keep the scanner
+    # from create_arbitrage_stream and feed it through execute_arbitrage_stream.
+    def execute_arbitrage_strategy(self, potential_stocks: Dict[str,List[PriceHistory]], cost: float = 0.001, max_age: int = 0) -> List[
+        Tuple[Tuple[PriceHistory, PriceHistory], TradeSignal]]:
+        timer = self.__start_timer('execute_arbitrage_strategy')
+        scanner = self.create_arbitrage_stream(potential_stocks,cost,max_age)
+        timer.mark('scan')
+        trading_results: List[Tuple[Tuple[PriceHistory, PriceHistory], TradeSignal]] = []
+        for opportunity in scanner.get_opportunities():
+            self.__journal_opportunity(opportunity)
+            self.__count_signal('arbitrage_task',opportunity.instrument,TradeSignal.LONG)
+            trading_results.append(((scanner.get_history(opportunity.instrument,opportunity.buy_venue),scanner.get_history(opportunity.instrument,opportunity.sell_venue)),TradeSignal.LONG))
+        timer.mark('signal')
+        self.__finish_call('execute_arbitrage_strategy',timer,sum(len(histories) for histories in potential_stocks.values()))
+        return trading_results
 
-    def execute_bollinger_band_strategy(self,portfolio: Portfolio, potential_stocks: List[PriceHistory], triggers:dict, type: MovingAverageType, window: float, std: int, rsi_window: int, rsi_upper_bound: float, rsi_lower_bound: float) -> List[Tuple[PriceHistory, TradeSignal]]:
-        numOfStocks = len(potential_stocks)
-        executor: ThreadPoolExecutor = ThreadPoolExecutor(max_workers=numOfStocks)
-        futures: List[Future[Tuple[TradeSignal,int]]] = []
-        for ticker in potential_stocks:
-            futures.append(executor.submit(self.__bollinger_band_task(portfolio,ticker,type,triggers,window,std,rsi_window,rsi_upper_bound,rsi_lower_bound)))
-        executor.shutdown(wait=True)
+    def create_arbitrage_stream(self, potential_stocks: Dict[str,List[PriceHistory]], cost: float = 0.001, max_age: int = 0) -> ArbitrageScanner:
+        scanner = ArbitrageScanner(cost,max_age)
+        scanner.add_histories(potential_stocks)
+        return scanner
+
+    # Records a new price of the instrument on the venue and returns the
+    # instrument's opportunity, or None. Only that instrument is re-checked.
+    def execute_arbitrage_stream(self, scanner: ArbitrageScanner, instrument: str, venue: str, candle: Candle) -> ArbitrageOpportunity:
+        timer = self.__start_timer('execute_arbitrage_stream')
+        opportunity = scanner.update(instrument,venue,candle.close,candle.date)
+        timer.mark('update')
+        if opportunity is not None:
+            self.__journal_opportunity(opportunity)
+        self.__count_signal('arbitrage_task',instrument,TradeSignal.LONG if opportunity is not None else TradeSignal.HOLD)
+        self.__finish_call('execute_arbitrage_stream',timer,1)
+        return opportunity
+
+    def execute_bollinger_band_strategy(self,portfolio: Portfolio, potential_stocks: List[PriceHistory], triggers:dict, type: MovingAverageType, window: float, std: int, rsi_window: int, rsi_upper_bound: float, rsi_lower_bound: float) -> List[Tuple[PriceHistory, TradeSignal, int]]:
+        timer = self.__start_timer('execute_bollinger_band_strategy')
+        if self.executor.uses_processes:
+            trading_results = self.__execute_bollinger_band_in_processes(timer,portfolio,potential_stocks,triggers,type,window,std,rsi_window,rsi_upper_bound,rsi_lower_bound)
+            self.__finish_call('execute_bollinger_band_strategy',timer,len(potential_stocks))
+            return trading_results
+
+        results: List[Tuple[TradeSignal,int]] = self.executor.map(lambda ticker: self.__bollinger_band_task(portfolio,ticker,type,triggers,window,std,rsi_window,rsi_upper_bound,rsi_lower_bound),potential_stocks)
+        timer.mark('fan_out')
 
         trading_results: List[Tuple[PriceHistory, TradeSignal,int]] = []
 
-        for i in range(0, len(futures)):
-            result,date = futures[i].result()
+        for i in range(0, len(results)):
+            result,date = results[i]
             trading_results.append((potential_stocks[i],result,date))
 
+        self.__finish_call('execute_bollinger_band_strategy',timer,len(potential_stocks))
         return trading_results
 
-    def execute_moving_average_strategy(self, potential_stocks: List[PriceHistory], type: MovingAverageType, first_window: int, second_window: int) -> List[Tuple[PriceHistory, TradeSignal]]:
-        numOfStocks = len(potential_stocks)
-        executor: ThreadPoolExecutor = ThreadPoolExecutor(max_workers=numOfStocks)
-        futures: List[Future[TradeSignal]] = []
-        for ticker in potential_stocks:
-            futures.append(executor.submit(self.__dual_moving_average_task(ticker, type, first_window, second_window)))
-        executor.shutdown(wait=True)
+    def execute_moving_average_strategy(self, portfolio: Portfolio, potential_stocks: List[PriceHistory], triggers: dict, type: MovingAverageType, first_window: int, second_window: int, rsi_window: int = 14, rsi_upper_bound: float = 70.0, rsi_lower_bound: float = 30.0) -> List[Tuple[PriceHistory, TradeSignal, int]]:
+        timer = self.__start_timer('execute_moving_average_strategy')
+        if self.executor.uses_processes:
+            trading_results = self.__execute_dual_moving_average_in_processes(timer,portfolio,potential_stocks,triggers,type,first_window,second_window,rsi_window,rsi_upper_bound,rsi_lower_bound)
+            self.__finish_call('execute_moving_average_strategy',timer,len(potential_stocks))
+            return trading_results
 
-        trading_results: List[Tuple[PriceHistory, TradeSignal]] = []
+        results: List[Tuple[TradeSignal,int]] = self.executor.map(lambda ticker: self.__dual_moving_average_task(portfolio,ticker,type,first_window,second_window,triggers,rsi_window,rsi_upper_bound,rsi_lower_bound),potential_stocks)
+        timer.mark('fan_out')
 
-        for i in range(0, len(futures)):
-            trading_results.append((potential_stocks[i], futures[i].result()))
+        trading_results: List[Tuple[PriceHistory, TradeSignal, int]] = []
+
+        for i in range(0, len(results)):
+            result,date = results[i]
+            trading_results.append((potential_stocks[i],result,date))
 
+        self.__finish_call('execute_moving_average_strategy',timer,len(potential_stocks))
         return trading_results
 
-    def execute_pairs_trading_strategy(self, stock_pairs_list: List[Tuple[PriceHistory, PriceHistory]]) -> List[
+    # Process pool version of execute_bollinger_band_strategy. Workers only
+    # receive the tail of each ticker's closes and return the latest
+    # indicator values. Signals are decided here so triggers and records are
+    # updated in this process.
+    def __execute_bollinger_band_in_processes(self,timer: StageTimer,portfolio: Portfolio, potential_stocks: List[PriceHistory], triggers:dict, type: MovingAverageType, window: float, std: int, rsi_window: int, rsi_upper_bound: float, rsi_lower_bound: float) -> List[Tuple[PriceHistory, TradeSignal, int]]:
+        holdings = portfolio.get_holdings()
+        windows = [self.__generate_correct_window(ticker.get_frequency_type(),ticker.get_frequency(),window,BAND_MINIMUM_WINDOW) for ticker in potential_stocks]
+        payloads = [ticker.get_close()[-batch.bollinger_band_lookback(type,average_window,rsi_window):] for ticker, average_window in zip(potential_stocks,windows)]
+        timer.mark('payload')
+        values = self.executor.map(_latest_bollinger_band,list(zip(payloads,windows)),type,std,rsi_window)
+        timer.mark('fan_out')
+
+        trading_results: List[Tuple[PriceHistory, TradeSignal, int]] = []
+        for ticker, (curr_price, lower_band, upper_band, rsi) in zip(potential_stocks,values):
+            signal = self.__bollinger_band_signal(holdings.get(ticker.get_ticker()),triggers,curr_price,lower_band,upper_band,rsi,rsi_upper_bound,rsi_lower_bound)
+            records = TradeRecord(ticker=ticker.get_ticker())
+            self.__record_signal(records,signal,curr_price,ticker.get_dates()[-1])
+            self.record_holder.insert_record(records)
+            self.__count_signal('bollinger_band_task',ticker.get_ticker(),signal)
+            trading_results.append((ticker,signal,int(ticker.get_dates()[-1])))
+        timer.mark('signal')
+        return trading_results
+
+    # Process pool version of execute_moving_average_strategy
+    def __execute_dual_moving_average_in_processes(self, timer: StageTimer, portfolio: Portfolio, potential_stocks: List[PriceHistory], triggers: dict, type: MovingAverageType, first_window: int, second_window: int, rsi_window: int, rsi_upper_bound: float, rsi_lower_bound: float) -> List[Tuple[PriceHistory, TradeSignal, int]]:
+        holdings = portfolio.get_holdings()
+        windows = [tuple(self.__generate_correct_window(ticker.get_frequency_type(),ticker.get_frequency(),w) for w in (first_window,second_window)) for ticker in potential_stocks]
+        payloads = [ticker.get_close()[-max(batch.moving_average_lookback(type,f_window),batch.moving_average_lookback(type,s_window),batch.ewm_lookback(1.0 / rsi_window) + 1):] for ticker, (f_window, s_window) in zip(potential_stocks,windows)]
+        timer.mark('payload')
+        values = self.executor.map(_latest_dual_moving_average,list(zip(payloads,windows)),type,rsi_window)
+        timer.mark('fan_out')
+
+        trading_results: List[Tuple[PriceHistory, TradeSignal, int]] = []
+        for ticker, (curr_price, fast_avg_price, slow_avg_price, rsi) in zip(potential_stocks,values):
+            signal = self.__dual_moving_average_signal(holdings.get(ticker.get_ticker()),triggers,curr_price,fast_avg_price,slow_avg_price,rsi,rsi_upper_bound,rsi_lower_bound)
+            records = TradeRecord(ticker=ticker.get_ticker())
+            self.__record_signal(records,signal,curr_price,ticker.get_dates()[-1])
+            self.record_holder.insert_record(records)
+            self.__count_signal('dual_moving_average_task',ticker.get_ticker(),signal)
+            trading_results.append((ticker,signal,int(ticker.get_dates()[-1])))
+        timer.mark('signal')
+        return trading_results
+
+    # Evaluates the bollinger band strategy for every ticker with a few
+    # vectorized passes over a (time x ticker) close panel instead of one
+    # task per ticker. Tickers are grouped by frequency since the window
+    # in bars depends on it.
+    def execute_bollinger_band_strategy_batch(self,portfolio: Portfolio, potential_stocks: List[PriceHistory], triggers:dict, type: MovingAverageType, window: float, std: int, rsi_window: int, rsi_upper_bound: float, rsi_lower_bound: float) -> List[Tuple[PriceHistory, TradeSignal, int]]:
+        timer = self.__start_timer('execute_bollinger_band_strategy_batch')
+        holdings = portfolio.get_holdings()
+        trading_results: List[Tuple[PriceHistory, TradeSignal, int]] = [None] * len(potential_stocks)
+        for average_window, positions in self.__group_by_window(potential_stocks,window,minimum=BAND_MINIMUM_WINDOW).items():
+            group = [potential_stocks[i] for i in positions]
+            rows = batch.bollinger_band_lookback(type,average_window,rsi_window)
+            closes, dates = batch.align_closes(group,rows)
+            timer.mark('align')
+            _, upper_band, lower_band = batch.bollinger_bands(closes,type,average_window,std)
+            timer.mark('bands')
+            rsi = batch.rsi(closes,rsi_window)[-1]
+            timer.mark('rsi')
+            curr_prices, upper_band, lower_band = closes[-1], upper_band[-1], lower_band[-1]
+            for column, position in enumerate(positions):
+                ticker = group[column]
+                signal = self.__bollinger_band_signal(holdings.get(ticker.get_ticker()),triggers,curr_prices[column],lower_band[column],upper_band[column],rsi[column],rsi_upper_bound,rsi_lower_bound)
+                self.__journal_signal(ticker.get_ticker(),signal,curr_prices[column],int(dates[column]))
+                self.__count_signal('bollinger_band_task',ticker.get_ticker(),signal)
+                trading_results[position] = (ticker,signal,int(dates[column]))
+            timer.mark('signal')
+        self.__finish_call('execute_bollinger_band_strategy_batch',timer,len(potential_stocks))
+        return trading_results
+
+    # Evaluates the dual moving average strategy for every ticker with a few
+    # vectorized passes over a (time x ticker) close panel.
+    def execute_moving_average_strategy_batch(self, portfolio: Portfolio, potential_stocks: List[PriceHistory], triggers: dict, type: MovingAverageType, first_window: int, second_window: int, rsi_window: int = 14, rsi_upper_bound: float = 70.0, rsi_lower_bound: float = 30.0) -> List[Tuple[PriceHistory, TradeSignal, int]]:
+        timer = self.__start_timer('execute_moving_average_strategy_batch')
+        holdings = portfolio.get_holdings()
+        trading_results: List[Tuple[PriceHistory, TradeSignal, int]] = [None] * len(potential_stocks)
+        for (f_window, s_window), positions in self.__group_by_window(potential_stocks,first_window,second_window).items():
+            group = [potential_stocks[i] for i in positions]
+            rows = max(batch.moving_average_lookback(type,f_window),batch.moving_average_lookback(type,s_window),batch.ewm_lookback(1.0 / rsi_window) + 1)
+            closes, dates = batch.align_closes(group,rows)
+            timer.mark('align')
+            fast_avg_prices = batch.moving_average(closes,type,f_window)[-1]
+            slow_avg_prices = batch.moving_average(closes,type,s_window)[-1]
+            timer.mark('moving_average')
+            rsi = batch.rsi(closes,rsi_window)[-1]
+            timer.mark('rsi')
+            curr_prices = closes[-1]
+            for column, position in enumerate(positions):
+                ticker = group[column]
+                signal = self.__dual_moving_average_signal(holdings.get(ticker.get_ticker()),triggers,curr_prices[column],fast_avg_prices[column],slow_avg_prices[column],rsi[column],rsi_upper_bound,rsi_lower_bound)
+                self.__journal_signal(ticker.get_ticker(),signal,curr_prices[column],int(dates[column]))
+                self.__count_signal('dual_moving_average_task',ticker.get_ticker(),signal)
+                trading_results[position] = (ticker,signal,int(dates[column]))
+            timer.mark('signal')
+        self.__finish_call('execute_moving_average_strategy_batch',timer,len(potential_stocks))
+        return trading_results
+
+    # Groups the positions of the given stocks by the window(s) in bars their
+    # frequency converts the day based window(s) into.
+    def __group_by_window(self, potential_stocks: List[PriceHistory], *windows: int, minimum: int = 1) -> Dict[object,List[int]]:
+        groups: Dict[object,List[int]] = dict()
+        for position, ticker in enumerate(potential_stocks):
+            converted = tuple(self.__generate_correct_window(ticker.get_frequency_type(),ticker.get_frequency(),window,minimum) for window in windows)
+            groups.setdefault(converted[0] if len(converted) == 1 else converted,[]).append(position)
+        return groups
+
+    # Screens the universe for cointegrated pairs. See PairScreener
+    def find_pairs(self, potential_stocks: List[PriceHistory], lookback: int = 250, min_correlation: float = 0.8, adf_threshold: float = ENGLE_GRANGER_CRITICAL_VALUE) -> List[Tuple[PriceHistory, PriceHistory]]:
+        screener = PairScreener(lookback,min_correlation,adf_threshold,self.executor)
+        return [pair.get_pair() for pair in screener.screen(potential_stocks)]
+
+    def execute_pairs_trading_strategy(self, stock_pairs_list: List[Tuple[PriceHistory, PriceHistory]], lookback: int = 250, entry_zscore: float = 2.0) -> List[
         Tuple[Tuple[PriceHistory, PriceHistory], TradeSignal]]:
-        numOfStocks = len(stock_pairs_list)
-        executor: ThreadPoolExecutor = ThreadPoolExecutor(max_workers=numOfStocks)
-        futures: List[Future[TradeSignal]] = []
-        for pair in stock_pairs_list:
-            futures.append(executor.submit(self.__pairs_trading_task(pair)))
-        executor.shutdown(wait=True)
+        timer = self.__start_timer('execute_pairs_trading_strategy')
+        # Workers only receive the tails of each pair's dates and closes
+        payloads = [tuple((ticker.get_dates()[-lookback - 1:],ticker.get_close()[-lookback - 1:]) for ticker in pair) for pair in stock_pairs_list]
+        statistics: List[Dict[str,float]] = self.executor.map(pair_statistics,payloads)
+        timer.mark('statistics')
 
         trading_results: List[Tuple[Tuple[PriceHistory, PriceHistory], TradeSignal]] = []
 
-        for i in range(0, len(futures)):
-            trading_results.append((stock_pairs_list[i], futures[i].result()))
+        for i in range(0, len(statistics)):
+            first, second = stock_pairs_list[i]
+            signal = self.__pairs_trading_task(statistics[i],entry_zscore)
+            # The second ticker of the pair trades the opposite side
+            if signal != TradeSignal.HOLD:
+                self.__journal_signal(first.get_ticker(),signal,float(first.get_close()[-1]),int(first.get_dates()[-1]))
+                self.__journal_signal(second.get_ticker(),OPPOSITE_SIGNALS[signal],float(second.get_close()[-1]),int(second.get_dates()[-1]))
+            self.__count_signal('pairs_trading_task',f'{first.get_ticker()}/{second.get_ticker()}',signal)
+            trading_results.append((stock_pairs_list[i], signal))
+        timer.mark('signal')
+        self.__finish_call('execute_pairs_trading_strategy',timer,2 * len(stock_pairs_list))
+        return trading_results
 
+    # Evaluates the scalping strategy on the latest bar of every ticker. Only
+    # the last bars the windows need are read. For tick by tick decisions
+    # keep the states from create_scalping_stream and feed each new candle
+    # through execute_scalping_stream instead.
+    def execute_scalping_strategy(self, portfolio: Portfolio, potential_stocks: List[PriceHistory], momentum_window: int = 5, vwap_window: int = 20, volume_window: int = 20, momentum_threshold: float = 0.001, vwap_threshold: float = 0.002, volume_spike: float = 2.0) -> List[Tuple[PriceHistory, TradeSignal, int]]:
+        timer = self.__start_timer('execute_scalping_strategy')
+        holdings = portfolio.get_holdings()
+        trading_results: List[Tuple[PriceHistory, TradeSignal, int]] = []
+        for ticker in potential_stocks:
+            state = self.create_scalping_stream(ticker,momentum_window,vwap_window,volume_window)
+            signal = self.__scalping_signal(holdings.get(ticker.get_ticker()),state,momentum_threshold,vwap_threshold,volume_spike)
+            records = TradeRecord(ticker=ticker.get_ticker())
+            self.__record_signal(records,signal,state.close,state.date)
+            self.record_holder.insert_record(records)
+            self.__count_signal('scalping_task',ticker.get_ticker(),signal)
+            trading_results.append((ticker,signal,state.date))
+        timer.mark('signal')
+        self.__finish_call('execute_scalping_strategy',timer,len(potential_stocks))
         return trading_results
 
-    def execute_scalping_strategy(self, potential_stocks: Set[PriceHistory]):
-        pass
+    # The signal is for the spread, first - hedge_ratio * second. LONG buys
+    # the first ticker and sells the second, SHORT does the opposite.
+    def __pairs_trading_task(self, statistics: Dict[str,float], entry_zscore: float) -> TradeSignal:
+        if statistics is None or math.isnan(statistics['zscore']):
+            return TradeSignal.HOLD
+        if statistics['zscore'] >= entry_zscore:
+            return TradeSignal.SHORT
+        if statistics['zscore'] <= -entry_zscore:
+            return TradeSignal.LONG
+        return TradeSignal.HOLD
+
+    # Decides the bollinger band signal from the latest price, band and rsi
+    # values. Shared by the DataFrame and streaming versions of the strategy.
+    def __bollinger_band_signal(self, holdings: Holdings, triggers: dict, curr_price: float, lower_band: float, upper_band: float, rsi: float, rsi_upper_bound: float, rsi_lower_bound: float) -> TradeSignal:
+        signal: TradeSignal = TradeSignal.HOLD
+        if upper_band > 0 and lower_band > 0:
+                
+                if curr_price > upper_band and rsi > rsi_upper_bound and holdings.number_of_shares > 0:
+                    signal = TradeSignal.SELL
+                    triggers['current_count'] = 0
+                elif curr_price < lower_band and rsi < rsi_lower_bound and holdings.number_of_shares > 0:
+                        """
+                        At this point, we do not have any shares and are in a perfect position to buy into the stock
+                        We will send a buy signal and the order will be handled by the bot.
+                        """
+                        signal = TradeSignal.BUY
+                        triggers['profit_trigger_amount'] = curr_price
+                else:
+                    signal = self.__take_profit_signal(holdings,triggers,curr_price)
+        return signal
 
-    def __pairs_trading_task(self, stock_pair: Tuple[PriceHistory, PriceHistory]) -> TradeSignal:
-        pass
+    # Decides the dual moving average signal from the latest price, averages
+    # and rsi. Shared by the DataFrame and streaming versions of the strategy.
+    def __dual_moving_average_signal(self, holdings: Holdings, triggers: dict, curr_price: float, fast_avg_price: float, slow_avg_price: float, rsi: float, rsi_upper_bound: float, rsi_lower_bound: float) -> TradeSignal:
+        signal: TradeSignal = TradeSignal.HOLD
+        if fast_avg_price > 0.0 and slow_avg_price > 0.0:
+            if curr_price > slow_avg_price and curr_price > fast_avg_price and rsi > rsi_upper_bound:
+                signal = TradeSignal.SELL
+                triggers['current_count'] = 0
+            elif curr_price < slow_avg_price and curr_price < fast_avg_price and rsi < rsi_lower_bound:
+                signal = TradeSignal.BUY
+                triggers['profit_trigger_amount'] = curr_price
+            else:
+                signal = self.__take_profit_signal(holdings,triggers,curr_price)
+        return signal
+
+    # Buys into a volume spike that moves the price up while it is not yet
+    # stretched above the vwap. Sells a held position once the price is
+    # stretched above the vwap or a volume spike moves it down.
+    def __scalping_signal(self, holdings: Holdings, state: ScalpingState, momentum_threshold: float, vwap_threshold: float, volume_spike: float) -> TradeSignal:
+        if not state.is_ready():
+            return TradeSignal.HOLD
+        spike = state.volume_ratio >= volume_spike
+        if holdings is not None and holdings.number_of_shares > 0:
+            if state.vwap_deviation >= vwap_threshold or (spike and state.momentum <= -momentum_threshold):
+                return TradeSignal.SELL
+        if spike and state.momentum >= momentum_threshold and state.vwap_deviation < vwap_threshold:
+            return TradeSignal.BUY
+        return TradeSignal.HOLD
+
+    def __take_profit_signal(self, holdings: Holdings, triggers: dict, curr_price: float) -> TradeSignal:
+        trigger_amount: float = holdings.purchase_amount
+        if holdings.number_of_shares > 0 and triggers.get('current_count') >= triggers.get('count_limit'):
+            if triggers.get('reward_type') == RewardType.DYNAMIC:
+                trigger_amount: float = triggers.get('profit_trigger_amount') + (triggers.get('profit_trigger_amount') * (triggers.get('reward_amount')/100.0))
+            else:
+                trigger_amount: float = holdings.purchase_amount + (holdings.purchase_amount * (triggers.get('reward_amount')/100.0))
+        if curr_price >= trigger_amount:
+            triggers['profit_trigger_amount'] = curr_price
+            return TradeSignal.TAKE_PROFIT
+        return TradeSignal.HOLD
 
     def __bollinger_band_task(self, portfolio: Portfolio,  ticker: PriceHistory, average_type: MovingAverageType, triggers:dict, window: int = 20, std: int = 2, rsi_val: int = 14, rsi_upper_bound: float = 70.0, rsi_lower_bound: float = 30.0) -> Tuple[TradeSignal,int,float]:
-        candles: List[Candle] = ticker.get_info()
+        timer = self.__start_timer('bollinger_band_task')
         holdings = portfolio.get_holdings().get(ticker.get_ticker())
-        signal: TradeSignal = TradeSignal.HOLD
         records: TradeRecord = TradeRecord(ticker=ticker.get_ticker())
-        candles_df: pandas.DataFrame = pandas.DataFrame([{'open': candle.open,'close': candle.close,'low': candle.low, 'high': candle.high,'volume': candle.volume,'date': candle.date} for candle in candles])
-        candles_df.reset_index(inplace=True)
+        candles_df: pandas.DataFrame = ticker.to_frame()
+        timer.mark('frame')
 
         # Calculate standard deviation and the average standard deviation over the time series
-        average_window = self.__generate_correct_window(ticker.get_frequency_type(),ticker.get_frequency(),window)
-        self.__generate_moving_average(average_type,average_window,candles_df,ticker.get_frequency_type())
-        self.__generate_rsi(candles_df,rsi_val)
-        candles_df['std'] = candles_df['close'].sub(candles_df[f'{window}']).rolling(window=average_window).std()
-        candles_df['upper-band'] = std * candles_df['std'] + candles_df[f'{window}']
-        candles_df['lower-band'] = (-1 * std) * candles_df['std'] + candles_df[f'{window}']
+        average_window = self.__generate_correct_window(ticker.get_frequency_type(),ticker.get_frequency(),window,BAND_MINIMUM_WINDOW)
+        timer.mark('window')
+        self.__generate_moving_average(average_type,average_window,candles_df,ticker.get_frequency_type(),ticker)
+        timer.mark('moving_average')
+        self.__generate_rsi(candles_df,rsi_val,ticker)
+        timer.mark('rsi')
+        if self.indicator_cache is not None:
+            candles_df['std'] = self.indicator_cache.band_std(ticker,average_type,average_window)
+        else:
+            candles_df['std'] = candles_df['close'].sub(candles_df[f'{average_window}']).rolling(window=average_window).std()
+        candles_df['upper-band'] = std * candles_df['std'] + candles_df[f'{average_window}']
+        candles_df['lower-band'] = (-1 * std) * candles_df['std'] + candles_df[f'{average_window}']
+        timer.mark('bands')
         
         # ACTUAL LOGIC HERE
         curr_price = candles_df['close'].iloc[-1]
@@ -153,73 +469,122 @@ class Strategy:
         __rsi_val = candles_df['rsi'].iloc[-1]
         curr_date = candles_df['date'].iloc[-1]
 
-        if upper_band > 0 and lower_band > 0:
-                
-                if curr_price > upper_band and __rsi_val > rsi_upper_bound and holdings.number_of_shares > 0:
-                    signal = TradeSignal.SELL
-                    triggers.update('current_count',0)
-                elif curr_price < lower_band and __rsi_val < rsi_lower_bound and holdings.number_of_shares > 0:
-                        """
-                        At this point, we do not have any shares and are in a perfect position to buy into the stock
-                        We will send a buy signal and the order will be handled by the bot.
-                        """
-                        signal = TradeSignal.BUY
-                        triggers.update('profit_trigger_amount',curr_price)
-                else:
-                    trigger_amount: float = holdings.purchase_amount
-                    if holdings.number_of_shares > 0 and triggers.get('current_count') >= triggers.get('count_limit'):
-                        if triggers.get('reward_type') == RewardType.DYNAMIC:
-                            trigger_amount: float = triggers.get('profit_trigger_amount') + (triggers.get('profit_trigger_amount') * (triggers.get('reward_amount')/100.0))
-                        else:
-                            trigger_amount: float = holdings.purchase_amount + (holdings.purchase_amount * (triggers.get('reward_amount')/100.0))
-                    if curr_price >= trigger_amount:
-                        signal = TradeSignal.TAKE_PROFIT
-                        triggers.update('profit_trigger_amount',curr_price)
+        signal = self.__bollinger_band_signal(holdings,triggers,curr_price,lower_band,upper_band,__rsi_val,rsi_upper_bound,rsi_lower_bound)
+        timer.mark('signal')
              
+        self.__record_signal(records,signal,curr_price,curr_date)
         self.record_holder.insert_record(records)
+        timer.mark('record')
+        timer.finish()
+        self.__count_signal('bollinger_band_task',ticker.get_ticker(),signal)
         return (signal, curr_date)
 
     def __dual_moving_average_task(self,portfolio: Portfolio, ticker: PriceHistory, average_type: MovingAverageType, fast_window: int, slow_window: int,triggers:dict,rsi_val: int = 14,rsi_upper_bound: float = 70.0, rsi_lower_bound: float = 30.0) -> TradeSignal:
-        candles: List[Candle] = ticker.get_info()
+        timer = self.__start_timer('dual_moving_average_task')
         holdings = portfolio.get_holdings().get(ticker.get_ticker())
-        signal: TradeSignal = TradeSignal.HOLD
         records: TradeRecord = TradeRecord(ticker=ticker.get_ticker())
-        candles_df: pandas.DataFrame = pandas.DataFrame([{'open': candle.open,'close': candle.close,'low': candle.low, 'high': candle.high,'volume': candle.volume,'date': candle.date} for candle in candles])
-        candles_df.reset_index(inplace=True)
+        candles_df: pandas.DataFrame = ticker.to_frame()
+        timer.mark('frame')
 
 
         f_window = self.__generate_correct_window(ticker.get_frequency_type(),ticker.get_frequency(),fast_window)
         s_window = self.__generate_correct_window(ticker.get_frequency_type(),ticker.get_frequency(),slow_window)
+        timer.mark('window')
 
-        self.__generate_moving_average(average_type,f_window,candles_df,candles_df,ticker.get_frequency_type())
-        self.__generate_moving_average(average_type,s_window,candles_df,candles_df,ticker.get_frequency_type())
-        self.__generate_rsi(candles_df,rsi_val)
+        self.__generate_moving_average(average_type,f_window,candles_df,ticker.get_frequency_type(),ticker)
+        self.__generate_moving_average(average_type,s_window,candles_df,ticker.get_frequency_type(),ticker)
+        timer.mark('moving_average')
+        self.__generate_rsi(candles_df,rsi_val,ticker)
+        timer.mark('rsi')
 
 
         curr_price = candles_df['close'].iloc[-1]
         curr_date = candles_df['date'].iloc[-1]
         __rsi_val = candles_df['rsi'].iloc[-1]
-        fast_avg_price = candles_df[f'{f_window}']
-        slow_avg_price = candles_df[f'{s_window}']
+        fast_avg_price = candles_df[f'{f_window}'].iloc[-1]
+        slow_avg_price = candles_df[f'{s_window}'].iloc[-1]
 
-        if fast_avg_price > 0.0 and slow_avg_price > 0.0:
-            if curr_price > slow_avg_price and curr_price > fast_avg_price and __rsi_val > rsi_upper_bound:
-                signal = TradeSignal.SELL
-                triggers.update('current_count',0)
-            elif curr_price < slow_avg_price and curr_price < fast_avg_price and __rsi_val < rsi_lower_bound:
-                signal = TradeSignal.BUY
-                triggers.update('profit_trigger_amount',curr_price)
-            else:
-                trigger_amount: float = holdings.purchase_amount
-                if holdings.number_of_shares > 0 and triggers.get('current_count') >= triggers.get('count_limit'):
-                    if triggers.get('reward_type') == RewardType.DYNAMIC:
-                        trigger_amount: float = triggers.get('profit_trigger_amount') + (triggers.get('profit_trigger_amount') * (triggers.get('reward_amount')/100.0))
-                    else:
-                        trigger_amount: float = holdings.purchase_amount + (holdings.purchase_amount * (triggers.get('reward_amount')/100.0))
-                    if curr_price >= trigger_amount:
-                        signal = TradeSignal.TAKE_PROFIT
-                        triggers.update('profit_trigger_amount',curr_price)
+        signal = self.__dual_moving_average_signal(holdings,triggers,curr_price,fast_avg_price,slow_avg_price,__rsi_val,rsi_upper_bound,rsi_lower_bound)
+        timer.mark('signal')
         
+        self.__record_signal(records,signal,curr_price,curr_date)
         self.record_holder.insert_record(records)
+        timer.mark('record')
+        timer.finish()
+        self.__count_signal('dual_moving_average_task',ticker.get_ticker(),signal)
         return (signal, curr_date)
-    
+
+    ################################################################# STREAMING FUNCTIONS ###############################################################################################
+
+    # Builds the streaming state for the bollinger band strategy and seeds it
+    # with the ticker's history. Feed new candles through
+    # execute_bollinger_band_stream afterwards.
+    def create_bollinger_band_stream(self, ticker: PriceHistory, average_type: MovingAverageType, window: int = 20, std: int = 2, rsi_val: int = 14) -> BollingerBandState:
+        average_window = self.__generate_correct_window(ticker.get_frequency_type(),ticker.get_frequency(),window,BAND_MINIMUM_WINDOW)
+        return BollingerBandState(ticker.get_ticker(),average_type,average_window,std,rsi_val).seed(ticker)
+
+    # Builds the streaming state for the dual moving average strategy and
+    # seeds it with the ticker's history.
+    def create_dual_moving_average_stream(self, ticker: PriceHistory, average_type: MovingAverageType, fast_window: int, slow_window: int, rsi_val: int = 14) -> DualMovingAverageState:
+        f_window = self.__generate_correct_window(ticker.get_frequency_type(),ticker.get_frequency(),fast_window)
+        s_window = self.__generate_correct_window(ticker.get_frequency_type(),ticker.get_frequency(),slow_window)
+        return DualMovingAverageState(ticker.get_ticker(),average_type,f_window,s_window,rsi_val).seed(ticker)
+
+    # Builds the streaming state for the scalping strategy. Windows are in
+    # bars, since scalping works on whatever bar size the feed delivers.
+    def create_scalping_stream(self, ticker: PriceHistory, momentum_window: int = 5, vwap_window: int = 20, volume_window: int = 20) -> ScalpingState:
+        return ScalpingState(ticker.get_ticker(),momentum_window,vwap_window,volume_window).seed(ticker)
+
+    # Updates the streaming state with a new candle, if one is given, and
+    # returns the scalping signal in O(1) without touching pandas.
+    def execute_scalping_stream(self, portfolio: Portfolio, state: ScalpingState, candle: Candle = None, momentum_threshold: float = 0.001, vwap_threshold: float = 0.002, volume_spike: float = 2.0) -> Tuple[TradeSignal,int]:
+        timer = self.__start_timer('execute_scalping_stream')
+        if candle is not None:
+            state.update(candle)
+        timer.mark('update')
+        signal = self.__scalping_signal(portfolio.get_holdings().get(state.ticker),state,momentum_threshold,vwap_threshold,volume_spike)
+        self.__journal_signal(state.ticker,signal,state.close,state.date)
+        self.__count_signal('scalping_task',state.ticker,signal)
+        self.__finish_call('execute_scalping_stream',timer,1)
+        return (signal, state.date)
+
+    # Updates the streaming state with a new candle, if one is given, and
+    # returns the bollinger band signal in O(1).
+    def execute_bollinger_band_stream(self, portfolio: Portfolio, state: BollingerBandState, triggers: dict, candle: Candle = None, rsi_upper_bound: float = 70.0, rsi_lower_bound: float = 30.0) -> Tuple[TradeSignal,int]:
+        timer = self.__start_timer('execute_bollinger_band_stream')
+        if candle is not None:
+            state.update(candle)
+        timer.mark('update')
+        holdings = portfolio.get_holdings().get(state.ticker)
+        bands = state.bands
+        signal = self.__bollinger_band_signal(holdings,triggers,state.close,bands.lower_band,bands.upper_band,state.rsi.value,rsi_upper_bound,rsi_lower_bound)
+        self.__journal_signal(state.ticker,signal,state.close,state.date)
+        self.__count_signal('bollinger_band_task',state.ticker,signal)
+        self.__finish_call('execute_bollinger_band_stream',timer,1)
+        return (signal, state.date)
+
+    # Updates the streaming state with a new candle, if one is given, and
+    # returns the dual moving average signal in O(1).
+    def execute_dual_moving_average_stream(self, portfolio: Portfolio, state: DualMovingAverageState, triggers: dict, candle: Candle = None, rsi_upper_bound: float = 70.0, rsi_lower_bound: float = 30.0) -> Tuple[TradeSignal,int]:
+        timer = self.__start_timer('execute_dual_moving_average_stream')
+        if candle is not None:
+            state.update(candle)
+        timer.mark('update')
+        holdings = portfolio.get_holdings().get(state.ticker)
+        signal = self.__dual_moving_average_signal(holdings,triggers,state.close,state.fast_average.value,state.slow_average.value,state.rsi.value,rsi_upper_bound,rsi_lower_bound)
+        self.__journal_signal(state.ticker,signal,state.close,state.date)
+        self.__count_signal('dual_moving_average_task',state.ticker,signal)
+        self.__finish_call('execute_dual_moving_average_stream',timer,1)
+        return (signal, state.date)
+
+
+# Module level wrappers so process pool workers can unpickle the work they
+# are handed. Each item is the tail of one ticker's closes plus its windows.
+def _latest_bollinger_band(item: Tuple, average_type: MovingAverageType, std: int, rsi_window: int) -> Tuple[float,float,float,float]:
+    closes, window = item
+    return batch.latest_bollinger_band(closes,average_type,window,std,rsi_window)
+
+
+def _latest_dual_moving_average(item: Tuple, average_type: MovingAverageType, rsi_window: int) -> Tuple[float,float,float,float]:
+    closes, (fast_window, slow_window) = item
+    return batch.latest_dual_moving_average(closes,average_type,fast_window,slow_window,rsi_window)
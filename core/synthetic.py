@@ -0,0 +1,43 @@
+from .models.history import ColumnarPriceHistory
+from .models.portfolio import Portfolio, Holdings
+from .enums.enums import FrequencyType, RewardType
+from .resample import BARS_PER_DAY, FIXED_MILLISECONDS
+from typing import List
+import numpy
+
+
+# Deterministic market data shared by the benchmark and the tests. The same
+# ticker, bars and seed always give the same candles, so runs on different
+# machines or commits see the same data.
+
+START_DATE = 1_600_000_000_000
+"""
+Epoch millisecond date of the first synthetic bar
+"""
+
+
+# Builds a random walk history with bars of the given frequency
+def generate_history(ticker: str, bars: int, frequency_type: FrequencyType = FrequencyType.DAY, frequency: int = 1, seed: int = 0) -> ColumnarPriceHistory:
+    rng = numpy.random.default_rng([seed,sum(map(ord,ticker))])
+    step = FIXED_MILLISECONDS.get(frequency_type,round(24 * 60 * 60 * 1000 / BARS_PER_DAY[frequency_type])) * (frequency or 1)
+    close = 100 * numpy.exp(numpy.cumsum(rng.normal(0,0.01,bars)))
+    open = numpy.concatenate(([100.0],close[:-1]))
+    spread = numpy.abs(rng.normal(0,0.005,bars)) * close
+    high = numpy.maximum(open,close) + spread
+    low = numpy.minimum(open,close) - spread
+    volume = rng.integers(1_000,100_000,bars).astype(numpy.float64)
+    date = START_DATE + numpy.arange(bars,dtype=numpy.int64) * step
+    return ColumnarPriceHistory.from_arrays(ticker,open,close,low,high,volume,date,frequency_type=frequency_type,frequency=frequency)
+
+
+def generate_universe(tickers: int, bars: int, frequency_type: FrequencyType = FrequencyType.DAY, frequency: int = 1, seed: int = 0) -> List[ColumnarPriceHistory]:
+    return [generate_history(f'SYN{i:05d}',bars,frequency_type,frequency,seed) for i in range(tickers)]
+
+
+def generate_portfolio(histories: List[ColumnarPriceHistory]) -> Portfolio:
+    holdings = {history.get_ticker(): Holdings(10,float(history.get_close()[0]),10 * float(history.get_close()[0])) for history in histories}
+    return Portfolio(1_000_000,1_000_000,holdings,0.05,0.05,0.1)
+
+
+def generate_triggers() -> dict:
+    return {'current_count': 0,'count_limit': 3,'reward_type': RewardType.NORMAL,'reward_amount': 5,'profit_trigger_amount': 0}
@@ -0,0 +1,332 @@
+from .models.history import PriceHistory
+from .enums.enums import MarketTrend
+from .indicators import batch
+from .resample import window_in_bars
+from typing import Any, Dict, List, Sequence, Tuple
+import math
+import numpy
+
+
+INDEX_BASE = 100.0
+"""
+Level of a market's index on the first date of its constituents' histories
+"""
+
+RESUM_INTERVAL = 4096
+"""
+Updates after which MarketTrendEngine recomputes its running sums from its
+rows, so rounding error cannot build up over a long session
+"""
+
+
+# Index level at every row of a forward filled (time x ticker) close panel.
+# Each row's index return is the average of the constituents' returns,
+# equal weighted, or weighted by market cap (shares outstanding times the
+# previous close) when shares are given. Constituents without a price on
+# both rows are left out of that row.
+def index_levels(panel: numpy.ndarray, shares: numpy.ndarray = None) -> numpy.ndarray:
+    if len(panel) == 0:
+        return numpy.empty(0)
+    with numpy.errstate(divide='ignore',invalid='ignore'):
+        returns = panel[1:] / panel[:-1] - 1.0
+    valid = numpy.isfinite(returns)
+    weights = valid.astype(numpy.float64) if shares is None else numpy.where(valid,shares * panel[:-1],0.0)
+    total = weights.sum(axis=1)
+    with numpy.errstate(divide='ignore',invalid='ignore'):
+        index_returns = numpy.where(total > 0,(weights * numpy.where(valid,returns,0.0)).sum(axis=1) / total,0.0)
+    return INDEX_BASE * numpy.concatenate(([1.0],numpy.cumprod(1.0 + index_returns)))
+
+
+class IndexAnchor:
+    """
+    A known level of a market's index: its level on one grid date and the
+    constituents' closes that date. index_panel walks the index forward from
+    an anchor instead of from the first date of the histories, and returns a
+    new anchor at the start of its rows, so a caller that keeps the anchor
+    of each market only pays for the bars added since its last call.
+
+    Candles before the anchor date are taken as unchanged. Histories that
+    gain earlier candles, or whose closes on the anchor date change, start
+    over from their first date.
+    """
+    date: int
+    level: float
+    prices: numpy.ndarray
+    first_dates: numpy.ndarray
+    shares: numpy.ndarray
+
+    def __init__(self, date: int, level: float, prices: numpy.ndarray, first_dates: numpy.ndarray, shares: numpy.ndarray = None) -> None:
+        self.date = date
+        self.level = level
+        self.prices = prices
+        self.first_dates = first_dates
+        self.shares = shares
+
+    # An anchor only carries over to the same constituents and weights, and
+    # to histories that still start on the same dates
+    def matches(self, first_dates: numpy.ndarray, shares: numpy.ndarray) -> bool:
+        if not numpy.array_equal(self.first_dates,first_dates):
+            return False
+        if self.shares is None or shares is None:
+            return self.shares is None and shares is None
+        return numpy.array_equal(self.shares,shares)
+
+
+# Sorted dates any of the histories has from start to end, both included
+def dates_between(histories: List[PriceHistory], start: int, end: int) -> numpy.ndarray:
+    spans = list()
+    for history in histories:
+        dates = history.get_dates()
+        spans.append(dates[numpy.searchsorted(dates,start):numpy.searchsorted(dates,end,side='right')])
+    return numpy.unique(numpy.concatenate(spans)) if spans else numpy.empty(0,dtype=numpy.int64)
+
+
+# Aligns the constituents' closes on the last rows dates any of them has and
+# returns that panel, its dates, the index level of each row and an anchor
+# at its first row. The index is based at INDEX_BASE on the first date of
+# the histories whatever the number of rows kept. Its level on the first row
+# is walked forward from anchor when one from an earlier call still matches,
+# and from the first date of the histories otherwise.
+def index_panel(histories: List[PriceHistory], rows: int, shares: numpy.ndarray = None, anchor: IndexAnchor = None) -> Tuple[numpy.ndarray,numpy.ndarray,numpy.ndarray,IndexAnchor]:
+    panel, grid = batch.align_on_dates(histories,rows)
+    if len(grid) == 0:
+        return panel, grid, numpy.empty(0), None
+    first_dates = numpy.array([history.get_dates()[0] if len(history) else -1 for history in histories],dtype=numpy.int64)
+    start = None
+    if anchor is not None and anchor.matches(first_dates,shares) and anchor.date <= grid[0]:
+        bridge = dates_between(histories,anchor.date,int(grid[0]))
+        bridge_panel = batch.align_on_grid(histories,bridge)
+        # The closes on the anchor date change when candles before it are
+        # rewritten, and then the anchor no longer holds
+        if len(bridge) and bridge[0] == anchor.date and numpy.array_equal(bridge_panel[0],anchor.prices,equal_nan=True):
+            start = anchor.level * index_levels(bridge_panel,shares)[-1] / INDEX_BASE
+    if start is None:
+        bridge = dates_between(histories,int(first_dates[first_dates >= 0].min()),int(grid[0]))
+        start = float(index_levels(batch.align_on_grid(histories,bridge),shares)[-1])
+    levels = start * index_levels(panel,shares) / INDEX_BASE
+    return panel, grid, levels, IndexAnchor(int(grid[0]),float(levels[0]),panel[0].copy(),first_dates,shares)
+
+
+# Percent of constituents whose price is above their moving average, out of
+# those that have both
+def breadth(prices: numpy.ndarray, averages: numpy.ndarray) -> float:
+    valid = ~numpy.isnan(prices) & ~numpy.isnan(averages)
+    count = int(valid.sum())
+    return 100.0 * float((prices[valid] > averages[valid]).sum()) / count if count else math.nan
+
+
+# Relative change per bar of a moving average over its last rows
+def slope(averages: numpy.ndarray, oldest: numpy.ndarray, periods: int) -> numpy.ndarray:
+    with numpy.errstate(divide='ignore',invalid='ignore'):
+        return (averages - oldest) / (periods * oldest)
+
+
+# UPTREND when every average is rising and the index is above the longest
+# one, DOWNTREND when every average is falling and the index is below it
+def classify(level: float, averages: numpy.ndarray, slopes: numpy.ndarray) -> MarketTrend:
+    if numpy.isnan(averages).any() or numpy.isnan(slopes).any():
+        return MarketTrend.SIDEWAYS
+    longest = averages[-1]
+    if (slopes > 0).all() and level > longest:
+        return MarketTrend.UPTREND
+    if (slopes < 0).all() and level < longest:
+        return MarketTrend.DOWNTREND
+    return MarketTrend.SIDEWAYS
+
+
+def describe_trend(date: int, level: float, windows: Sequence, averages: numpy.ndarray, slopes: numpy.ndarray, breadths: Sequence[float]) -> Dict[str,Any]:
+    return {
+        'date': date,
+        'index': level,
+        'trend': classify(level,averages,slopes),
+        'moving_averages': {window: float(average) for window, average in zip(windows,averages)},
+        'slopes': {window: float(value) for window, value in zip(windows,slopes)},
+        'breadth': {window: value for window, value in zip(windows,breadths)},
+    }
+
+
+# Computes the trend of one market from its aligned close panel and index
+# levels (see index_panel) in a few vectorized passes: the moving averages
+# of the index and of every constituent (read from one set of cumulative
+# sums), their slopes over the last slope_period bars, and breadth. windows
+# label the results, bars are the same windows in bars sorted from shortest
+# to longest.
+def market_trend(panel: numpy.ndarray, grid: numpy.ndarray, levels: numpy.ndarray, windows: Sequence, bars: Sequence[int], slope_period: int) -> Dict[str,Any]:
+    if len(grid) == 0:
+        return None
+    combined = numpy.column_stack((panel,levels))
+    sums = batch.cumulative_sums(combined)
+    averages = numpy.empty(len(bars))
+    oldest = numpy.full(len(bars),numpy.nan)
+    breadths: List[float] = list()
+    for k, window in enumerate(bars):
+        rolling = batch.rolling_mean(combined,window,sums)
+        averages[k] = rolling[-1,-1]
+        if len(rolling) > slope_period:
+            oldest[k] = rolling[-1 - slope_period,-1]
+        breadths.append(breadth(panel[-1],rolling[-1,:-1]))
+    return describe_trend(int(grid[-1]),float(levels[-1]),windows,averages,slope(averages,oldest,slope_period),breadths)
+
+
+# Worker entry point for one market's (panel, grid, levels)
+def _market_trend_task(item: Tuple, windows: Sequence, bars: Sequence[int], slope_period: int) -> Dict[str,Any]:
+    panel, grid, levels = item
+    return market_trend(panel,grid,levels,windows,bars,slope_period)
+
+
+# Converts day based windows into bars of the constituents' frequency. Every
+# constituent must share one frequency so their bars line up.
+def trend_bars(histories: List[PriceHistory], windows: Sequence[float]) -> List[int]:
+    frequencies = {(history.get_frequency_type(),history.get_frequency() or 1) for history in histories}
+    if len(frequencies) > 1:
+        raise ValueError(f'[ERROR]: Index constituents must share one frequency, got {sorted((f.name,n) for f, n in frequencies)}')
+    if not frequencies:
+        return [max(1,int(window)) for window in windows]
+    frequency_type, frequency = frequencies.pop()
+    return [window_in_bars(frequency_type,frequency,window) for window in windows]
+
+
+def trend_lookback(bars: Sequence[int], slope_period: int) -> int:
+    return max(bars) + slope_period
+
+
+def get_shares(histories: List[PriceHistory], shares: Dict[str,float]) -> numpy.ndarray:
+    if shares is None:
+        return None
+    return numpy.array([shares.get(history.get_ticker(),0.0) for history in histories],dtype=numpy.float64)
+
+
+class MarketTrendEngine:
+    """
+    Keeps the trend of one market current as new bars arrive. The state is
+    the last max window rows of constituent prices and index levels in a
+    ring, plus running sums and counts per window, so an update costs a few
+    vectorized passes over the constituents no matter how long the windows
+    are. Seeded from the same panel and index levels market_trend uses (see
+    index_panel), and returns the same results as market_trend on histories
+    that hold the streamed bars.
+
+    Bars must arrive in increasing date order. Constituents missing from an
+    update keep their last price.
+    """
+    market: str
+    tickers: List[str]
+    windows: List[float]
+    bars: List[int]
+    slope_period: int
+    shares: numpy.ndarray
+    date: int
+    level: float
+    _ids: Dict[str,int]
+    _prices: numpy.ndarray
+    _rows: numpy.ndarray
+    _position: int
+    _sums: numpy.ndarray
+    _counts: numpy.ndarray
+    _averages: numpy.ndarray
+    _average_position: int
+    _updates: int
+
+    def __init__(self, market: str, histories: List[PriceHistory], windows: Sequence[float] = (20,50,200), slope_period: int = 5, shares: Dict[str,float] = None, anchor: IndexAnchor = None) -> None:
+        order = sorted(range(len(windows)),key=lambda k: windows[k])
+        self.market = market
+        self.tickers = [history.get_ticker() for history in histories]
+        self.windows = [windows[k] for k in order]
+        self.bars = trend_bars(histories,self.windows)
+        self.slope_period = slope_period
+        self.shares = get_shares(histories,shares)
+        self._ids = {ticker: column for column, ticker in enumerate(self.tickers)}
+        self.seed(*index_panel(histories,trend_lookback(self.bars,slope_period),self.shares,anchor)[:3])
+
+    # Sets the state from an aligned (time x ticker) close panel and the
+    # index level of each of its rows
+    def seed(self, panel: numpy.ndarray, grid: numpy.ndarray, levels: numpy.ndarray) -> 'MarketTrendEngine':
+        tickers = len(self.tickers)
+        combined = numpy.column_stack((panel,levels)) if len(grid) else numpy.empty((0,tickers + 1))
+        longest = max(self.bars)
+        self._rows = numpy.full((longest,tickers + 1),numpy.nan)
+        tail = combined[-longest:]
+        self._rows[longest - len(tail):] = tail
+        self._position = 0
+        self._prices = combined[-1,:-1].copy() if len(grid) else numpy.full(tickers,numpy.nan)
+        self.level = float(levels[-1]) if len(grid) else INDEX_BASE
+        self.date = int(grid[-1]) if len(grid) else None
+        self.__resum()
+
+        self._averages = numpy.full((self.slope_period + 1,len(self.bars)),numpy.nan)
+        if len(grid):
+            sums = batch.cumulative_sums(levels)
+            history = numpy.column_stack([batch.rolling_mean(levels,window,sums)[:,0] for window in self.bars])[-(self.slope_period + 1):]
+            self._averages[len(self._averages) - len(history):] = history
+        self._average_position = 0
+        self._updates = 0
+        return self
+
+    # Adds the bar of the given date. prices maps tickers to their close and
+    # may hold tickers of other markets, which are ignored.
+    def update(self, date: int, prices: Dict[str,float]) -> Dict[str,Any]:
+        if self.date is not None and date <= self.date:
+            raise ValueError(f'[ERROR]: Bars for {self.market} must be in increasing date order, got {date} after {self.date}')
+        new = self._prices.copy()
+        if len(prices) < len(self.tickers):
+            for ticker, price in prices.items():
+                column = self._ids.get(ticker)
+                if column is not None:
+                    new[column] = price
+        else:
+            values = numpy.fromiter((prices.get(ticker,math.nan) for ticker in self.tickers),dtype=numpy.float64,count=len(self.tickers))
+            new = numpy.where(numpy.isnan(values),new,values)
+
+        with numpy.errstate(divide='ignore',invalid='ignore'):
+            returns = new / self._prices - 1.0
+        valid = numpy.isfinite(returns)
+        weights = valid.astype(numpy.float64) if self.shares is None else numpy.where(valid,self.shares * self._prices,0.0)
+        total = weights.sum()
+        if total > 0:
+            self.level *= 1.0 + float((weights * numpy.where(valid,returns,0.0)).sum() / total)
+        self._prices = new
+        self.date = date
+
+        row = numpy.append(new,self.level)
+        present = ~numpy.isnan(row)
+        longest = len(self._rows)
+        for k, window in enumerate(self.bars):
+            leaving = self._rows[(self._position - window) % longest]
+            self._sums[k] += numpy.nan_to_num(row) - numpy.nan_to_num(leaving)
+            self._counts[k] += present.astype(numpy.int64) - (~numpy.isnan(leaving)).astype(numpy.int64)
+        self._rows[self._position] = row
+        self._position = (self._position + 1) % longest
+        self._updates += 1
+        if self._updates % RESUM_INTERVAL == 0:
+            self.__resum()
+
+        averages = self.__current_averages()
+        self._averages[self._average_position] = averages[:,-1]
+        self._average_position = (self._average_position + 1) % len(self._averages)
+        return self.__describe(averages)
+
+    def get_trend(self) -> Dict[str,Any]:
+        if self.date is None:
+            return None
+        return self.__describe(self.__current_averages())
+
+    def __describe(self, averages: numpy.ndarray) -> Dict[str,Any]:
+        newest = self._averages[(self._average_position - 1) % len(self._averages)]
+        oldest = self._averages[self._average_position]
+        breadths = [breadth(self._prices,averages[k,:-1]) for k in range(len(self.bars))]
+        return describe_trend(self.date,self.level,self.windows,newest,slope(newest,oldest,self.slope_period),breadths)
+
+    def __current_averages(self) -> numpy.ndarray:
+        full = self._counts == numpy.array(self.bars)[:,None]
+        with numpy.errstate(divide='ignore',invalid='ignore'):
+            return numpy.where(full,self._sums / self._counts,numpy.nan)
+
+    # Recomputes the running sums of every window from the rows in the ring
+    def __resum(self) -> None:
+        longest = len(self._rows)
+        self._sums = numpy.empty((len(self.bars),self._rows.shape[1]))
+        self._counts = numpy.empty((len(self.bars),self._rows.shape[1]),dtype=numpy.int64)
+        for k, window in enumerate(self.bars):
+            rows = self._rows[(self._position - 1 - numpy.arange(window)) % longest]
+            self._sums[k] = numpy.nansum(rows,axis=0)
+            self._counts[k] = (~numpy.isnan(rows)).sum(axis=0)
@@ -0,0 +1,67 @@
+from core.arbitrage import ArbitrageScanner
+from core.enums.enums import TradeSignal
+from core.executors import SerialExecutor
+from core.strategy import Strategy
+from core.synthetic import generate_universe
+import numpy
+import pytest
+
+
+# Rescans every quote of the instrument for its cheapest and richest venue
+# among the quotes no older than max_age before the newest one
+def brute_force(quotes: dict, cost: float, max_age: int):
+    if len(quotes) < 2:
+        return None
+    newest = max(date for _, date in quotes.values())
+    fresh = {venue: price for venue, (price, date) in quotes.items() if date >= newest - max_age}
+    buy = min(fresh,key=lambda venue: fresh[venue])
+    sell = max(fresh,key=lambda venue: fresh[venue])
+    if buy == sell or fresh[buy] <= 0:
+        return None
+    spread = (fresh[sell] - fresh[buy]) / fresh[buy]
+    return (fresh[buy],fresh[sell],spread) if spread > cost else None
+
+
+@pytest.mark.parametrize('max_age',[0,3])
+def test_scanner_matches_a_brute_force_rescan(max_age):
+    rng = numpy.random.default_rng(7)
+    instruments = [f'I{i}' for i in range(20)]
+    venues = [f'V{v}' for v in range(5)]
+    scanner = ArbitrageScanner(cost=0.002,max_age=max_age)
+    quotes = {instrument: dict() for instrument in instruments}
+    found = 0
+    for step in range(20000):
+        instrument = instruments[rng.integers(len(instruments))]
+        venue = venues[rng.integers(len(venues))]
+        date = step // 10 - int(rng.integers(0,5))
+        if rng.random() < 0.05:
+            quotes[instrument].pop(venue,None)
+            opportunity = scanner.remove(instrument,venue)
+        else:
+            price = 100.0 * (1.0 + rng.normal(0,0.003))
+            quotes[instrument][venue] = (price,date)
+            opportunity = scanner.update(instrument,venue,price,date)
+        expected = brute_force(quotes[instrument],0.002,max_age)
+        if expected is None:
+            assert opportunity is None
+            continue
+        found += 1
+        assert opportunity is not None
+        assert (opportunity.buy_price,opportunity.sell_price) == (expected[0],expected[1])
+        assert opportunity.spread == pytest.approx(expected[2])
+        assert opportunity.net_spread == pytest.approx(expected[2] - 0.002)
+    assert found > 1000
+    assert {opportunity.instrument for opportunity in scanner.get_opportunities()} == {instrument for instrument in instruments if brute_force(quotes[instrument],0.002,max_age) is not None}
+
+
+def test_both_legs_of_every_opportunity_are_journaled():
+    venues = {'A': generate_universe(6,50,seed=16),'B': generate_universe(6,50,seed=17)}
+    strategy = Strategy(SerialExecutor())
+    results = strategy.execute_arbitrage_strategy(venues,0.0)
+    records = strategy.record_holder.get_records()
+    expected = set()
+    for (buy, sell), _ in results:
+        expected.add((buy.get_ticker(),TradeSignal.LONG.name,float(buy.get_close()[-1])))
+        expected.add((sell.get_ticker(),TradeSignal.SHORT.name,float(sell.get_close()[-1])))
+    assert len(results) > 0
+    assert set(zip(records['ticker'],records['signal'],records['price'])) == expected
@@ -0,0 +1,109 @@
+from core.backtester import Backtester, BacktestConfig
+from core.synthetic import generate_universe
+from core.enums.enums import ExitType, MovingAverageType, RewardType, StrategyType
+from core.models.portfolio import Portfolio
+import math
+import pandas
+import pytest
+
+
+CONFIGS = [
+    BacktestConfig(StrategyType.BOLLINGER_BAND,MovingAverageType.SIMPLE,window=20,std=1,rsi_upper_bound=55.0,rsi_lower_bound=45.0,
+                   triggers={'count_limit': 3,'reward_type': RewardType.NORMAL,'reward_amount': 2.0}),
+    BacktestConfig(StrategyType.BOLLINGER_BAND,MovingAverageType.EXPONENTIAL,window=20,std=1,rsi_upper_bound=55.0,rsi_lower_bound=45.0,
+                   triggers={'count_limit': 2,'reward_type': RewardType.DYNAMIC,'reward_amount': 1.0}),
+    BacktestConfig(StrategyType.DUAL_MOVING_AVERAGE,MovingAverageType.EXPONENTIAL,fast_window=10,slow_window=30,rsi_upper_bound=55.0,rsi_lower_bound=45.0),
+]
+
+
+# The signals of every bar from pandas, the way Strategy computes them
+def reference_signals(frame: pandas.DataFrame, config: BacktestConfig):
+    close = frame['close']
+    delta = close.diff()
+    avg_gain = delta.clip(lower=0).ewm(com=config.rsi_window - 1,adjust=False).mean()
+    avg_loss = (-delta.clip(upper=0)).ewm(com=config.rsi_window - 1,adjust=False).mean()
+    rsi = 100 - 100 / (1 + avg_gain / avg_loss)
+
+    def average(window):
+        if config.average_type == MovingAverageType.EXPONENTIAL:
+            return close.ewm(span=window,adjust=False).mean()
+        return close.rolling(window).mean()
+
+    if config.strategy_type == StrategyType.BOLLINGER_BAND:
+        middle = average(config.window)
+        width = config.std * (close - middle).rolling(config.window).std()
+        upper, lower = middle + width, middle - width
+        ready = (upper > 0) & (lower > 0)
+        return (ready & (close < lower) & (rsi < config.rsi_lower_bound)).tolist(), (ready & (close > upper) & (rsi > config.rsi_upper_bound)).tolist()
+    fast, slow = average(config.fast_window), average(config.slow_window)
+    ready = (fast > 0) & (slow > 0)
+    return (ready & (close < slow) & (close < fast) & (rsi < config.rsi_lower_bound)).tolist(), (ready & (close > slow) & (close > fast) & (rsi > config.rsi_upper_bound)).tolist()
+
+
+# Walks every bar one at a time, opening on an entry signal when flat and
+# checking the stop loss, limit order, take profit and exit signal of every
+# bar while a position is open. A dynamic take profit moves its base to the
+# close of every entry signal, like profit_trigger_amount in Strategy.
+def reference_trades(frame: pandas.DataFrame, config: BacktestConfig, stop_loss: float, limit_order: float):
+    entries, exits = reference_signals(frame,config)
+    reward = config.triggers.get('reward_amount',0.0) / 100.0
+    dynamic = config.triggers.get('reward_type') == RewardType.DYNAMIC
+    trades = []
+    position = None
+    for bar, row in enumerate(frame.itertuples()):
+        if position is None:
+            if entries[bar]:
+                position = (bar,row.date,row.close)
+                profit_base = row.close
+            continue
+        entry_bar, entry_date, entry_price = position
+        if dynamic and entries[bar]:
+            profit_base = row.close
+        stop_price, limit_price = entry_price * stop_loss, entry_price * limit_order
+        profit_price = (profit_base if dynamic else entry_price) * (1.0 + reward) if reward > 0 else math.inf
+        exit = None
+        if row.low <= stop_price:
+            exit = (min(row.open,stop_price),ExitType.STOP_LOSS)
+        elif row.high >= limit_price:
+            exit = (max(row.open,limit_price),ExitType.LIMIT)
+        elif bar - entry_bar >= config.triggers.get('count_limit',0) and row.close >= profit_price:
+            exit = (row.close,ExitType.TAKE_PROFIT)
+        elif exits[bar]:
+            exit = (row.close,ExitType.SIGNAL)
+        if exit is not None:
+            trades.append((entry_date,entry_price,row.date,exit[0],exit[1]))
+            position = None
+    if position is not None:
+        trades.append((position[1],position[2],int(frame['date'].iloc[-1]),float(frame['close'].iloc[-1]),ExitType.END_OF_DATA))
+    return trades
+
+
+@pytest.mark.parametrize('config',CONFIGS,ids=lambda config: f"{config.strategy_type.name}-{config.triggers['reward_type'].name}")
+def test_backtest_matches_a_bar_by_bar_loop(config):
+    histories = generate_universe(5,1500,seed=11)
+    portfolio = Portfolio(100_000,100_000,{},0.1,0.05,0.05)
+    result = Backtester(portfolio,config).run(histories)
+    assert result.get_number_of_trades() > 0
+    for history in histories:
+        expected = reference_trades(history.to_frame(),config,portfolio.get_stop_loss(),portfolio.get_limit_order())
+        actual = [(trade.entry_date,trade.entry_price,trade.exit_date,trade.exit_price,trade.exit_type) for trade in result.get_trades(history.get_ticker())]
+        assert [(entry_date,exit_date,exit_type) for entry_date, _, exit_date, _, exit_type in actual] == [(entry_date,exit_date,exit_type) for entry_date, _, exit_date, _, exit_type in expected]
+        assert [price for trade in actual for price in (trade[1],trade[3])] == pytest.approx([price for trade in expected for price in (trade[1],trade[3])])
+        for trade in result.get_trades(history.get_ticker()):
+            assert trade.number_of_shares == pytest.approx(100_000 * 0.1 / trade.entry_price)
+
+
+def test_dynamic_take_profit_follows_the_latest_entry_signal():
+    histories = generate_universe(5,1500,seed=11)
+    portfolio = Portfolio(100_000,100_000,{},0.1,0.05,0.05)
+    exits = dict()
+    for reward_type in (RewardType.NORMAL,RewardType.DYNAMIC):
+        config = BacktestConfig(StrategyType.BOLLINGER_BAND,MovingAverageType.EXPONENTIAL,window=20,std=1,rsi_upper_bound=55.0,rsi_lower_bound=45.0,
+                                triggers={'count_limit': 2,'reward_type': reward_type,'reward_amount': 1.0})
+        result = Backtester(portfolio,config).run(histories)
+        exits[reward_type] = [(trade.exit_date,trade.exit_type) for history in histories for trade in result.get_trades(history.get_ticker())]
+    # Entry signals while a position is open lower the target below the
+    # entry price of a falling position, so the dynamic target takes profit
+    # on trades the fixed one leaves to the exit signal
+    assert exits[RewardType.DYNAMIC] != exits[RewardType.NORMAL]
+    assert sum(exit_type == ExitType.TAKE_PROFIT for _, exit_type in exits[RewardType.DYNAMIC]) > sum(exit_type == ExitType.TAKE_PROFIT for _, exit_type in exits[RewardType.NORMAL])
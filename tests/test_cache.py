@@ -0,0 +1,67 @@
+from core.synthetic import generate_history
+from core.enums.enums import FrequencyType, MovingAverageType
+from core.indicators import batch
+from core.indicators.cache import IndicatorCache
+from core.models.history import Candle, ColumnarPriceHistory, CANDLE_COLUMNS
+from core.resample import IncrementalResampler
+import numpy
+import pytest
+
+
+def compute_all(cache: IndicatorCache, history: ColumnarPriceHistory):
+    return [
+        cache.moving_average(history,MovingAverageType.SIMPLE,20),
+        cache.moving_average(history,MovingAverageType.EXPONENTIAL,20),
+        cache.band_std(history,MovingAverageType.SIMPLE,20),
+        cache.rsi(history,14),
+    ]
+
+
+def test_extended_series_match_a_full_recompute():
+    full = generate_history('EXT',600,seed=5)
+    columns = full.get_columns()
+    history = ColumnarPriceHistory.from_arrays('EXT',*(columns[name][:400] for name in CANDLE_COLUMNS))
+    cache = IndicatorCache()
+    compute_all(cache,history)
+    for start in range(400,600,50):
+        history.extend({name: columns[name][start:start + 50] for name in CANDLE_COLUMNS})
+        extended = compute_all(cache,history)
+        expected = compute_all(IndicatorCache(),history)
+        for values, reference in zip(extended,expected):
+            numpy.testing.assert_allclose(values,reference,rtol=1e-9,atol=1e-9,equal_nan=True)
+    assert cache.get_stats()['extensions'] == 4 * 4
+    assert cache.get_stats()['misses'] == 4
+
+
+def test_unchanged_history_is_a_hit():
+    history = generate_history('HIT',300)
+    cache = IndicatorCache()
+    first = cache.rsi(history,14)
+    assert numpy.shares_memory(cache.rsi(history,14),first)
+    assert cache.get_stats()['hits'] == 1
+
+
+def test_forming_bar_rewritten_in_place_is_not_a_stale_hit():
+    base = generate_history('FORM',600,FrequencyType.MINUTE,1)
+    resampler = IncrementalResampler(base,FrequencyType.HOUR)
+    cache = IndicatorCache()
+    cache.moving_average(resampler.history,MovingAverageType.SIMPLE,3)
+    # Another minute of the hour that is still forming keeps the length and
+    # last date of the hourly history
+    resampler.update(Candle(230.0,230.0,229.0,231.0,10.0,int(base.get_dates()[-1]) + 60 * 1000))
+    expected = batch.rolling_mean(resampler.history.get_close().reshape(-1,1),3)[:,0]
+    numpy.testing.assert_allclose(cache.moving_average(resampler.history,MovingAverageType.SIMPLE,3),expected,equal_nan=True)
+    assert cache.get_stats()['hits'] == 0
+
+
+@pytest.mark.parametrize('window',[5,20])
+def test_replaced_then_appended_bar_is_not_extended(window):
+    history = generate_history('REPL',200)
+    cache = IndicatorCache()
+    cache.moving_average(history,MovingAverageType.EXPONENTIAL,window)
+    last = history.get_last()
+    history.replace_last(Candle(last.open,last.close * 1.5,last.low,last.close * 1.5,last.volume,last.date))
+    history.append(Candle(last.close,last.close,last.low,last.high,last.volume,last.date + 24 * 60 * 60 * 1000))
+    expected = batch.ewm_mean(history.get_close().reshape(-1,1),2.0 / (window + 1.0))[:,0]
+    numpy.testing.assert_allclose(cache.moving_average(history,MovingAverageType.EXPONENTIAL,window),expected)
+    assert cache.get_stats()['extensions'] == 0
@@ -0,0 +1,30 @@
+from core.synthetic import generate_universe
+from core.forecaster import forecast_closes
+import numpy
+import pytest
+
+
+# Fits one ticker's AR(order) model on its log returns with lstsq and rolls
+# it forward steps bars
+def reference_forecast(closes: numpy.ndarray, order: int, steps: int) -> float:
+    closes = closes[~numpy.isnan(closes)]
+    returns = numpy.diff(numpy.log(closes))
+    design = numpy.column_stack([numpy.ones(len(returns) - order)] + [returns[order - lag:len(returns) - lag] for lag in range(1,order + 1)])
+    coefficients = numpy.linalg.lstsq(design,returns[order:],rcond=None)[0]
+    lags = list(returns[::-1][:order])
+    total = 0.0
+    for _ in range(steps):
+        predicted = coefficients[0] + numpy.dot(coefficients[1:],lags)
+        total += predicted
+        lags = [predicted] + lags[:-1]
+    return closes[-1] * numpy.exp(total)
+
+
+@pytest.mark.parametrize('order,steps',[(1,1),(5,5),(3,20)])
+def test_forecasts_match_per_ticker_lstsq_fits(order, steps):
+    closes = numpy.column_stack([history.get_close() for history in generate_universe(6,300,seed=4)])
+    # A ticker with a shorter history shares the panel through leading NaNs
+    closes[:120,2] = numpy.nan
+    forecasts = forecast_closes(closes,order,steps)
+    expected = [reference_forecast(closes[:,column],order,steps) for column in range(closes.shape[1])]
+    numpy.testing.assert_allclose(forecasts,expected,rtol=1e-6)
@@ -0,0 +1,69 @@
+from core.models.history import Candle, ColumnarPriceHistory, PriceHistory, CANDLE_COLUMNS
+import numpy
+import pytest
+
+
+def candles(count: int):
+    return [Candle(100.0 + bar,101.0 + bar,99.0 + bar,102.0 + bar,1000.0 * bar,1_600_000_000_000 + bar * 60_000) for bar in range(count)]
+
+
+def test_columns_match_the_list_backed_history():
+    listed = PriceHistory('LIST',candles(50))
+    columnar = ColumnarPriceHistory('LIST',candles(50))
+    for name in CANDLE_COLUMNS:
+        numpy.testing.assert_array_equal(columnar.get_column(name),listed.get_column(name))
+    assert columnar.get_dates().dtype == numpy.int64
+    assert [vars(candle) for candle in columnar.get_info()] == [vars(candle) for candle in listed.get_info()]
+    assert columnar.to_frame().equals(listed.to_frame())
+
+
+def test_append_and_extend_leave_earlier_views_alone():
+    history = ColumnarPriceHistory('GROW',candles(3))
+    view = history.get_close()
+    for candle in candles(40)[3:20]:
+        history.append(candle)
+    history.extend({name: numpy.array([getattr(candle,name) for candle in candles(40)[20:]]) for name in CANDLE_COLUMNS})
+    assert view.tolist() == [101.0,102.0,103.0]
+    assert history.get_close().tolist() == [candle.close for candle in candles(40)]
+
+
+def test_from_records_accepts_tuples_and_structured_arrays():
+    rows = [tuple(getattr(candle,name) for name in CANDLE_COLUMNS) for candle in candles(10)]
+    structured = numpy.array(rows,dtype=[(name,numpy.int64 if name == 'date' else numpy.float64) for name in CANDLE_COLUMNS])
+    expected = ColumnarPriceHistory('REC',candles(10)).get_columns()
+    for history in (ColumnarPriceHistory.from_records('REC',rows),ColumnarPriceHistory.from_records('REC',structured)):
+        for name in CANDLE_COLUMNS:
+            numpy.testing.assert_array_equal(history.get_column(name),expected[name])
+
+
+def test_columns_of_different_lengths_are_rejected():
+    with pytest.raises(ValueError,match='one length'):
+        ColumnarPriceHistory.from_arrays('BAD',[1.0],[1.0],[1.0],[1.0],[1.0],[1,2])
+
+
+def test_replace_last_does_not_write_into_the_callers_arrays():
+    close = numpy.arange(1.0,6.0)
+    history = ColumnarPriceHistory.from_arrays('ALIAS',close,close,close,close,close,numpy.arange(5,dtype=numpy.int64))
+    history.replace_last(Candle(9.0,9.0,9.0,9.0,9.0,4))
+    assert close.tolist() == [1.0,2.0,3.0,4.0,5.0]
+    assert history.get_close().tolist() == [1.0,2.0,3.0,4.0,9.0]
+
+
+def test_every_write_bumps_the_version():
+    history = ColumnarPriceHistory('VERSION',[])
+    versions = [history.version]
+    history.append(Candle(1.0,1.0,1.0,1.0,1.0,1))
+    versions.append(history.version)
+    history.replace_last(Candle(2.0,2.0,2.0,2.0,2.0,1))
+    versions.append(history.version)
+    history.extend({'open': [3.0],'close': [3.0],'low': [3.0],'high': [3.0],'volume': [3.0],'date': [2]})
+    versions.append(history.version)
+    assert versions == sorted(set(versions))
+
+
+def test_empty_history_has_no_last_candle():
+    history = ColumnarPriceHistory('EMPTY',[])
+    with pytest.raises(IndexError,match='EMPTY'):
+        history.get_last()
+    with pytest.raises(IndexError,match='EMPTY'):
+        history.replace_last(Candle(1.0,1.0,1.0,1.0,1.0,1))
@@ -0,0 +1,104 @@
+from core.synthetic import generate_history, generate_universe
+from core.enums.enums import MovingAverageType
+from core.indicators import batch
+from core.indicators.streaming import StreamingIndicator, StreamingSMA, StreamingEMA, RollingVariance, StreamingBollingerBands, StreamingRSI, ScalpingState
+import numpy
+import pandas
+import pytest
+
+
+@pytest.fixture(scope='module')
+def closes() -> numpy.ndarray:
+    panel = numpy.column_stack([history.get_close() for history in generate_universe(4,400,seed=3)])
+    # Leading NaNs, like a ticker that started trading later than the others
+    panel[:25,1] = numpy.nan
+    return panel
+
+
+def pandas_rsi(close: pandas.Series, window: int) -> pandas.Series:
+    delta = close.diff()
+    avg_gain = delta.clip(lower=0).ewm(com=window - 1,adjust=False).mean()
+    avg_loss = (-delta.clip(upper=0)).ewm(com=window - 1,adjust=False).mean()
+    return 100 - 100 / (1 + avg_gain / avg_loss)
+
+
+@pytest.mark.parametrize('window',[2,5,20])
+def test_batch_rolling_mean_and_std_match_pandas(closes, window):
+    frame = pandas.DataFrame(closes)
+    numpy.testing.assert_allclose(batch.rolling_mean(closes,window),frame.rolling(window).mean().to_numpy(),rtol=1e-10,equal_nan=True)
+    # Running sums of squares lose a few digits on deviations this small
+    # next to prices around 100
+    numpy.testing.assert_allclose(batch.rolling_std(closes,window),frame.rolling(window).std().to_numpy(),rtol=1e-6,atol=1e-6,equal_nan=True)
+
+
+def test_batch_rolling_std_of_one_bar_is_nan(closes):
+    with numpy.errstate(all='raise'):
+        assert numpy.isnan(batch.rolling_std(closes,1)).all()
+
+
+@pytest.mark.parametrize('alpha',[0.05,2.0 / 11.0,0.5])
+def test_batch_ewm_mean_matches_pandas(closes, alpha):
+    expected = pandas.DataFrame(closes).ewm(alpha=alpha,adjust=False).mean().to_numpy()
+    numpy.testing.assert_allclose(batch.ewm_mean(closes,alpha),expected,rtol=1e-10,equal_nan=True)
+
+
+def test_batch_rsi_matches_pandas(closes):
+    expected = numpy.column_stack([pandas_rsi(pandas.Series(closes[:,column]),14).to_numpy() for column in range(closes.shape[1])])
+    numpy.testing.assert_allclose(batch.rsi(closes,14),expected,rtol=1e-9,equal_nan=True)
+
+
+def test_streaming_indicators_match_pandas(closes):
+    close = pandas.Series(closes[:,0])
+    expected = {
+        'sma': close.rolling(20).mean(),
+        'ema': close.ewm(span=20,adjust=False).mean(),
+        'variance': close.rolling(20).var(),
+        'rsi': pandas_rsi(close,14),
+    }
+    indicators = {'sma': StreamingSMA(20),'ema': StreamingEMA(20),'variance': RollingVariance(20),'rsi': StreamingRSI(14)}
+    for name, indicator in indicators.items():
+        values = [indicator.update(value) for value in close.tolist()]
+        numpy.testing.assert_allclose(values,expected[name].to_numpy(),rtol=1e-9,equal_nan=True,err_msg=name)
+
+
+@pytest.mark.parametrize('average_type',list(MovingAverageType))
+def test_streaming_bollinger_bands_match_batch(closes, average_type):
+    bands = StreamingBollingerBands(average_type,20,2)
+    upper, lower = [], []
+    for value in closes[:,0].tolist():
+        bands.update(value)
+        upper.append(bands.upper_band)
+        lower.append(bands.lower_band)
+    _, expected_upper, expected_lower = batch.bollinger_bands(closes[:,:1],average_type,20,2)
+    # The streaming bands only start once the average is ready
+    ready = ~numpy.isnan(expected_upper[:,0])
+    numpy.testing.assert_allclose(numpy.array(upper)[ready],expected_upper[ready,0],rtol=1e-9)
+    numpy.testing.assert_allclose(numpy.array(lower)[ready],expected_lower[ready,0],rtol=1e-9)
+
+
+def test_scalping_state_matches_pandas():
+    frame = generate_history('SCALP',300,seed=9).to_frame()
+    price_volume = (frame['high'] + frame['low'] + frame['close']) / 3.0 * frame['volume']
+    expected = {
+        'momentum': frame['close'].pct_change(5),
+        'vwap_deviation': frame['close'] / (price_volume.rolling(20).sum() / frame['volume'].rolling(20).sum()) - 1.0,
+        'volume_ratio': frame['volume'] / frame['volume'].shift(1).rolling(20).mean(),
+    }
+    state = ScalpingState('SCALP',5,20,20)
+    values = {name: [] for name in expected}
+    for row in frame.itertuples():
+        state.update_values(row.close,row.high,row.low,row.volume,row.date)
+        for name in expected:
+            values[name].append(getattr(state,name))
+    # The vwap is only compared once its window is full
+    ready = slice(19,None)
+    for name, series in expected.items():
+        numpy.testing.assert_allclose(values[name][ready],series.to_numpy()[ready],rtol=1e-9,equal_nan=True,err_msg=name)
+
+
+def test_indicators_must_implement_update():
+    class Incomplete(StreamingIndicator):
+        pass
+
+    with pytest.raises(TypeError):
+        Incomplete()
@@ -0,0 +1,88 @@
+from core.synthetic import generate_universe, generate_portfolio, generate_triggers
+from core.enums.enums import MovingAverageType
+from core.executors import SerialExecutor
+from core.live import BollingerBandStream, DualMovingAverageStream, LiveRuntime, LiveStrategy, QueueSource
+from core.models.history import Candle, ColumnarPriceHistory, CANDLE_COLUMNS
+from core.strategy import Strategy
+import asyncio
+import pytest
+
+
+SEEDED = 250
+BARS = 300
+
+
+def split_histories():
+    histories = generate_universe(8,BARS,seed=6)
+    seeded = [ColumnarPriceHistory.from_arrays(history.get_ticker(),*(history.get_columns()[name][:SEEDED] for name in CANDLE_COLUMNS),frequency_type=history.get_frequency_type(),frequency=history.get_frequency()) for history in histories]
+    return histories, seeded
+
+
+async def replay(runtime: LiveRuntime, source: QueueSource, histories) -> None:
+    running = asyncio.ensure_future(runtime.run())
+    for bar in range(SEEDED,BARS):
+        for history in histories:
+            columns = history.get_columns()
+            await source.put(history.get_ticker(),Candle(*(columns[name][bar].item() for name in CANDLE_COLUMNS)))
+    await source.close()
+    await running
+
+
+@pytest.mark.parametrize('kind',['bollinger_band','dual_moving_average'])
+def test_streamed_signals_match_the_batch_strategy(kind):
+    histories, seeded = split_histories()
+    portfolio = generate_portfolio(histories)
+    strategy = Strategy(SerialExecutor())
+    if kind == 'bollinger_band':
+        live = BollingerBandStream(strategy,portfolio,generate_triggers(),MovingAverageType.SIMPLE,20,2,14,60.0,40.0)
+        expected = strategy.execute_bollinger_band_strategy_batch(portfolio,histories,generate_triggers(),MovingAverageType.SIMPLE,20,2,14,60.0,40.0)
+    else:
+        live = DualMovingAverageStream(strategy,portfolio,generate_triggers(),MovingAverageType.EXPONENTIAL,10,50,14,60.0,40.0)
+        expected = strategy.execute_moving_average_strategy_batch(portfolio,histories,generate_triggers(),MovingAverageType.EXPONENTIAL,10,50,14,60.0,40.0)
+
+    latest = dict()
+    source = QueueSource()
+    runtime = LiveRuntime(source,[live],seeded,on_signals=lambda results: latest.update({history.get_ticker(): (signal,date) for history, signal, date in results}))
+    asyncio.run(replay(runtime,source,histories))
+    assert latest == {history.get_ticker(): (signal,date) for history, signal, date in expected}
+
+
+class FailingStrategy(LiveStrategy):
+    def evaluate(self, histories, new_candles):
+        raise RuntimeError('strategy failed')
+
+
+def test_strategy_error_stops_the_reader():
+    histories, _ = split_histories()
+
+    async def run() -> None:
+        source = QueueSource()
+        runtime = LiveRuntime(source,[FailingStrategy()],max_pending=2,max_batch=1)
+        feeder = asyncio.ensure_future(replay(runtime,source,histories))
+        with pytest.raises(RuntimeError,match='strategy failed'):
+            await feeder
+        pending = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+        assert pending == []
+
+    asyncio.run(run())
+
+
+def test_late_and_repeated_candles_are_counted_as_dropped():
+    histories, seeded = split_histories()
+    strategy = Strategy(SerialExecutor())
+    live = DualMovingAverageStream(strategy,generate_portfolio(histories),generate_triggers(),MovingAverageType.EXPONENTIAL,10,50,14,60.0,40.0)
+    source = QueueSource()
+    runtime = LiveRuntime(source,[live],seeded)
+    columns = histories[0].get_columns()
+    candles = [Candle(*(columns[name][bar].item() for name in CANDLE_COLUMNS)) for bar in (SEEDED,SEEDED,SEEDED - 1,SEEDED + 1)]
+
+    async def feed() -> None:
+        running = asyncio.ensure_future(runtime.run())
+        for candle in candles:
+            await source.put(histories[0].get_ticker(),candle)
+        await source.close()
+        await running
+
+    asyncio.run(feed())
+    assert (runtime.updates,runtime.dropped) == (2,2)
+    assert LiveRuntime(QueueSource(),[]).histories == {}
@@ -0,0 +1,41 @@
+from core.synthetic import generate_universe, generate_portfolio, generate_triggers
+from core.enums.enums import MovingAverageType
+from core.executors import SerialExecutor
+from core.metrics import MetricsRegistry
+from core.strategy import Strategy
+import pytest
+
+
+def strategy_calls(strategy: Strategy, histories, portfolio):
+    stream = strategy.create_bollinger_band_stream(histories[0],MovingAverageType.SIMPLE,20,2,14)
+    dual_stream = strategy.create_dual_moving_average_stream(histories[0],MovingAverageType.EXPONENTIAL,10,50,14)
+    scalping_stream = strategy.create_scalping_stream(histories[0])
+    venues = {'A': histories,'B': generate_universe(len(histories),300,seed=15)}
+    scanner = strategy.create_arbitrage_stream(venues,0.0)
+    return {
+        'execute_bollinger_band_strategy': lambda: strategy.execute_bollinger_band_strategy(portfolio,histories,generate_triggers(),MovingAverageType.SIMPLE,20,2,14,60.0,40.0),
+        'execute_moving_average_strategy_batch': lambda: strategy.execute_moving_average_strategy_batch(portfolio,histories,generate_triggers(),MovingAverageType.EXPONENTIAL,10,50,14,60.0,40.0),
+        'execute_pairs_trading_strategy': lambda: strategy.execute_pairs_trading_strategy([(histories[0],histories[1]),(histories[2],histories[3])],100,0.0),
+        'execute_bollinger_band_stream': lambda: strategy.execute_bollinger_band_stream(portfolio,stream,generate_triggers()),
+        'execute_dual_moving_average_stream': lambda: strategy.execute_dual_moving_average_stream(portfolio,dual_stream,generate_triggers()),
+        'execute_scalping_stream': lambda: strategy.execute_scalping_stream(portfolio,scalping_stream),
+        'execute_arbitrage_strategy': lambda: strategy.execute_arbitrage_strategy(venues,0.0),
+        'execute_arbitrage_stream': lambda: strategy.execute_arbitrage_stream(scanner,histories[0].get_ticker(),'A',histories[0].get_last()),
+    }
+
+
+SCOPES = ['execute_bollinger_band_strategy','execute_moving_average_strategy_batch','execute_pairs_trading_strategy','execute_bollinger_band_stream','execute_dual_moving_average_stream',
+          'execute_scalping_stream','execute_arbitrage_strategy','execute_arbitrage_stream']
+
+
+@pytest.mark.parametrize('scope',SCOPES)
+def test_every_entry_point_records_its_calls(scope):
+    histories = generate_universe(4,300,seed=14)
+    metrics = MetricsRegistry()
+    strategy = Strategy(SerialExecutor(),metrics=metrics)
+    strategy_calls(strategy,histories,generate_portfolio(histories))[scope]()
+    snapshot = metrics.snapshot()
+    assert metrics.get_counter(f'{scope}.calls') == 1
+    assert metrics.get_counter(f'{scope}.tickers') > 0
+    assert snapshot['timings'][scope] and all(stats['count'] == 1 for stats in snapshot['timings'][scope].values())
+    assert sum(value for name, value in snapshot['counters'].items() if name.endswith('.evaluations')) > 0
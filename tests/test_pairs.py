@@ -0,0 +1,47 @@
+from core.synthetic import generate_history, generate_universe
+from core.models.history import ColumnarPriceHistory
+from core.pairs import PairScreener, pair_statistics
+import math
+import numpy
+import pytest
+
+
+def cointegrated_pair(bars: int = 500, seed: int = 2):
+    rng = numpy.random.default_rng(seed)
+    base = generate_history('BASE',bars,seed=seed)
+    spread = numpy.zeros(bars)
+    for bar in range(1,bars):
+        spread[bar] = 0.8 * spread[bar - 1] + rng.normal(0,0.01)
+    columns = base.get_columns()
+    follower = ColumnarPriceHistory.from_arrays('FOLLOW',columns['open'],numpy.exp(0.5 + 1.2 * numpy.log(columns['close']) + spread),columns['low'],columns['high'],columns['volume'],columns['date'])
+    return follower, base
+
+
+# Ordinary least squares with an intercept, returning the coefficients and
+# their standard errors
+def ols(y: numpy.ndarray, x: numpy.ndarray):
+    design = numpy.column_stack((numpy.ones(len(x)),x))
+    coefficients, residuals, _, _ = numpy.linalg.lstsq(design,y,rcond=None)
+    variance = residuals[0] / (len(y) - 2)
+    return coefficients, numpy.sqrt(variance * numpy.diag(numpy.linalg.inv(design.T @ design)))
+
+
+def test_pair_statistics_match_lstsq_fits():
+    first, second = cointegrated_pair()
+    statistics = pair_statistics(((first.get_dates(),first.get_close()),(second.get_dates(),second.get_close())))
+    y, x = numpy.log(first.get_close()), numpy.log(second.get_close())
+    (intercept, hedge_ratio), _ = ols(y,x)
+    spread = y - intercept - hedge_ratio * x
+    (_, beta), (_, beta_error) = ols(numpy.diff(spread),spread[:-1])
+    assert statistics['hedge_ratio'] == pytest.approx(hedge_ratio,rel=1e-9)
+    assert statistics['intercept'] == pytest.approx(intercept,rel=1e-9)
+    assert statistics['spread_std'] == pytest.approx(spread.std(ddof=1),rel=1e-9)
+    assert statistics['zscore'] == pytest.approx((spread[-1] - spread.mean()) / spread.std(ddof=1),rel=1e-9)
+    assert statistics['adf_statistic'] == pytest.approx(beta / beta_error,rel=1e-9)
+    assert statistics['half_life'] == pytest.approx(-math.log(2) / math.log(1 + beta),rel=1e-9)
+
+
+def test_screener_finds_the_cointegrated_pair():
+    first, second = cointegrated_pair()
+    pairs = PairScreener(lookback=400,min_correlation=0.5).screen(generate_universe(6,500,seed=9) + [first,second])
+    assert any({pair.first.get_ticker(),pair.second.get_ticker()} == {'FOLLOW','BASE'} for pair in pairs)
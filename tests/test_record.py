@@ -0,0 +1,61 @@
+from core.synthetic import generate_universe, generate_portfolio, generate_triggers
+from core.enums.enums import MovingAverageType, TradeSignal
+from core.executors import SerialExecutor
+from core.models import record
+from core.models.record import TradeJournal
+from core.strategy import Strategy
+import numpy
+import pytest
+
+
+@pytest.fixture
+def small_chunks(monkeypatch):
+    monkeypatch.setattr(record,'READ_CHUNK',7)
+
+
+@pytest.mark.parametrize('query',[dict(),dict(ticker='T1'),dict(start_date=10,end_date=20),dict(ticker='T2',start_date=30),dict(ticker='MISSING')])
+def test_queries_over_flushed_entries_match_an_in_memory_journal(tmp_path, small_chunks, query):
+    rng = numpy.random.default_rng(15)
+    flushed = TradeJournal(path=str(tmp_path),flush_size=10)
+    memory, prefix = TradeJournal(), TradeJournal()
+    for entry in range(95):
+        arguments = (f'T{entry % 4}',TradeSignal.BUY,float(entry),int(rng.integers(0,50)))
+        flushed.write_signal(*arguments)
+        memory.write_signal(*arguments)
+        if entry < 90:
+            prefix.write_signal(*arguments)
+    assert len(flushed) == 95
+    assert flushed.to_frame(**query).equals(memory.to_frame(**query))
+    # A journal reopened on the same files only holds the flushed entries
+    reopened = TradeJournal(path=str(tmp_path))
+    assert len(reopened) == 90
+    assert reopened.to_frame(**query).equals(prefix.to_frame(**query))
+
+
+def test_pairs_signals_are_journaled_for_both_tickers():
+    histories = generate_universe(4,300,seed=15)
+    strategy = Strategy(SerialExecutor())
+    results = strategy.execute_pairs_trading_strategy([(histories[0],histories[1]),(histories[2],histories[3])],100,0.0)
+    records = strategy.record_holder.get_records()
+    expected = set()
+    for (first, second), signal in results:
+        if signal != TradeSignal.HOLD:
+            expected.add((first.get_ticker(),signal.name,float(first.get_close()[-1])))
+            expected.add((second.get_ticker(),(TradeSignal.SHORT if signal == TradeSignal.LONG else TradeSignal.LONG).name,float(second.get_close()[-1])))
+    assert len(expected) == 4
+    assert set(zip(records['ticker'],records['signal'],records['price'])) == expected
+
+
+def test_stream_signals_are_journaled():
+    histories = generate_universe(6,300,seed=15)
+    portfolio = generate_portfolio(histories)
+    strategy = Strategy(SerialExecutor())
+    signals = list()
+    for history in histories:
+        state = strategy.create_bollinger_band_stream(history,MovingAverageType.SIMPLE,20,2,14)
+        signal, date = strategy.execute_bollinger_band_stream(portfolio,state,generate_triggers(),None,60.0,40.0)
+        if signal != TradeSignal.HOLD:
+            signals.append((history.get_ticker(),signal.name,date))
+    records = strategy.record_holder.get_records()
+    assert len(signals) > 0
+    assert list(zip(records['ticker'],records['signal'],records['date'])) == signals
@@ -0,0 +1,95 @@
+from core.synthetic import generate_universe, generate_portfolio, generate_triggers
+from core.enums.enums import FrequencyType, MovingAverageType
+from core.executors import StrategyExecutor, SerialExecutor, ThreadExecutor, ProcessExecutor
+from core.strategy import Strategy
+import warnings
+import pytest
+
+
+def run(method: str, histories, portfolio, executor: StrategyExecutor = None):
+    strategy = Strategy(executor if executor is not None else SerialExecutor())
+    if 'bollinger_band' in method:
+        results = getattr(strategy,method)(portfolio,histories,generate_triggers(),MovingAverageType.SIMPLE,20,2,14,60.0,40.0)
+    else:
+        results = getattr(strategy,method)(portfolio,histories,generate_triggers(),MovingAverageType.EXPONENTIAL,10,50,14,60.0,40.0)
+    return [(history.get_ticker(),signal,date) for history, signal, date in results]
+
+
+# The latest signal of every ticker from a streaming state seeded with its
+# history, the O(1) path the batch evaluation has to agree with
+def streamed(strategy: Strategy, kind: str, histories, portfolio):
+    triggers = generate_triggers()
+    results = []
+    for history in histories:
+        if kind == 'bollinger_band':
+            state = strategy.create_bollinger_band_stream(history,MovingAverageType.SIMPLE,20,2,14)
+            signal, date = strategy.execute_bollinger_band_stream(portfolio,state,triggers,None,60.0,40.0)
+        else:
+            state = strategy.create_dual_moving_average_stream(history,MovingAverageType.EXPONENTIAL,10,50,14)
+            signal, date = strategy.execute_dual_moving_average_stream(portfolio,state,triggers,None,60.0,40.0)
+        results.append((history.get_ticker(),signal,date))
+    return results
+
+
+@pytest.mark.parametrize('kind',['bollinger_band','dual_moving_average'])
+def test_batch_signals_match_the_streaming_states(kind):
+    histories = generate_universe(30,400,seed=12)
+    portfolio = generate_portfolio(histories)
+    strategy = Strategy()
+    if kind == 'bollinger_band':
+        results = strategy.execute_bollinger_band_strategy_batch(portfolio,histories,generate_triggers(),MovingAverageType.SIMPLE,20,2,14,60.0,40.0)
+    else:
+        results = strategy.execute_moving_average_strategy_batch(portfolio,histories,generate_triggers(),MovingAverageType.EXPONENTIAL,10,50,14,60.0,40.0)
+    signals = [(history.get_ticker(),signal,date) for history, signal, date in results]
+    assert signals == streamed(strategy,kind,histories,portfolio)
+    assert len({signal for _, signal, _ in signals}) > 1
+
+
+@pytest.mark.parametrize('executor',[ThreadExecutor,ProcessExecutor],ids=lambda executor: executor.__name__)
+@pytest.mark.parametrize('method',['execute_bollinger_band_strategy','execute_moving_average_strategy'])
+def test_per_ticker_tasks_match_the_batch_on_every_executor(method, executor):
+    histories = generate_universe(30,400,seed=12)
+    portfolio = generate_portfolio(histories)
+    pool = executor(max_workers=2)
+    try:
+        signals = run(method,histories,portfolio,pool)
+    finally:
+        pool.shutdown()
+    assert signals == run(f'{method}_batch',histories,portfolio)
+
+
+@pytest.mark.parametrize('method',['execute_bollinger_band_strategy','execute_moving_average_strategy'])
+def test_batch_journal_matches_the_per_ticker_tasks(method):
+    histories = generate_universe(30,400,seed=12)
+    portfolio = generate_portfolio(histories)
+    journals = list()
+    for name in (method,f'{method}_batch'):
+        strategy = Strategy(SerialExecutor())
+        if 'bollinger_band' in method:
+            getattr(strategy,name)(portfolio,histories,generate_triggers(),MovingAverageType.SIMPLE,20,2,14,60.0,40.0)
+        else:
+            getattr(strategy,name)(portfolio,histories,generate_triggers(),MovingAverageType.EXPONENTIAL,10,50,14,60.0,40.0)
+        journals.append(strategy.record_holder.get_records().sort_values(['ticker','date']).reset_index(drop=True))
+    assert len(journals[0]) > 0
+    assert journals[1].equals(journals[0])
+
+
+@pytest.mark.parametrize('frequency_type',[FrequencyType.MONTH,FrequencyType.QUARTER,FrequencyType.YEAR])
+def test_bollinger_band_paths_agree_on_slow_frequencies(frequency_type):
+    histories = generate_universe(10,120,frequency_type,seed=13)
+    portfolio = generate_portfolio(histories)
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        signals = run('execute_bollinger_band_strategy',histories,portfolio)
+        batch_signals = run('execute_bollinger_band_strategy_batch',histories,portfolio)
+        streams = [Strategy(SerialExecutor()).create_bollinger_band_stream(history,MovingAverageType.SIMPLE,20,2,14) for history in histories]
+    assert batch_signals == signals
+    assert all(stream.bands.is_ready() for stream in streams)
+
+
+def test_executors_must_create_a_pool():
+    class Incomplete(StrategyExecutor):
+        pass
+
+    with pytest.raises(TypeError):
+        Incomplete()
@@ -0,0 +1,56 @@
+from core.synthetic import generate_universe
+from core.executors import SerialExecutor
+from core.forecaster import Forecaster
+from core.models.history import ColumnarPriceHistory, CANDLE_COLUMNS
+import pytest
+
+
+@pytest.mark.parametrize('weighted',[False,True])
+def test_streamed_trend_matches_the_batch_trend(weighted):
+    histories = generate_universe(8,330,seed=8)
+    shares = {history.get_ticker(): float(column + 1) for column, history in enumerate(histories)} if weighted else None
+    seeded = [ColumnarPriceHistory.from_arrays(history.get_ticker(),*(history.get_columns()[name][:300] for name in CANDLE_COLUMNS)) for history in histories]
+    forecaster = Forecaster(executor=SerialExecutor())
+    engines = forecaster.create_market_trends({'market': seeded},(10,50),5,{'market': shares} if weighted else None)
+    for bar in range(300,330):
+        streamed = forecaster.update_market_trends(engines,int(histories[0].get_dates()[bar]),{history.get_ticker(): float(history.get_close()[bar]) for history in histories})['market']
+
+    expected = forecaster.forecast_market_trend(histories,'market',(10,50),5,shares)
+    assert streamed['date'] == expected['date']
+    assert streamed['trend'] == expected['trend']
+    assert streamed['index'] == pytest.approx(expected['index'],rel=1e-12)
+    for name in ('moving_averages','slopes','breadth'):
+        assert streamed[name] == pytest.approx(expected[name],rel=1e-9,abs=1e-12)
+
+
+def test_index_does_not_depend_on_the_lookback():
+    histories = generate_universe(5,400,seed=1)
+    forecaster = Forecaster(executor=SerialExecutor())
+    short = forecaster.forecast_market_trend(histories,'market',(10,),5)
+    long = forecaster.forecast_market_trend(histories,'market',(10,200),5)
+    assert short['index'] == pytest.approx(long['index'],rel=1e-12)
+    assert short['moving_averages'][10] == pytest.approx(long['moving_averages'][10],rel=1e-12)
+
+
+def test_anchored_index_matches_a_full_recompute_as_bars_arrive():
+    histories = generate_universe(6,400,seed=2)
+    shares = {history.get_ticker(): float(column + 1) for column, history in enumerate(histories)}
+    growing = [ColumnarPriceHistory.from_arrays(history.get_ticker(),*(history.get_columns()[name][:300] for name in CANDLE_COLUMNS)) for history in histories]
+    forecaster = Forecaster(executor=SerialExecutor())
+    for bar in range(300,400,7):
+        for history, full in zip(growing,histories):
+            history.extend({name: full.get_columns()[name][len(history):bar] for name in CANDLE_COLUMNS})
+        anchored = forecaster.forecast_market_trend(growing,'market',(10,50),5,shares)
+        expected = Forecaster(executor=SerialExecutor()).forecast_market_trend(growing,'market',(10,50),5,shares)
+        assert anchored['index'] == pytest.approx(expected['index'],rel=1e-12)
+        assert anchored['moving_averages'] == pytest.approx(expected['moving_averages'],rel=1e-12)
+        assert forecaster.index_anchors['market'].date == int(growing[0].get_dates()[-55])
+
+    # Adjusting the closes up to the anchor, like a split, drops it instead of
+    # walking on from a level that no longer holds
+    columns = growing[0].get_columns()
+    columns['close'][:-10] *= 1.1
+    rewritten = [ColumnarPriceHistory.from_arrays(growing[0].get_ticker(),*(columns[name] for name in CANDLE_COLUMNS))] + growing[1:]
+    anchored = forecaster.forecast_market_trend(rewritten,'market',(10,50),5,shares)
+    expected = Forecaster(executor=SerialExecutor()).forecast_market_trend(rewritten,'market',(10,50),5,shares)
+    assert anchored['index'] == pytest.approx(expected['index'],rel=1e-12)